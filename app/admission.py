@@ -0,0 +1,220 @@
+# app/admission.py
+"""
+쓰기 API 앞단의 동시성 제한기(admission control).
+
+- 동시에 실행되는 쓰기 요청 수(limit)를 제한하고, 넘치는 요청은 이벤트 루프에서
+  대기시킨다(threadpool 스레드/DB 커넥션을 잡지 않음).
+- 대기열(queue_size)이 가득 차거나 queue_timeout 안에 차례가 안 오면 즉시 503.
+- limit은 요청이 DB 를 기다린 시간(app.db.track_wait: 쿼리 + commit + 풀 대기)을 보고 gradient 방식으로
+  조정한다. DB 대기가 기준(최소)보다 늘어나면 limit을 줄이고, 정상이면 천천히 늘린다.
+  전체 처리 시간에는 FCM 큐잉/JSON 직렬화처럼 쓰기 동시성을 줄여도 안 줄어드는 지연이 섞이므로
+  limit 조정에는 쓰지 않고 Retry-After 추정에만 쓴다. DB 를 안 거친 요청(journal 접수 등)은 샘플에서 뺀다.
+- limiter는 매장별이지만, 전 매장 합계는 GlobalCap(WRITE_CONCURRENCY_GLOBAL_MAX) 하나를 같이 쓴다
+  → 매장이 늘어도 쓰기 요청이 threadpool 을 다 차지하지 않는다.
+  자리가 나면 대기 중인 매장들에 돌아가며 넘겨준다.
+"""
+import asyncio
+import math
+import os
+from collections import deque
+from typing import Dict
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("overloaded")
+        self.retry_after = retry_after
+
+
+class GlobalCap:
+    """여러 AdaptiveLimiter 가 나눠 쓰는 동시 실행 상한 (이벤트 루프 안에서만 사용)"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.inflight = 0
+        self.limiters: list = []
+        self._next = 0
+
+    def has_room(self) -> bool:
+        return self.inflight < self.limit
+
+    def dispatch(self) -> None:
+        """빈 자리를 대기열이 있는 limiter 들에 돌아가며 하나씩 넘긴다(한 매장이 독차지하지 않게)"""
+        while self.has_room():
+            granted = False
+            for _ in range(len(self.limiters)):
+                lim = self.limiters[self._next % len(self.limiters)]
+                self._next += 1
+                if lim._grant_one():
+                    granted = True
+                    if not self.has_room():
+                        return
+            if not granted:
+                return
+
+    def snapshot(self) -> dict:
+        return {"limit": self.limit, "inflight": self.inflight}
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        queue_size: int,
+        queue_timeout: float,
+        tolerance: float = 2.0,
+        shared: GlobalCap | None = None,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.tolerance = tolerance
+
+        self.inflight = 0
+        self.rejected = 0
+        self._waiters: deque = deque()
+        self._min_rtt: float | None = None
+        self._smoothed: float | None = None  # DB 대기
+        self._latency: float | None = None  # 요청 전체
+        self._samples = 0
+        self.shared = shared or GlobalCap(max_limit)
+        self.shared.limiters.append(self)
+
+    def _has_room(self) -> bool:
+        return self.inflight < int(self.limit) and self.shared.has_room()
+
+    def _take(self) -> None:
+        self.inflight += 1
+        self.shared.inflight += 1
+
+    # ---- acquire / release (이벤트 루프 안에서만 호출) ----
+    async def acquire(self) -> None:
+        if self._has_room() and not self._waiters:
+            self._take()
+            return
+
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            raise AdmissionRejected(self.retry_after())
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            # release()가 슬롯을 넘겨주면(set_result) inflight(매장/전체)는 이미 증가된 상태
+            await asyncio.wait_for(fut, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(fut)
+            self.rejected += 1
+            raise AdmissionRejected(self.retry_after())
+        except asyncio.CancelledError:
+            # 클라이언트 연결 끊김 등: 이미 슬롯을 받았으면 반납
+            if fut.done() and not fut.cancelled():
+                self._release_slot()
+            else:
+                self._discard(fut)
+            raise
+
+    def release(self, elapsed: float, db_wait: float | None = None) -> None:
+        """elapsed: 요청 전체 시간, db_wait: 그중 DB 대기 (없으면 elapsed 로 조정)"""
+        self._observe(elapsed, elapsed if db_wait is None else db_wait)
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        self.inflight -= 1
+        self.shared.inflight -= 1
+        self.shared.dispatch()
+
+    def _grant_one(self) -> bool:
+        while self._waiters and self._has_room():
+            fut = self._waiters.popleft()
+            if fut.done():
+                continue
+            self._take()
+            fut.set_result(None)
+            return True
+        return False
+
+    def _discard(self, fut) -> None:
+        try:
+            self._waiters.remove(fut)
+        except ValueError:
+            pass
+
+    # ---- limit 조정 ----
+    def _observe(self, elapsed: float, rtt: float) -> None:
+        self._latency = elapsed if self._latency is None else self._latency * 0.9 + elapsed * 0.1
+        if rtt <= 0:
+            return  # DB 를 안 거친 요청: 기준 지연이 0 이 되면 gradient 가 계속 최소로 눌린다
+        self._samples += 1
+        if self._smoothed is None:
+            self._smoothed = rtt
+        else:
+            self._smoothed = self._smoothed * 0.9 + rtt * 0.1
+
+        # 기준 지연(min_rtt)은 가끔 리셋해서 DB 상태 변화(인덱스/데이터량)를 따라가게 함
+        if self._min_rtt is None or rtt < self._min_rtt or self._samples % 500 == 0:
+            self._min_rtt = min(rtt, self._smoothed)
+
+        gradient = (self._min_rtt * self.tolerance) / max(self._smoothed, 1e-6)
+        gradient = max(0.5, min(1.0, gradient))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        new_limit = self.limit * 0.8 + target * 0.2
+        self.limit = float(max(self.min_limit, min(self.max_limit, new_limit)))
+
+    def retry_after(self) -> int:
+        """대기열이 빠지는 데 걸릴 대략적인 시간(초)"""
+        per_req = self._latency or 0.1
+        backlog = len(self._waiters) + self.inflight
+        return max(1, math.ceil(per_req * backlog / max(int(self.limit), 1)))
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "inflight": self.inflight,
+            "queued": len(self._waiters),
+            "rejected": self.rejected,
+            "latencyMs": round((self._latency or 0) * 1000, 1),
+            "dbWaitMs": round((self._smoothed or 0) * 1000, 1),
+            "baselineMs": round((self._min_rtt or 0) * 1000, 1),
+        }
+
+
+# 쓰기 요청 전체가 한 매장의 DB를 공유하므로 limiter는 매장마다 하나.
+# 매장별 max_limit 합은 매장 수만큼 커지므로, threadpool(기본 40)보다 충분히 작은 전체 상한을
+# 모든 limiter 가 같이 써서 GET /menu 같은 읽기가 쓸 스레드를 남겨둔다.
+WRITE_CONCURRENCY_GLOBAL_MAX = int(os.getenv("WRITE_CONCURRENCY_GLOBAL_MAX", "24"))
+_global = GlobalCap(WRITE_CONCURRENCY_GLOBAL_MAX)
+
+
+def _new_limiter() -> AdaptiveLimiter:
+    return AdaptiveLimiter(
+        initial=int(os.getenv("WRITE_CONCURRENCY_INITIAL", "8")),
+        min_limit=int(os.getenv("WRITE_CONCURRENCY_MIN", "2")),
+        max_limit=int(os.getenv("WRITE_CONCURRENCY_MAX", "16")),
+        queue_size=int(os.getenv("WRITE_QUEUE_SIZE", "64")),
+        queue_timeout=float(os.getenv("WRITE_QUEUE_TIMEOUT_SEC", "2.0")),
+        shared=_global,
+    )
+
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+
+
+def limiter_for(tenant_id: str) -> AdaptiveLimiter:
+    """매장별 limiter (한 매장의 주문 폭주가 다른 매장 쓰기를 막지 않게)"""
+    limiter = _limiters.get(tenant_id)
+    if limiter is None:
+        limiter = _limiters.setdefault(tenant_id, _new_limiter())
+    return limiter
+
+
+def snapshots() -> Dict[str, dict]:
+    return {tid: lim.snapshot() for tid, lim in _limiters.items()}
+
+
+def global_snapshot() -> dict:
+    return _global.snapshot()
@@ -0,0 +1,428 @@
+# app/datagen.py
+"""
+용량 테스트용 대량 데이터 생성 (로컬 DB 전용)
+
+  python -m app.datagen                          # 기본 규모 (아래)
+  python -m app.datagen --orders 100000 --logs 500000 --seed 7
+  python -m app.datagen --tenant imjin --truncate  # 기존 메뉴/주문/기기/알림 데이터를 지우고 다시
+
+- 로컬 DB(unix socket / localhost) 에만 쓴다. 다른 호스트면 ALLOW_DATAGEN=1 이 있어야 한다.
+  --truncate 는 매장을 --tenant 로 직접 골라야 한다(전 매장을 한 번에 지우지 않게).
+
+- 같은 --seed / --end 면 같은 데이터(uuid, 시각, 금액까지)가 나온다.
+- 전부 COPY (text 포맷)로 넣고, 주문은 --batch 건씩 orders → order_items → order_item_options
+  → order_status_logs → notification_logs 순으로 흘려 넣고 batch 마다 커밋한다
+  (메모리 / 트랜잭션 크기 일정). 중간에 실패하면 넣은 데까지 남으므로 --truncate 로 다시.
+- 모양은 create_order 가 만드는 것과 같다:
+  line_amount = (price + sum(price_delta)) * qty, total_amount = sum(line_amount),
+  single 옵션은 값 1개 / multi 는 1~2개, 필수 옵션은 항상 선택.
+- 주문 시각은 --days 동안 점심/저녁 피크가 있는 분포, 최근 1시간 주문만 PLACED/ACCEPTED.
+- 기기의 일부는 오래 안 쓴(stale) 토큰 / 비활성.
+- 끝나면 stats 롤업 rebuild + analyze.
+- orders 가 비어 있지 않으면 --truncate 없이는 아무것도 하지 않는다.
+
+기본 규모: 주문 1,000,000 / 손님 100,000 / 기기 200,000 / 알림 5,000,000 / 메뉴 300개 + 옵션 40개
+"""
+import argparse
+import io
+import json
+import os
+import random
+import time
+from bisect import bisect
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from typing import Any, Dict, List, Tuple
+from zoneinfo import ZoneInfo
+
+from psycopg2 import sql
+from psycopg2.extensions import parse_dsn
+
+from app import db, partitions, stats, tenants
+from app.db import get_conn
+
+ALLOW_DATAGEN = os.getenv("ALLOW_DATAGEN", "") == "1"
+LOCAL_HOSTS = {"", "localhost", "127.0.0.1", "::1"}
+
+OWNERS = 3
+PLATFORMS = ["android", "ios", "web"]
+PLATFORM_WEIGHTS = [55, 35, 10]
+LINE_COUNT_WEIGHTS = [45, 30, 15, 10]      # 주문당 라인 1~4개
+QTY_WEIGHTS = [70, 20, 10]                 # 수량 1~3
+# 시간대별 주문 비중 (0~23시, 매장 시간 기준) — 점심/저녁 피크
+HOUR_WEIGHTS = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 2, 8, 12, 8, 3, 2, 4, 10, 16, 14, 9, 5, 2, 0]
+STALE_DEVICE_RATIO = 0.25
+INACTIVE_DEVICE_RATIO = 0.10
+CATEGORY_NAMES = ["갈비", "찌개", "면", "밥", "사이드", "주류", "음료", "세트", "계절메뉴", "디저트"]
+OPTION_KINDS = [
+    ("맵기", ["순한맛", "보통맛", "매운맛", "아주매운맛"]),
+    ("양", ["보통", "곱빼기", "특대"]),
+    ("추가", ["치즈", "계란", "당면", "떡", "라면사리", "공기밥"]),
+    ("굽기", ["레어", "미디움", "웰던"]),
+    ("포장", ["매장", "포장"]),
+]
+
+# 다시 넣을 때 지우는 테이블 (참조하는 쪽부터)
+GENERATED_TABLES = [
+    "notification_deliveries", "notification_logs", "order_status_logs", "order_item_options", "order_items",
+    "orders", "devices", "users", "menu_item_option_map", "menu_option_values", "menu_item_options",
+    "menu_items", "menu_categories", "menu_tombstones",
+    "stats_daily", "stats_daily_status", "stats_item_daily", "stats_item_total", "stats_ledger",
+]
+
+
+# ---- 값 만들기 ----
+class Ids:
+    """seed 별 uuid: 종류마다 랜덤 prefix + 일련번호 (결정적이고 만들기 싸다)"""
+
+    def __init__(self, rng: random.Random):
+        self._prefix: Dict[str, str] = {}
+        self._rng = rng
+
+    def __call__(self, kind: str, n: int) -> str:
+        p = self._prefix.get(kind)
+        if p is None:
+            r = self._rng.getrandbits(64)
+            p = self._prefix[kind] = f"{r >> 32:08x}-{(r >> 16) & 0xffff:04x}-4{(r >> 4) & 0xfff:03x}-8{r & 0xf:01x}"
+        return f"{p}{(n >> 48) & 0xff:02x}-{n & 0xffffffffffff:012x}"
+
+
+def _ts(t: datetime) -> str:
+    return t.isoformat()
+
+
+def _row(*values) -> str:
+    """COPY text 포맷 한 줄 (생성 값에는 탭/줄바꿈/역슬래시가 없다)"""
+    return "\t".join("\\N" if v is None else ("t" if v is True else "f" if v is False else str(v)) for v in values) + "\n"
+
+
+def _copy(cur, table: str, columns: List[str], buf: io.StringIO) -> None:
+    buf.seek(0)
+    cur.copy_expert(
+        sql.SQL("copy {} ({}) from stdin").format(
+            sql.Identifier(table), sql.SQL(", ").join(map(sql.Identifier, columns))
+        ).as_string(cur),
+        buf,
+    )
+
+
+class Menu:
+    def __init__(self, items: List[Dict[str, Any]], options: Dict[str, Dict[str, Any]],
+                 item_options: Dict[str, List[str]]):
+        self.items = items
+        self.options = options              # option_id -> {key, name, selection_type, is_required, values}
+        self.item_options = item_options    # menu_item_id -> [option_id]
+        # 인기 메뉴 쏠림 (Zipf 비슷하게)
+        self.cum = list(accumulate(1.0 / (i + 1) ** 0.9 for i in range(len(items))))
+
+
+# ---- 메뉴 / 사용자 / 기기 ----
+def gen_menu(cur, rng: random.Random, ids: Ids, n_items: int, n_options: int) -> Menu:
+    cats, items, opts, vals, maps = io.StringIO(), io.StringIO(), io.StringIO(), io.StringIO(), io.StringIO()
+
+    category_ids = []
+    for i, name in enumerate(CATEGORY_NAMES):
+        cid = ids("category", i)
+        category_ids.append(cid)
+        cats.write(_row(cid, name, i, True))
+
+    options: Dict[str, Dict[str, Any]] = {}
+    for j in range(n_options):
+        kind, labels = OPTION_KINDS[j % len(OPTION_KINDS)]
+        oid = ids("option", j)
+        selection = "multi" if kind == "추가" else "single"
+        required = selection == "single" and rng.random() < 0.4
+        values = []
+        for k, label in enumerate(labels):
+            delta = 0 if selection == "single" and k == 0 else rng.choice([0, 500, 1000, 1500, 2000, 3000])
+            active = rng.random() > 0.05 or k == 0
+            if active:
+                values.append((f"v{k}", label, delta))
+            vals.write(_row(ids("value", j * 16 + k), oid, f"v{k}", label, delta, k, active))
+        options[oid] = {"key": f"opt{j}", "name": f"{kind}{j // len(OPTION_KINDS) or ''}",
+                        "selection_type": selection, "is_required": required, "values": values}
+        opts.write(_row(oid, f"opt{j}", options[oid]["name"], selection, required, j))
+
+    menu_items: List[Dict[str, Any]] = []
+    item_options: Dict[str, List[str]] = {}
+    option_ids = list(options)
+    for i in range(n_items):
+        mid = ids("item", i)
+        price = rng.choice([3000, 5000, 7000, 9000, 12000, 15000, 18000, 25000, 32000])
+        active = rng.random() > 0.03
+        cat = category_ids[i % len(category_ids)]
+        items.write(_row(mid, cat, f"메뉴{i + 1}", f"생성된 메뉴 {i + 1}", price, None, i, active))
+        chosen = rng.sample(option_ids, k=min(len(option_ids), rng.choices([0, 1, 2, 3], [25, 35, 25, 15])[0]))
+        item_options[mid] = chosen
+        for k, oid in enumerate(chosen):
+            maps.write(_row(mid, oid, k))
+        menu_items.append({"id": mid, "name": f"메뉴{i + 1}", "price": price, "active": active})
+
+    _copy(cur, "menu_categories", ["id", "name", "sort_order", "is_active"], cats)
+    _copy(cur, "menu_items", ["id", "category_id", "name", "description", "price", "image_url", "sort_order", "is_active"], items)
+    _copy(cur, "menu_item_options", ["id", "key", "name", "selection_type", "is_required", "sort_order"], opts)
+    _copy(cur, "menu_option_values", ["id", "option_id", "value_key", "label", "price_delta", "sort_order", "is_active"], vals)
+    _copy(cur, "menu_item_option_map", ["menu_item_id", "option_id", "sort_order"], maps)
+    # 주문에는 활성 메뉴만
+    return Menu([m for m in menu_items if m["active"]], options, item_options)
+
+
+def gen_users(cur, rng: random.Random, ids: Ids, customers: int, start: datetime) -> List[str]:
+    buf = io.StringIO()
+    out = []
+    for i in range(OWNERS + customers):
+        uid = ids("user", i)
+        out.append(uid)
+        created = _ts(start + timedelta(seconds=rng.randrange(86400 * 30)))
+        buf.write(_row(uid, "owner" if i < OWNERS else "customer", f"사장님{i + 1}" if i < OWNERS else f"손님{i - OWNERS + 1}",
+                       created, created))
+    _copy(cur, "users", ["id", "role", "name", "created_at", "updated_at"], buf)
+    return out
+
+
+def gen_devices(cur, rng: random.Random, ids: Ids, seed: int, users: List[str], n: int, end: datetime) -> int:
+    buf = io.StringIO()
+    for i in range(n):
+        # 사장님은 기기 여러 대, 나머지는 손님에게 고르게
+        user = users[i % OWNERS] if i < OWNERS * 3 else users[OWNERS + rng.randrange(len(users) - OWNERS)]
+        stale = rng.random() < STALE_DEVICE_RATIO
+        last_seen = end - timedelta(days=rng.uniform(60, 400) if stale else rng.uniform(0, 30))
+        active = not (stale and rng.random() < INACTIVE_DEVICE_RATIO / STALE_DEVICE_RATIO)
+        buf.write(_row(ids("device", i), user, rng.choices(PLATFORMS, PLATFORM_WEIGHTS)[0],
+                       f"gen-{seed}-{i:08d}", active, _ts(last_seen), _ts(last_seen - timedelta(days=rng.uniform(0, 90)))))
+    _copy(cur, "devices", ["id", "user_id", "platform", "fcm_token", "is_active", "last_seen_at", "created_at"], buf)
+    return n
+
+
+# ---- 주문 ----
+def _order_times(rng: random.Random, n: int, start: datetime, days: int):
+    """시간 순으로 n 개 (주말 1.3배, 시간대는 HOUR_WEIGHTS)"""
+    day_weights = [1.3 if (start + timedelta(days=d)).weekday() >= 5 else 1.0 for d in range(days)]
+    total = sum(day_weights)
+    hour_cum = list(accumulate(HOUR_WEIGHTS))
+    made = 0
+    for d in range(days):
+        count = round(n * sum(day_weights[:d + 1]) / total) - made
+        made += count
+        day = start + timedelta(days=d)
+        secs = sorted(bisect(hour_cum, rng.random() * hour_cum[-1]) * 3600 + rng.randrange(3600) for _ in range(count))
+        for s in secs:
+            yield day + timedelta(seconds=s)
+
+
+def _lines(rng: random.Random, menu: Menu) -> List[Tuple[Dict[str, Any], int, List[Tuple[Dict[str, Any], Tuple]], int]]:
+    lines = []
+    for _ in range(rng.choices([1, 2, 3, 4], LINE_COUNT_WEIGHTS)[0]):
+        item = menu.items[bisect(menu.cum, rng.random() * menu.cum[-1])]
+        qty = rng.choices([1, 2, 3], QTY_WEIGHTS)[0]
+        chosen = []
+        for oid in menu.item_options[item["id"]]:
+            opt = menu.options[oid]
+            if not opt["is_required"] and rng.random() < 0.5:
+                continue
+            picks = rng.sample(opt["values"], k=1 if opt["selection_type"] == "single" else rng.choice([1, 1, 2]))
+            chosen += [(opt, v) for v in picks]
+        unit = item["price"] + sum(v[2] for _, v in chosen)
+        lines.append((item, qty, chosen, unit * qty))
+    return lines
+
+
+ORDER_COLUMNS = ["id", "customer_id", "status", "customer_note", "total_amount", "created_at",
+                 "accepted_at", "completed_at", "canceled_at"]
+ITEM_COLUMNS = ["id", "order_id", "menu_item_id", "name_snapshot", "price_snapshot", "qty", "line_amount"]
+OPTION_COLUMNS = ["id", "order_item_id", "option_key", "option_name", "value_key", "value_label", "price_delta"]
+STATUS_COLUMNS = ["order_id", "from_status", "to_status", "changed_by", "created_at"]
+LOG_COLUMNS = ["id", "order_id", "user_id", "channel", "title", "body", "payload", "send_status", "error_message",
+               "created_at", "sent_at", "attempts", "next_attempt_at", "priority", "coalesce_key"]
+
+
+def gen_orders(cur, rng: random.Random, ids: Ids, menu: Menu, users: List[str], n_orders: int, n_logs: int,
+               start: datetime, days: int, end: datetime, batch: int, store_name: str) -> Dict[str, int]:
+    counts = {"orders": 0, "order_items": 0, "order_item_options": 0, "order_status_logs": 0, "notification_logs": 0}
+    logs_per_order = n_logs / max(n_orders, 1)
+    n_item = n_opt = n_log = 0
+    bufs = None
+
+    def flush():
+        _copy(cur, "orders", ORDER_COLUMNS, bufs[0])
+        _copy(cur, "order_items", ITEM_COLUMNS, bufs[1])
+        _copy(cur, "order_item_options", OPTION_COLUMNS, bufs[2])
+        _copy(cur, "order_status_logs", STATUS_COLUMNS, bufs[3])
+        _copy(cur, "notification_logs", LOG_COLUMNS, bufs[4])
+        cur.connection.commit()
+        _skip_order_events(cur)
+
+    for i, created in enumerate(_order_times(rng, n_orders, start, days)):
+        if i % batch == 0:
+            if bufs:
+                flush()
+            bufs = [io.StringIO() for _ in range(5)]
+        orders, items, options, status_logs, logs = bufs
+
+        oid = ids("order", i)
+        customer = users[OWNERS + rng.randrange(len(users) - OWNERS)]
+        total = 0
+        for item, qty, chosen, amount in _lines(rng, menu):
+            iid = ids("order_item", n_item)
+            n_item += 1
+            total += amount
+            items.write(_row(iid, oid, item["id"], item["name"], item["price"], qty, amount))
+            for opt, (value_key, label, delta) in chosen:
+                options.write(_row(ids("order_item_option", n_opt), iid, opt["key"], opt["name"], value_key, label, delta))
+                n_opt += 1
+
+        # 상태: 최근 1시간은 진행 중, 그 전은 대부분 완료
+        age = (end - created).total_seconds()
+        r = rng.random()
+        if age < 3600:
+            status = "PLACED" if r < 0.5 else "ACCEPTED"
+        else:
+            status = "COMPLETED" if r < 0.92 else "CANCELED"
+        accepted = completed = canceled = None
+        if status != "PLACED" and (status != "CANCELED" or rng.random() < 0.6):
+            accepted = created + timedelta(seconds=rng.randint(30, 300))
+        if status == "COMPLETED":
+            completed = accepted + timedelta(seconds=rng.randint(600, 1800))
+        if status == "CANCELED":
+            canceled = (accepted or created) + timedelta(seconds=rng.randint(60, 900))
+        note = rng.choice(["덜 맵게 해주세요", "수저 빼주세요", "문 앞에 놔주세요"]) if rng.random() < 0.08 else None
+        orders.write(_row(oid, customer, status, note, total, _ts(created), accepted and _ts(accepted),
+                          completed and _ts(completed), canceled and _ts(canceled)))
+
+        steps = [(None, "PLACED", created, "customer")]
+        if accepted:
+            steps.append(("PLACED", "ACCEPTED", accepted, "owner"))
+        if completed:
+            steps.append(("ACCEPTED", "COMPLETED", completed, "owner"))
+        if canceled:
+            steps.append((steps[-1][1], "CANCELED", canceled, "owner"))
+        for frm, to, at, by in steps:
+            status_logs.write(_row(oid, frm, to, by, _ts(at)))
+        counts["order_status_logs"] += len(steps)
+
+        # 알림: 주문당 평균 logs_per_order 건 (사장님 새 주문 + 손님 상태 알림 + 재발송)
+        k = int(logs_per_order) + (rng.random() < logs_per_order - int(logs_per_order))
+        for j in range(k):
+            at = steps[min(j, len(steps) - 1)][2] + timedelta(seconds=rng.uniform(0.1, 5))
+            to_owner = j % 2 == 0
+            user = users[rng.randrange(OWNERS)] if to_owner else customer
+            r = rng.random()
+            send_status = "sent" if r < 0.9 else "failed" if r < 0.97 or age > 86400 else "queued"
+            payload = json.dumps({"type": "order_status", "orderId": oid}, ensure_ascii=False)
+            logs.write(_row(
+                ids("notification_log", n_log), oid, user, "fcm",
+                store_name, "새 주문이 들어왔습니다" if to_owner else "주문 상태가 변경되었습니다", payload, send_status,
+                "UNREGISTERED" if send_status == "failed" else None,
+                _ts(at), _ts(at + timedelta(seconds=rng.uniform(0.05, 2))) if send_status != "queued" else None,
+                1 if send_status != "queued" else 0, _ts(at), 1 if to_owner else 0, None,
+            ))
+            n_log += 1
+        counts["orders"] += 1
+
+    if bufs:
+        flush()
+    counts.update(order_items=n_item, order_item_options=n_opt, notification_logs=n_log)
+    return counts
+
+
+# ---- 실행 ----
+def is_local(url: str) -> bool:
+    """unix socket / localhost 로만 가는 DSN 인지 (host 가 여러 개면 전부)"""
+    hosts = parse_dsn(url).get("host") or os.getenv("PGHOST", "")
+    return all(h.startswith("/") or h in LOCAL_HOSTS for h in hosts.split(","))
+
+
+def check_target(tenant: tenants.Tenant) -> None:
+    url = db._url(tenant, "primary")
+    if not ALLOW_DATAGEN and not is_local(url):
+        raise SystemExit(f"refusing to generate data on a non-local database for tenant {tenant.id} "
+                         "(set ALLOW_DATAGEN=1 to override)")
+
+
+def _skip_order_events(cur) -> None:
+    # 과거 주문 적재는 다른 워커에 알릴 변경이 아니다 (0008 order_events 트리거). 트랜잭션마다 다시
+    cur.execute("set local app.skip_order_events = 'on'")
+
+
+def generate(seed: int, end: date, days: int, orders: int, customers: int, devices: int, logs: int,
+             items: int, options: int, batch: int, truncate: bool) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    ids = Ids(rng)
+    end_dt = datetime(end.year, end.month, end.day, tzinfo=ZoneInfo(stats.STATS_TZ))
+    start_dt = end_dt - timedelta(days=days)
+    started = time.perf_counter()
+
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("select exists (select 1 from orders) as has_orders")
+                if cur.fetchone()["has_orders"] and not truncate:
+                    return {"generated": False, "reason": "orders is not empty (use --truncate)"}
+                _skip_order_events(cur)
+                if truncate:
+                    cur.execute(sql.SQL("truncate {} restart identity").format(
+                        sql.SQL(", ").join(map(sql.Identifier, GENERATED_TABLES))))
+                    # truncate 는 tombstone 을 남기지 않으므로 기존 ?since 클라이언트는 전체 스냅샷을 받게
+                    cur.execute("""
+                        update menu_sync_state set pruned_through = (select last_value from menu_row_version_seq)
+                    """)
+                for table in partitions.LOG_TABLES:
+                    if partitions.is_partitioned(cur, table):
+                        partitions.ensure_partitions(cur, table, start_dt.date(), partitions._add_months(end, 1))
+
+                menu = gen_menu(cur, rng, ids, items, options)
+                users = gen_users(cur, rng, ids, customers, start_dt - timedelta(days=30))
+                n_devices = gen_devices(cur, rng, ids, seed, users, devices, end_dt)
+                conn.commit()
+                _skip_order_events(cur)
+                # batch 마다 커밋 (gen_orders)
+                counts = gen_orders(cur, rng, ids, menu, users, orders, logs, start_dt, days, end_dt,
+                                    batch, tenants.current().name)
+                stats.rebuild(cur)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("analyze")
+        conn.autocommit = False
+    finally:
+        conn.close()
+    return {
+        "generated": True, "seed": seed, "from": str(start_dt.date()), "to": str(end),
+        "menuItems": items, "options": options, "users": len(users), "devices": n_devices, **counts,
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.datagen")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="마지막 날 (기본: 오늘). 같은 seed+end = 같은 데이터")
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--devices", type=int, default=200_000)
+    parser.add_argument("--logs", type=int, default=5_000_000, help="notification_logs 총 건수(대략)")
+    parser.add_argument("--items", type=int, default=300, help="메뉴 수")
+    parser.add_argument("--options", type=int, default=40, help="옵션 수")
+    parser.add_argument("--batch", type=int, default=20_000, help="COPY 한 번에 넣는 주문 수")
+    parser.add_argument("--truncate", action="store_true", help="기존 메뉴/주문/기기/알림 데이터를 지우고 생성")
+    parser.add_argument("--tenant", default=None, help="이 매장만 (기본: 전 매장, --truncate 면 필수)")
+    args = parser.parse_args()
+
+    if args.truncate and not args.tenant:
+        parser.error("--truncate requires --tenant")
+    targets = [t for t in tenants.all_tenants() if not args.tenant or t.id == args.tenant]
+    if not targets:
+        parser.error(f"unknown tenant: {args.tenant}")
+    for tenant in targets:
+        check_target(tenant)
+
+    end = args.end or partitions._today()
+    for tenant in targets:
+        with tenants.use(tenant):
+            print(tenant.id, generate(args.seed, end, args.days, args.orders, args.customers, args.devices,
+                                      args.logs, args.items, args.options, args.batch, args.truncate))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,355 @@
 import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
 import psycopg2
+from psycopg2.extensions import connection as _PgConnection
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from app import profiler, tenants  # noqa: E402  (TENANTS_JSON 도 .env 에서 읽으므로 load_dotenv 이후)
+
 DATABASE_URL = os.getenv("DATABASE_URL", "")
+# 읽기 전용 라우트용 replica (없으면 전부 primary)
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL", "")
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "20"))
+DB_POOL_WAIT_SEC = float(os.getenv("DB_POOL_WAIT_SEC", "10"))
+# 새 커넥션 connect 상한 (libpq connect_timeout, 2초 미만은 2초로 취급)
+DB_CONNECT_TIMEOUT_SEC = int(os.getenv("DB_CONNECT_TIMEOUT_SEC", "5"))
+# 보낸 데이터가 이 시간 동안 ack 되지 않으면 커넥션을 끊는다 (libpq tcp_user_timeout, 0 이면 OS 기본)
+# + keepalive 로 응답 기다리는 중 상대가 사라진 것도 알아챈다
+DB_TCP_USER_TIMEOUT_MS = int(os.getenv("DB_TCP_USER_TIMEOUT_MS", "10000"))
+_KEEPALIVES = {"keepalives": 1, "keepalives_idle": 30, "keepalives_interval": 10, "keepalives_count": 3}
+
+# replica 지연이 이보다 크면 primary로 보냄
+REPLICA_MAX_LAG_SEC = float(os.getenv("REPLICA_MAX_LAG_SEC", "2"))
+REPLICA_LAG_CHECK_SEC = float(os.getenv("REPLICA_LAG_CHECK_SEC", "1"))
+# 방금 쓴 손님/주문은 이 시간 동안 primary에서 읽는다(read-your-writes)
+REPLICA_RYW_WINDOW_SEC = float(os.getenv("REPLICA_RYW_WINDOW_SEC", str(REPLICA_MAX_LAG_SEC + REPLICA_LAG_CHECK_SEC)))
+
+
+# 요청별 DB 대기 시간 합계(초): 쿼리 실행 + commit + 풀 대기. app.deps.admit_write 가 쓰기 limiter 에 넘긴다.
+# threadpool 로 넘어간 라우트도 복사된 컨텍스트로 같은 리스트에 더한다.
+_db_wait: ContextVar[Optional[List[float]]] = ContextVar("db_wait", default=None)
+
+
+def track_wait() -> List[float]:
+    """이 요청(컨텍스트)의 DB 대기 시간을 재기 시작. 돌려준 리스트의 [0] 에 쌓인다"""
+    meter = [0.0]
+    _db_wait.set(meter)
+    return meter
+
+
+@contextmanager
+def _waiting():
+    meter = _db_wait.get()
+    started = time.perf_counter()
+    try:
+        with profiler.wait("db"):
+            yield
+    finally:
+        if meter is not None:
+            meter[0] += time.perf_counter() - started
+
+
+class PooledConnection(_PgConnection):
+    """
+    풀에서 빌려준 커넥션. 라우터들은 기존처럼 conn.close()를 호출하면 되고,
+    실제로는 끊지 않고 풀에 반납된다.
+    """
+    _pool = None
+
+    def close(self):
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return super().close()
+        # 끊긴 커넥션(서버 장애, socket_deadline)도 풀에 돌려줘야 슬롯이 풀린다. 풀이 알아서 버린다
+        pool.putconn(self)
+
+    def commit(self):
+        # with conn: 의 commit 도 여기로 온다 (WAL flush 대기도 DB 대기)
+        with _waiting():
+            return super().commit()
+
+
+class ProfiledCursor(RealDictCursor):
+    """쿼리 대기 시간을 요청의 DB 대기(track_wait)와, 프로파일 중이면 app.profiler 에 기록"""
+
+    def execute(self, query, vars=None):
+        with _waiting():
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with _waiting():
+            return super().executemany(query, vars_list)
+
+
+class PoolExhausted(RuntimeError):
+    pass
+
+
+# DB 가 멈췄거나 닿지 않을 때 나는 에러 (연결 끊김/타임아웃/풀 고갈, QueryCanceled 도 OperationalError)
+DB_UNAVAILABLE = (psycopg2.OperationalError, psycopg2.InterfaceError, PoolExhausted)
+
+
+class BlockingPool(ThreadedConnectionPool):
+    """ThreadedConnectionPool은 다 쓰면 바로 PoolError → 빈 자리가 날 때까지 잠깐 기다린다."""
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        self._slots = threading.BoundedSemaphore(maxconn)
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None, wait: float | None = None):
+        if not self._slots.acquire(timeout=DB_POOL_WAIT_SEC if wait is None else wait):
+            raise PoolExhausted("database connection pool exhausted")
+        try:
+            conn = super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+        conn._pool = self
+        return conn
+
+    def putconn(self, conn, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        # 빌려간 커넥션이 close()로 풀에 되돌아오지 않고 실제로 닫히도록
+        for conn in list(self._used.values()):
+            conn._pool = None
+        super().closeall()
+
+
+# (tenant_id, role) -> pool. 매장별로 풀이 따로라 한 매장이 몰려도 다른 매장 커넥션을 뺏지 않는다
+_pools = {}
+_pool_lock = threading.Lock()
 
-def get_conn():
-    if not DATABASE_URL:
+
+def _url(tenant: tenants.Tenant, role: str) -> str:
+    if role == "primary":
+        return tenant.database_url or DATABASE_URL
+    return tenant.replica_url or REPLICA_DATABASE_URL
+
+
+def _connect_kwargs(tenant: tenants.Tenant) -> dict:
+    kwargs = {"options": f"-c search_path={tenant.schema}", "connect_timeout": DB_CONNECT_TIMEOUT_SEC, **_KEEPALIVES}
+    if DB_TCP_USER_TIMEOUT_MS > 0:
+        kwargs["tcp_user_timeout"] = DB_TCP_USER_TIMEOUT_MS
+    return kwargs
+
+
+def _get_pool(role: str = "primary", tenant: tenants.Tenant | None = None) -> BlockingPool:
+    tenant = tenant or tenants.current()
+    key = (tenant.id, role)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                url = _url(tenant, role)
+                if not url:
+                    raise RuntimeError("DATABASE_URL is required")
+                pool = BlockingPool(
+                    DB_POOL_MIN,
+                    tenant.pool_max or DB_POOL_MAX,
+                    url,
+                    connection_factory=PooledConnection,
+                    cursor_factory=ProfiledCursor,
+                    **_connect_kwargs(tenant),
+                )
+                _pools[key] = pool
+    return pool
+
+
+# ---- replica 지연 추적 (replica URL 단위) ----
+_lags = {}
+_lags_lock = threading.Lock()
+
+
+def _check_replica_lag(tenant: tenants.Tenant, state: dict) -> None:
+    conn = _get_pool("replica", tenant).getconn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                # WAL을 다 따라잡았으면 0 (한가할 때 replay_timestamp가 멈춰 보이는 문제 회피)
+                cur.execute("""
+                    select case
+                             when pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() then 0
+                             else coalesce(extract(epoch from now() - pg_last_xact_replay_timestamp()), 0)
+                           end as lag
+                """)
+                state["value"] = float(cur.fetchone()["lag"])
+                state["error"] = None
+    finally:
+        conn.close()
+
+
+def replica_lag(tenant: tenants.Tenant | None = None) -> float | None:
+    """마지막으로 측정한 replica 지연(초). 측정 실패/replica 없음이면 None"""
+    tenant = tenant or tenants.current()
+    url = _url(tenant, "replica")
+    if not url:
+        return None
+    state = _lags.get(url)
+    if state is None:
+        with _lags_lock:
+            state = _lags.setdefault(url, {"value": None, "checked_at": 0.0, "error": None, "lock": threading.Lock()})
+    now = time.monotonic()
+    if now - state["checked_at"] >= REPLICA_LAG_CHECK_SEC and state["lock"].acquire(blocking=False):
+        # 한 스레드만 측정하고, 나머지는 직전 값을 쓴다
+        try:
+            state["checked_at"] = now
+            _check_replica_lag(tenant, state)
+        except Exception as e:
+            state["value"] = None
+            state["error"] = str(e)[:300]
+        finally:
+            state["lock"].release()
+    return state["value"]
+
+
+# ---- read-your-writes ----
+_recent_writes = {}
+_recent_lock = threading.Lock()
+
+
+def mark_written(*keys) -> None:
+    """
+    쓰기 커밋 후 호출. keys 예: "order:<id>", "customer:<id>"
+    같은 키로 읽는 요청은 REPLICA_RYW_WINDOW_SEC 동안 primary로 간다.
+    """
+    tenant_id = tenants.current().id
+    now = time.monotonic()
+    with _recent_lock:
+        for k in keys:
+            if k:
+                _recent_writes[(tenant_id, k)] = now
+        if len(_recent_writes) > 10000:
+            cutoff = now - REPLICA_RYW_WINDOW_SEC
+            for k in [k for k, t in _recent_writes.items() if t < cutoff]:
+                del _recent_writes[k]
+
+
+def _recently_written(keys) -> bool:
+    tenant_id = tenants.current().id
+    cutoff = time.monotonic() - REPLICA_RYW_WINDOW_SEC
+    return any(_recent_writes.get((tenant_id, k), 0.0) >= cutoff for k in keys if k)
+
+
+def get_conn(readonly: bool = False, keys=(), wait: float | None = None):
+    """
+    현재 매장(tenants.current())의 풀에서 커넥션을 빌린다.
+    readonly=True 이면 replica로 보낼 수 있다. 단,
+    - replica가 없거나, 지연이 REPLICA_MAX_LAG_SEC를 넘거나, 측정 실패면 primary
+    - keys 중 하나라도 최근에 쓰였으면(read-your-writes) primary
+    wait: 풀이 다 찼을 때 기다리는 상한(초, 기본 DB_POOL_WAIT_SEC) → 넘으면 PoolExhausted
+    """
+    tenant = tenants.current()
+    # 프로파일 중인 요청이면 이 스레드(threadpool 워커)도 샘플링 대상
+    profiler.register_thread()
+    if readonly and _url(tenant, "replica") and not _recently_written(keys):
+        lag = replica_lag(tenant)
+        if lag is not None and lag <= REPLICA_MAX_LAG_SEC:
+            return _getconn(_get_pool("replica", tenant), wait)
+    return _getconn(_get_pool("primary", tenant), wait)
+
+
+def _getconn(pool, wait: float | None):
+    # 풀이 다 차서 기다린 시간도 요청의 DB 대기 (DB 가 느려지면 커넥션이 늦게 돌아온다)
+    meter = _db_wait.get()
+    started = time.perf_counter()
+    try:
+        return pool.getconn(wait=wait)
+    finally:
+        if meter is not None:
+            meter[0] += time.perf_counter() - started
+
+
+@contextmanager
+def socket_deadline(conn, timeout_sec: float | None):
+    """
+    timeout_sec 안에 블록이 안 끝나면 클라이언트 쪽에서 소켓을 끊는다 → 기다리던 execute/commit 이
+    OperationalError. statement_timeout 은 서버가 살아 응답해야 오므로, 서버/네트워크가 멈춘 경우의 상한.
+    끊긴 커넥션은 풀에 돌아갈 때 버려진다. 블록이 끝난 뒤에는 절대 끊지 않는다.
+    """
+    if not timeout_sec:
+        yield
+        return
+    lock = threading.Lock()
+    state = {"done": False}
+
+    def abort():
+        with lock:
+            if state["done"]:
+                return
+            try:
+                sock = socket.socket(fileno=os.dup(conn.fileno()))
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                finally:
+                    sock.close()
+            except OSError:
+                pass
+
+    timer = threading.Timer(timeout_sec, abort)
+    timer.daemon = True
+    timer.start()
+    try:
+        yield
+    finally:
+        with lock:
+            state["done"] = True
+        timer.cancel()
+
+
+def dedicated_conn(tenant: tenants.Tenant | None = None):
+    """
+    풀 밖의 전용 primary 커넥션 (LISTEN 처럼 오래 붙잡고 있는 용도, autocommit).
+    풀 슬롯을 차지하지 않으므로 호출한 쪽이 직접 close() 한다.
+    """
+    tenant = tenant or tenants.current()
+    url = _url(tenant, "primary")
+    if not url:
         raise RuntimeError("DATABASE_URL is required")
+    conn = psycopg2.connect(url, cursor_factory=RealDictCursor, **_connect_kwargs(tenant))
+    conn.autocommit = True
+    return conn
+
+
+def warm_pool() -> int:
+    """매장별 풀을 만들고 DB_POOL_MIN개 커넥션이 실제로 살아있는지 확인(startup warmup용)"""
+    warmed = 0
+    for tenant in tenants.all_tenants():
+        roles = ["primary", "replica"] if _url(tenant, "replica") else ["primary"]
+        for role in roles:
+            pool = _get_pool(role, tenant)
+            conns = [pool.getconn() for _ in range(max(DB_POOL_MIN, 1))]
+            try:
+                for conn in conns:
+                    with conn:
+                        with conn.cursor() as cur:
+                            cur.execute("select 1")
+            finally:
+                for conn in conns:
+                    conn.close()
+            warmed += len(conns)
+    return warmed
+
 
-    return psycopg2.connect(
-        DATABASE_URL,
-        cursor_factory=RealDictCursor,
-        options="-c search_path=store"
-    )
+def close_pool() -> None:
+    with _pool_lock:
+        for pool in _pools.values():
+            pool.closeall()
+        _pools.clear()
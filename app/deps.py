@@ -0,0 +1,66 @@
+# app/deps.py
+import time
+from typing import Optional
+
+from fastapi import HTTPException, Request
+
+from app import db, ratelimit, tenants
+from app.admission import AdmissionRejected, limiter_for
+
+
+async def admit_write():
+    """
+    쓰기 라우트용 dependency: `dependencies=[Depends(admit_write)]`
+    - async라서 대기 중인 요청은 threadpool 스레드를 점유하지 않는다.
+    - 대기열 초과/대기시간 초과 시 503 + Retry-After
+    - limiter는 매장별
+    """
+    write_limiter = limiter_for(tenants.current().id)
+    try:
+        await write_limiter.acquire()
+    except AdmissionRejected as e:
+        raise HTTPException(
+            503,
+            "server busy, retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    # limit 조정은 전체 시간이 아니라 DB 대기로 (app.admission)
+    db_wait = db.track_wait()
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        write_limiter.release(time.monotonic() - started, db_wait[0])
+
+
+def rate_limit(name: str, field: Optional[str] = None):
+    """
+    쓰기 라우트용 dependency 팩토리: `dependencies=[Depends(rate_limit("orders", "customerId")), Depends(admit_write)]`
+    - admit_write 보다 먼저 둔다 → 429 로 끝날 요청이 쓰기 슬롯을 잡거나
+      limiter 지연 샘플(min_rtt)을 짧게 만들지 않는다.
+    - IP 버킷 + (body 의 field 값이 있으면) name 버킷에서 토큰 1개씩 (둘 다 있을 때만 차감). 매장별로 따로 센다.
+    - 부족하면 429 + Retry-After
+    """
+    async def dependency(request: Request) -> None:
+        key = None
+        if field:
+            # body 는 Starlette 가 캐시하므로 핸들러의 payload 파싱이 다시 읽지 않는다
+            try:
+                body = await request.json()
+            except ValueError:
+                body = None  # 형식 오류는 payload 검증(422)에 맡긴다
+            if isinstance(body, dict) and isinstance(body.get(field), str):
+                key = body[field]
+        tenant_id = tenants.current().id
+        ip = ratelimit.client_ip(request.headers, request.client.host if request.client else None)
+        try:
+            ratelimit.check(("ip", f"{tenant_id}:{ip}" if ip else None), (name, f"{tenant_id}:{key}" if key else None))
+        except ratelimit.RateLimited as e:
+            raise HTTPException(
+                429,
+                "too many requests",
+                headers={"Retry-After": str(e.retry_after)},
+            )
+
+    return dependency
@@ -0,0 +1,183 @@
+# app/events.py
+"""
+주문 도메인 이벤트 버스 (프로세스 내)
+
+핸들러는 트랜잭션이 커밋된 뒤 publish() 만 부르고, 부수효과는 구독자가 처리한다.
+- inline 구독자: publish() 를 부른 스레드에서 바로 실행 (메모리 갱신처럼 싸고 즉시 보여야 하는 것:
+  read-your-writes 표시, 주방 집계, 주문내역 캐시)
+- 비동기 구독자: 제한된 워커 풀(EVENT_WORKERS)에서 요청 경로 밖으로 실행 (푸시 발송)
+  큐(EVENT_QUEUE_SIZE)가 가득 차면 publish 한 스레드에서 직접 실행(유실 대신 backpressure).
+  단 outbox=True 구독자(할 일이 이미 DB 에 남아 있는 것: 푸시는 queued notification_logs)는
+  요청 스레드에서 돌리지 않고 건너뛴다 → notify 재시도 스케줄러가 outbox 에서 가져가 보낸다.
+- 이벤트는 발행한 매장(tenant) 컨텍스트에서 실행된다. 프로파일 중인 요청이 발행했으면
+  비동기 구독자도 그 프로파일에 응답 뒤 구간으로 잡힌다(app.profiler.hold/attach).
+- stop() 은 큐에 남은 이벤트를 다 처리하고 워커를 끝낸다(shutdown drain).
+
+구독자 등록은 app.subscribers 에서 한 번에 한다.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Type
+
+from app import profiler, tenants
+
+log = logging.getLogger(__name__)
+
+EVENT_WORKERS = int(os.getenv("EVENT_WORKERS", "4"))
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "1000"))
+EVENT_DRAIN_TIMEOUT_SEC = float(os.getenv("EVENT_DRAIN_TIMEOUT_SEC", "10"))
+
+
+# ---- 이벤트 ----
+class OrderEvent:
+    def __init__(self, order_id: str, customer_id: Optional[str] = None,
+                 from_status: Optional[str] = None, notifications: Optional[List[Dict[str, Any]]] = None):
+        self.order_id = order_id
+        self.customer_id = customer_id
+        self.from_status = from_status
+        # 트랜잭션 안에서 queued 로 기록한 notification_logs 행(id, created_at). 커밋 후 발송 대상
+        self.notifications = notifications or []
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.order_id!r})"
+
+
+class OrderPlaced(OrderEvent):
+    to_status = "PLACED"
+
+    def __init__(self, order_id: str, customer_id: Optional[str], lines: list, owners: int = 0,
+                 summary: Optional[Dict[str, Any]] = None):
+        super().__init__(order_id, customer_id)
+        # 주방 집계용: (menu_item_id, name, qty, [(option_key, value_key, label)])
+        self.lines = lines
+        self.owners = owners
+        # 주문내역 캐시용: id, order_no, status, total_amount, created_at
+        self.summary = summary or {}
+
+
+class OrderAccepted(OrderEvent):
+    to_status = "ACCEPTED"
+
+
+class OrderCompleted(OrderEvent):
+    to_status = "COMPLETED"
+
+
+class OrderCanceled(OrderEvent):
+    to_status = "CANCELED"
+
+
+# ---- 구독 ----
+Handler = Callable[[OrderEvent], None]
+
+_inline: Dict[Type[OrderEvent], List[Handler]] = {}
+_async: Dict[Type[OrderEvent], List[Handler]] = {}
+# 큐가 가득 차면 건너뛰어도 되는 비동기 구독자 (outbox 를 다른 곳에서 처리)
+_outbox: Set[Handler] = set()
+
+
+def subscribe(*event_types: Type[OrderEvent], inline: bool = False, outbox: bool = False):
+    """
+    데코레이터: @subscribe(OrderAccepted, OrderCompleted) / @subscribe(OrderPlaced, inline=True)
+    outbox=True: 비동기 구독자의 할 일이 DB outbox 에 남아 있어 큐 초과 시 건너뛴다
+    """
+    def register(fn: Handler) -> Handler:
+        for t in event_types or (OrderEvent,):
+            (_inline if inline else _async).setdefault(t, []).append(fn)
+        if outbox:
+            _outbox.add(fn)
+        return fn
+    return register
+
+
+def _handlers(table: Dict[Type[OrderEvent], List[Handler]], event: OrderEvent) -> List[Handler]:
+    out = []
+    for t in type(event).__mro__:
+        out += table.get(t, [])
+    return out
+
+
+def _run(fn: Handler, event: OrderEvent, tenant: tenants.Tenant, prof: Optional[profiler.Profile] = None) -> None:
+    try:
+        with tenants.use(tenant), profiler.attach(prof, background=True):
+            fn(event)
+    except Exception:
+        log.exception("event subscriber %s failed for %r (tenant=%s)", getattr(fn, "__name__", fn), event, tenant.id)
+    finally:
+        profiler.release(prof)
+
+
+# ---- 워커 풀 ----
+_queue: "queue.Queue[Optional[Tuple[Handler, OrderEvent, tenants.Tenant, Optional[profiler.Profile]]]]" = \
+    queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+_workers: List[threading.Thread] = []
+_workers_lock = threading.Lock()
+_counts = {"published": 0, "inline": 0, "queued": 0, "overflow": 0, "outbox": 0, "done": 0}
+
+
+def _worker() -> None:
+    while True:
+        job = _queue.get()
+        try:
+            if job is None:
+                return
+            _run(*job)
+            _counts["done"] += 1
+        finally:
+            _queue.task_done()
+
+
+def start() -> None:
+    with _workers_lock:
+        if _workers:
+            return
+        for i in range(max(EVENT_WORKERS, 1)):
+            t = threading.Thread(target=_worker, name=f"events-{i}", daemon=True)
+            t.start()
+            _workers.append(t)
+
+
+def stop(timeout: float = EVENT_DRAIN_TIMEOUT_SEC) -> None:
+    """남은 이벤트를 처리한 뒤 워커 종료 (sentinel 은 큐 뒤에 붙으므로 앞선 작업이 먼저 끝난다)"""
+    with _workers_lock:
+        workers = list(_workers)
+        _workers.clear()
+    for _ in workers:
+        _queue.put(None)
+    deadline = time.monotonic() + timeout
+    for t in workers:
+        t.join(max(0.0, deadline - time.monotonic()))
+
+
+def publish(*events: OrderEvent) -> None:
+    """커밋 후 호출"""
+    tenant = tenants.current()
+    for event in events:
+        _counts["published"] += 1
+        for fn in _handlers(_inline, event):
+            _counts["inline"] += 1
+            _run(fn, event, tenant)
+        for fn in _handlers(_async, event):
+            if not _workers:
+                # 워커 없음(CLI/스크립트, 또는 shutdown 이후) → 그 자리에서
+                _run(fn, event, tenant)
+                continue
+            prof = profiler.hold()
+            try:
+                _queue.put_nowait((fn, event, tenant, prof))
+                _counts["queued"] += 1
+            except queue.Full:
+                profiler.release(prof)
+                if fn in _outbox:
+                    # 요청 스레드를 붙잡지 않는다: 스케줄러가 outbox 에서 가져간다
+                    _counts["outbox"] += 1
+                    continue
+                _counts["overflow"] += 1
+                _run(fn, event, tenant)
+
+
+def metrics() -> Dict[str, Any]:
+    return {**_counts, "pending": _queue.qsize(), "workers": len(_workers)}
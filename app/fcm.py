@@ -1,29 +1,281 @@
 # app/fcm.py
+"""
+FCM 발송 (firebase_admin)
+
+타임아웃 / circuit breaker
+- 호출마다 FCM_TIMEOUT_SEC: firebase 앱 옵션 httpTimeout + 호출 스레드에서 future 대기 상한
+  (FCM_TIMEOUT_SEC + 1초). 느린 FCM 이 발송 워커를 붙잡지 않는다.
+- 일시적 실패(타임아웃/네트워크/5xx, 또는 모든 토큰이 일시적 오류)가 FCM_BREAKER_FAILURES 번
+  연속이면 open → FCM_BREAKER_OPEN_SEC 동안 호출 없이 바로 CircuitOpenError.
+  (notify 는 이때 알림을 attempts 증가 없이 queued 로 남기고 retry_after 뒤로 미룬다)
+- open 시간이 지나면 half-open: 동시에 FCM_BREAKER_HALF_OPEN_PROBES 개까지만 시험 발송,
+  FCM_BREAKER_CLOSE_AFTER 번 성공하면 closed, 한 번이라도 실패하면 다시 open.
+- 토큰 만료/잘못된 인자 같은 영구 오류는 FCM 이 살아 있다는 뜻이므로 실패로 세지 않는다.
+- 타임아웃이 나도 이미 시작된 호출은 멈출 수 없어 executor 스레드를 계속 잡고 있다.
+  그래서 실행 중인 호출이 FCM_MAX_INFLIGHT 개면 executor 에 쌓지 않고 바로 FcmSaturatedError
+  (CircuitOpenError 라 notify 는 똑같이 미룬다). 큐에서 기다리다 시작도 못 한 호출의 타임아웃은
+  FCM 실패가 아니므로 breaker 에 세지 않는다.
+- 상태: breaker.snapshot() (GET /admin/notifications/fcm, /ready)
+"""
 import os
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
 from typing import List, Dict, Any, Optional, Tuple
 
-import firebase_admin
-from firebase_admin import credentials, messaging
+from app import profiler
+
+FCM_TIMEOUT_SEC = float(os.getenv("FCM_TIMEOUT_SEC", "5"))
+FCM_MAX_INFLIGHT = int(os.getenv("FCM_MAX_INFLIGHT", "8"))
+FCM_BREAKER_FAILURES = int(os.getenv("FCM_BREAKER_FAILURES", "5"))
+FCM_BREAKER_OPEN_SEC = float(os.getenv("FCM_BREAKER_OPEN_SEC", "30"))
+FCM_BREAKER_HALF_OPEN_PROBES = int(os.getenv("FCM_BREAKER_HALF_OPEN_PROBES", "1"))
+FCM_BREAKER_CLOSE_AFTER = int(os.getenv("FCM_BREAKER_CLOSE_AFTER", "2"))
+
+# firebase_admin은 import만으로도 무겁다(google-auth, grpc 등) → 처음 필요할 때 import
+_app = None
+_app_lock = threading.Lock()
+
+
+class CircuitOpenError(ConnectionError):
+    """breaker 가 열려 있어 호출하지 않음. retry_after 초 뒤에 다시 시도"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"fcm circuit open (retry after {retry_after:.0f}s)")
+        self.retry_after = retry_after
+
+
+class FcmSaturatedError(CircuitOpenError):
+    """FCM 호출 스레드가 전부 (멈춘 호출 등으로) 사용 중. 호출하지 않음"""
+
+    def __init__(self, retry_after: float):
+        ConnectionError.__init__(self, f"fcm executor saturated (retry after {retry_after:.0f}s)")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failures: int, open_sec: float, probes: int, close_after: int):
+        self.failures = failures
+        self.open_sec = open_sec
+        self.probes = probes
+        self.close_after = close_after
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = 0
+        self._probe_ok = 0
+        self.counts = {"calls": 0, "ok": 0, "failures": 0, "timeouts": 0, "rejected": 0, "opened": 0,
+                       "saturated": 0, "notStarted": 0}
+
+    def before(self) -> bool:
+        """호출 전. 허용되면 probe 여부를 돌려주고, 아니면 CircuitOpenError"""
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self._opened_at + self.open_sec - time.monotonic()
+                if remaining > 0:
+                    self.counts["rejected"] += 1
+                    raise CircuitOpenError(remaining)
+                self.state, self._probing, self._probe_ok = self.HALF_OPEN, 0, 0
+            if self.state == self.HALF_OPEN:
+                if self._probing >= self.probes:
+                    self.counts["rejected"] += 1
+                    raise CircuitOpenError(1.0)
+                self._probing += 1
+                self.counts["calls"] += 1
+                return True
+            self.counts["calls"] += 1
+            return False
+
+    def success(self, probe: bool) -> None:
+        with self._lock:
+            self.counts["ok"] += 1
+            self._consecutive = 0
+            if probe and self.state == self.HALF_OPEN:
+                self._probing -= 1
+                self._probe_ok += 1
+                if self._probe_ok >= self.close_after:
+                    self.state = self.CLOSED
+
+    def failure(self, probe: bool, timeout: bool = False) -> None:
+        with self._lock:
+            self.counts["failures"] += 1
+            self.counts["timeouts"] += timeout
+            self._consecutive += 1
+            if probe and self.state == self.HALF_OPEN:
+                self._probing -= 1
+                self._open()
+            elif self.state == self.CLOSED and self._consecutive >= self.failures:
+                self._open()
+
+    def abandon(self, probe: bool, reason: str) -> None:
+        """before() 는 통과했지만 FCM 까지 가지 않은 호출 (성공/실패 어느 쪽으로도 세지 않는다)"""
+        with self._lock:
+            self.counts["calls"] -= 1
+            self.counts[reason] += 1
+            if probe and self.state == self.HALF_OPEN:
+                self._probing -= 1
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.counts["opened"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_after = None
+            if self.state == self.OPEN:
+                retry_after = round(max(0.0, self._opened_at + self.open_sec - time.monotonic()), 1)
+            return {
+                "state": self.state,
+                "consecutiveFailures": self._consecutive,
+                "retryAfterSec": retry_after,
+                "config": {
+                    "timeoutSec": FCM_TIMEOUT_SEC, "failures": self.failures, "openSec": self.open_sec,
+                    "halfOpenProbes": self.probes, "closeAfter": self.close_after,
+                },
+                **self.counts,
+            }
+
+
+breaker = CircuitBreaker(FCM_BREAKER_FAILURES, FCM_BREAKER_OPEN_SEC,
+                         FCM_BREAKER_HALF_OPEN_PROBES, FCM_BREAKER_CLOSE_AFTER)
+# 호출 스레드가 FCM 응답을 무한정 기다리지 않도록 실제 호출은 여기서
+_executor = ThreadPoolExecutor(max_workers=FCM_MAX_INFLIGHT, thread_name_prefix="fcm")
+# executor 에서 실행 중(또는 곧 시작할) 호출 수. 타임아웃 난 호출도 실제로 끝날 때까지 자리를 잡는다
+_slots = threading.BoundedSemaphore(FCM_MAX_INFLIGHT)
+
 
 def _get_app():
+    if _app is not None:
+        return _app
+    # warmup 스레드와 첫 요청이 동시에 initialize_app 하지 않도록
+    with _app_lock:
+        return _init_app()
+
+
+def _init_app():
+    global _app
+    if _app is not None:
+        return _app
+
+    import firebase_admin
+    from firebase_admin import credentials
+
     if firebase_admin._apps:
-        return firebase_admin.get_app()
+        _app = firebase_admin.get_app()
+        return _app
 
     path = os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH", "").strip()
     raw = os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON", "").strip()
 
+    options = {"httpTimeout": FCM_TIMEOUT_SEC}
     if path:
         cred = credentials.Certificate(path)
-        return firebase_admin.initialize_app(cred)
+        _app = firebase_admin.initialize_app(cred, options)
+        return _app
 
     if raw:
         cred = credentials.Certificate(json.loads(raw))
-        return firebase_admin.initialize_app(cred)
+        _app = firebase_admin.initialize_app(cred, options)
+        return _app
 
     raise RuntimeError("Missing FIREBASE_SERVICE_ACCOUNT_PATH or FIREBASE_SERVICE_ACCOUNT_JSON")
 
 
+def _messaging():
+    from firebase_admin import messaging
+    return messaging
+
+
+def warm_app() -> bool:
+    """
+    startup warmup용: credential 파싱/앱 초기화를 첫 푸시 전에 끝내둔다.
+    자격증명이 설정되지 않은 환경(로컬 등)이면 False.
+    """
+    if not (os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH", "").strip() or os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON", "").strip()):
+        return False
+    _get_app()
+    _messaging()
+    return True
+
+
+def is_transient(exc: Optional[BaseException]) -> bool:
+    """
+    다시 보내면 성공할 수 있는 에러인지 (네트워크/일시적 서버 오류/쿼터)
+    토큰 만료(UNREGISTERED), 잘못된 인자, 인증 오류 등은 재시도해도 소용없음 → False
+    """
+    if exc is None:
+        return False
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+
+    from firebase_admin import exceptions as fb_exc
+    transient = (
+        fb_exc.UnavailableError,
+        fb_exc.InternalError,
+        fb_exc.DeadlineExceededError,
+        fb_exc.ResourceExhaustedError,  # messaging.QuotaExceededError 포함
+        fb_exc.UnknownError,
+    )
+    if isinstance(exc, transient):
+        return True
+
+    try:
+        import requests
+        if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+    except ImportError:
+        pass
+    return False
+
+
+def _call(fn, msg):
+    """breaker + 타임아웃을 거친 FCM 호출. 응답의 토큰이 전부 일시적 오류여도 실패로 센다"""
+    probe = breaker.before()
+    if not _slots.acquire(blocking=False):
+        # 멈춘 호출들이 스레드를 다 잡고 있다: 큐에 쌓으면 시작도 못 하고 타임아웃만 난다
+        breaker.abandon(probe, "saturated")
+        raise FcmSaturatedError(FCM_TIMEOUT_SEC)
+    # 프로파일 중인 요청/구독자면 executor 스레드도 같은 프로파일에 [fcm wait] 로 잡히게
+    bound = profiler.bind(fn, waiting="fcm")
+
+    def run(m):
+        try:
+            return bound(m)
+        finally:
+            _slots.release()
+
+    future = _executor.submit(run, msg)
+    try:
+        with profiler.wait("fcm"):
+            resp = future.result(timeout=FCM_TIMEOUT_SEC + 1)
+    except FutureTimeout:
+        if future.cancel():
+            # 시작도 못 한 호출 (FCM 은 아무것도 받지 않았다)
+            _slots.release()
+            breaker.abandon(probe, "notStarted")
+            raise FcmSaturatedError(FCM_TIMEOUT_SEC)
+        breaker.failure(probe, timeout=True)
+        raise TimeoutError(f"fcm call timed out after {FCM_TIMEOUT_SEC:g}s")
+    except Exception as e:
+        if is_transient(e):
+            breaker.failure(probe)
+        else:
+            breaker.success(probe)
+        raise
+    responses = getattr(resp, "responses", None) or []
+    if responses and all(not r.success and is_transient(r.exception) for r in responses):
+        breaker.failure(probe)
+    else:
+        breaker.success(probe)
+    return resp
+
+
 def send_fcm_to_tokens(
     tokens: List[str],
     title: str,
@@ -38,6 +290,7 @@ def send_fcm_to_tokens(
         return {"ok": True, "sent": 0, "failed": 0, "results": []}
 
     _get_app()
+    messaging = _messaging()
 
     # FCM data는 string만 허용
     safe_data = {k: str(v) for k, v in (data or {}).items()}
@@ -48,7 +301,7 @@ def send_fcm_to_tokens(
         data=safe_data,
     )
 
-    resp = messaging.send_each_for_multicast(msg)
+    resp = _call(messaging.send_each_for_multicast, msg)
 
     results = []
     for idx, r in enumerate(resp.responses):
@@ -57,6 +310,7 @@ def send_fcm_to_tokens(
             "success": r.success,
             "message_id": getattr(r, "message_id", None),
             "exception": str(r.exception) if r.exception else None,
+            "transient": is_transient(r.exception),
         })
 
     return {
@@ -76,6 +330,7 @@ def send_push_to_tokens(tokens: List[str], title: str, body: str, data: Dict[str
         return 0, []
 
     _get_app()
+    messaging = _messaging()
 
     # multicast (최대 500개)
     msg = messaging.MulticastMessage(
@@ -84,7 +339,7 @@ def send_push_to_tokens(tokens: List[str], title: str, body: str, data: Dict[str
         tokens=tokens,
     )
 
-    resp = messaging.send_multicast(msg)
+    resp = _call(messaging.send_each_for_multicast, msg)
     results: List[Dict[str, Any]] = []
     for i, r in enumerate(resp.responses):
         if r.success:
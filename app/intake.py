@@ -0,0 +1,412 @@
+# app/intake.py
+"""
+주문 접수(intake): DB 저장 + DB 장애 시 로컬 journal
+
+INTAKE_MODE
+- direct   : 지금처럼 바로 DB에 저장 (기본)
+- fallback : DB에 저장하다 DB 장애(연결 끊김, 풀 고갈, INTAKE_DB_TIMEOUT_MS 초과)면 journal 에 적고 접수증 반환.
+             INTAKE_DB_TIMEOUT_MS 는 풀 대기 / statement_timeout / 클라이언트 소켓 상한(db.socket_deadline)에
+             각각 걸린다 → 서버가 응답을 못 하는 stall 에도 그 안에 journal 로 넘어간다.
+             새 커넥션 connect 는 db.DB_CONNECT_TIMEOUT_SEC 로 따로 묶인다.
+             가격 계산에 쓰는 메뉴는 캐시가 만료됐거나(옛 값) 비어 있으면(디스크 사본) DB 없이 계산한다(app.pricing).
+- journal  : 항상 journal 에 적고 접수증 반환 → replayer 가 DB에 저장
+
+journal
+- 매장별 INTAKE_JOURNAL_DIR/<tenant>.journal: 가격 계산까지 끝난 주문 1건 = JSON 1줄,
+  append 후 fsync 하고 나서야 접수증을 돌려준다 (프로세스가 죽어도 남는다).
+- 여러 워커 프로세스가 같은 파일에 append (flock). replay 는 한 프로세스만 (<tenant>.replay.lock).
+- 어디까지 DB에 넣었는지는 <tenant>.offset (byte offset, rename 으로 원자적 갱신).
+  다 따라잡으면 journal 을 비운다.
+- 주문 id 는 접수 시점에 메모리에서 만든다 → replay 는 `on conflict (id) do nothing` 이라
+  같은 줄을 두 번 넣어도(offset 저장 전에 죽은 경우, 직접 저장이 커밋된 뒤 에러가 난 경우) 한 번만 들어간다.
+- replay 된 주문도 직접 저장과 같은 insert_order() + OrderPlaced 이벤트(주방/주문내역/사장님 푸시)를 탄다.
+  이미 들어가 있던 주문(중복)도 아직 PLACED 면 OrderPlaced 를 다시 낸다 — 먼저 커밋한 쪽이 발행 전에 죽었거나
+  커밋 응답을 못 받고 journal 로 넘어온 경우. 구독자들은 같은 주문을 두 번 받아도 한 번만 반영한다.
+- DB 가 받지 않는 주문(제약 위반 등)이나 읽을 수 없는 항목은 <tenant>.rejected 로 빼고 넘어간다.
+- 접수증만 받은 주문은 replay 전까지 GET /orders/{id} 가 pending 으로 보여준다.
+  받은 프로세스는 메모리에서, 같은 호스트의 다른 워커는 journal 의 아직 replay 안 된 부분에서 찾는다.
+  다른 호스트의 journal 은 보이지 않는다(그 호스트가 replay 하기 전까지 404).
+- 메뉴 캐시가 비어 있고 디스크 사본도 없는데 DB 까지 안 되면 가격을 계산할 수 없다 → 주문은 503 (app.routers.orders).
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from app import db, events, kitchen, notify, pricing, stats, tenants
+from app.db import DB_UNAVAILABLE, get_conn
+
+log = logging.getLogger(__name__)
+
+INTAKE_MODE = os.getenv("INTAKE_MODE", "direct")  # direct | fallback | journal
+INTAKE_JOURNAL_DIR = os.getenv("INTAKE_JOURNAL_DIR", "var/intake")
+INTAKE_REPLAY_SEC = float(os.getenv("INTAKE_REPLAY_SEC", "1"))
+INTAKE_REPLAY_BATCH = int(os.getenv("INTAKE_REPLAY_BATCH", "200"))
+# fallback 모드에서 직접 저장을 포기하고 journal 로 넘기는 시간 (풀 대기 / statement / 소켓 각각)
+# (이 에러면 DB가 잠깐 멈춘 것으로 보고 journal 로 받는다: db.DB_UNAVAILABLE)
+INTAKE_DB_TIMEOUT_MS = int(os.getenv("INTAKE_DB_TIMEOUT_MS", "3000"))
+
+
+# ---- DB 저장 (create_order / replay 공용) ----
+def insert_order(cur, order_id: str, customer_id: Optional[str], note: Optional[str], priced: Dict[str, Any],
+                 created_at: Optional[str] = None) -> Optional[Tuple[Dict[str, Any], list, List[Dict[str, Any]]]]:
+    """
+    주문/라인/옵션/상태로그 + 통계 롤업 + 사장님 새 주문 알림(queued) 기록. 트랜잭션은 호출부.
+    returns: (주문 요약, 주방 집계용 라인, 사장님 user id) / 이미 있는 id 면 None
+    """
+    cur.execute("""
+        insert into orders (id, customer_id, status, customer_note, total_amount, created_at)
+        values (%s, %s, 'PLACED', %s, %s, coalesce(%s::timestamptz, now()))
+        on conflict (id) do nothing
+        returning id::text as id, order_no, status, total_amount, created_at
+    """, (order_id, customer_id, note, priced["totalAmount"], created_at))
+    out = cur.fetchone()
+    if out is None:
+        return None
+
+    kitchen_lines = []  # 커밋 후 주방 집계 반영용
+    for line in priced["lines"]:
+        option_rows = line["options"]
+        kitchen_lines.append((line["menuItemId"], line["name"], line["qty"], [(r[0], r[2], r[3]) for r in option_rows]))
+
+        cur.execute("""
+            insert into order_items (order_id, menu_item_id, name_snapshot, price_snapshot, qty, line_amount)
+            values (%s, %s, %s, %s, %s, %s)
+            returning id::text as id
+        """, (order_id, line["menuItemId"], line["name"], line["unitPrice"], line["qty"], line["lineAmount"]))
+        order_item_id = cur.fetchone()["id"]
+
+        if option_rows:
+            execute_values(cur, """
+                insert into order_item_options
+                  (order_item_id, option_key, option_name, value_key, value_label, price_delta)
+                values %s
+            """, [(order_item_id, *r) for r in option_rows])
+
+    cur.execute("""
+        insert into order_status_logs(order_id, from_status, to_status, changed_by, created_at)
+        values (%s, null, 'PLACED', %s, %s)
+    """, (order_id, customer_id, out["created_at"]))
+    # 통계 롤업도 같은 트랜잭션 (커밋되면 정확히 한 번 반영)
+    stats.record_placed(cur, order_id)
+
+    # 사장님/관리자에게 "새 주문" 푸시: queued 기록만 (발송은 커밋 후 묶어서: app.notify)
+    owners = notify.owner_ids(cur)
+    notify.queue_logs(
+        cur, order_id, owners, tenants.current().name,
+        f"새 주문이 들어왔습니다! (주문번호 {out['order_no']})",
+        {"type": "new_order", "orderId": order_id, "nextStatus": "PLACED"},
+        notify.PRIORITY_OWNER, coalesce_key="new_order",
+    )
+    return out, kitchen_lines, owners
+
+
+def save_order(order_id: str, customer_id: Optional[str], note: Optional[str], priced: Dict[str, Any],
+               created_at: Optional[str] = None, timeout_ms: Optional[int] = None,
+               cart=None) -> Optional[Tuple[Dict[str, Any], int]]:
+    """
+    트랜잭션 하나로 저장 후 OrderPlaced 발행. returns: (주문 요약, 사장님 수) / 이미 있으면 None
+    cart(주문 요청 items)를 주면 priced 의 메뉴 버전을 트랜잭션 안에서 확인하고 바뀌었으면 다시 계산한다.
+    (journal replay 는 cart 없이 → 접수증에 적힌 금액 그대로)
+    timeout_ms: 풀 대기 / statement_timeout / 트랜잭션 전체 소켓 상한. 넘으면 DB_UNAVAILABLE
+    이미 있는 주문이 아직 PLACED 면 OrderPlaced 는 다시 발행한다(모듈 설명 참고).
+    """
+    timeout_sec = timeout_ms / 1000 if timeout_ms else None
+    conn = get_conn(wait=timeout_sec)
+    try:
+        with db.socket_deadline(conn, timeout_sec):
+            with conn:
+                with conn.cursor() as cur:
+                    if timeout_ms:
+                        cur.execute("select set_config('statement_timeout', %s, true)", (str(timeout_ms),))
+                    if cart is not None:
+                        priced = pricing.reprice_if_stale(cur, cart, priced)
+                    saved = insert_order(cur, order_id, customer_id, note, priced, created_at)
+                    existing = _load_placed(cur, order_id) if saved is None else None
+        if saved is None:
+            if existing is not None:
+                out, kitchen_lines, owners = existing
+                events.publish(events.OrderPlaced(out["id"], out["customer_id"], kitchen_lines,
+                                                  owners=owners, summary=out))
+            return None
+        out, kitchen_lines, owners = saved
+        # 커밋 후: 주방 집계 / 주문내역 캐시 / 묶음 푸시 타이머 (app.subscribers)
+        events.publish(events.OrderPlaced(order_id, customer_id, kitchen_lines, owners=len(owners), summary=out))
+        return out, len(owners)
+    finally:
+        conn.close()
+
+
+def _load_placed(cur, order_id: str) -> Optional[Tuple[Dict[str, Any], list, int]]:
+    """이미 있는 주문이 아직 PLACED 면 OrderPlaced 에 필요한 것들 (이미 진행된 주문은 그 뒤 이벤트가 맞다)"""
+    cur.execute("""
+        select id::text as id, customer_id::text as customer_id, order_no, status, total_amount, created_at
+        from orders
+        where id=%s and status='PLACED'
+    """, (order_id,))
+    out = cur.fetchone()
+    if out is None:
+        return None
+    lines = kitchen.load_lines(cur, [order_id]).get(order_id, [])
+    return out, lines, len(notify.owner_ids(cur))
+
+
+# ---- journal ----
+class Journal:
+    def __init__(self, tenant_id: str, directory: str = INTAKE_JOURNAL_DIR):
+        self.directory = directory
+        self.path = os.path.join(directory, f"{tenant_id}.journal")
+        self.offset_path = os.path.join(directory, f"{tenant_id}.offset")
+        self.replay_lock_path = os.path.join(directory, f"{tenant_id}.replay.lock")
+        self.rejected_path = os.path.join(directory, f"{tenant_id}.rejected")
+        self._lock = threading.Lock()
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        line = (json.dumps(entry, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                size = os.fstat(fd).st_size
+                # 이전 프로세스가 쓰다 죽어 끝이 잘린 줄이 있으면 거기에 붙이지 않는다
+                if size and os.pread(fd, 1, size - 1) != b"\n":
+                    line = b"\n" + line
+                os.write(fd, line)
+                os.fsync(fd)
+            finally:
+                os.close(fd)  # flock 도 같이 풀린다
+
+    def offset(self) -> int:
+        try:
+            with open(self.offset_path, encoding="ascii") as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _save_offset(self, offset: int) -> None:
+        tmp = self.offset_path + ".tmp"
+        with open(tmp, "w", encoding="ascii") as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.offset_path)
+
+    def read(self, offset: int, limit: int) -> List[Tuple[int, Dict[str, Any]]]:
+        """offset 이후 완전한 줄만 (쓰는 중인 마지막 줄은 다음 번에). returns [(다음 offset, entry | None)]"""
+        if not os.path.exists(self.path):
+            return []
+        out = []
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            while len(out) < limit:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                try:
+                    out.append((offset, json.loads(line)))
+                except ValueError:
+                    # 쓰다 죽어 잘린 줄 (접수증을 돌려주지 않은 주문) → 건너뛴다
+                    log.warning("skipping torn intake journal line in %s", self.path)
+                    out.append((offset, None))
+        return out
+
+    def commit(self, offset: int) -> None:
+        """offset 까지 DB 반영 완료. 다 따라잡았으면 journal 을 비운다"""
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size == offset:
+                # offset 을 먼저 0 으로: 그 사이에 죽으면 다시 replay(중복은 on conflict 로 무시)될 뿐 빠지지 않는다
+                self._save_offset(0)
+                os.ftruncate(fd, 0)
+                os.fsync(fd)
+            else:
+                self._save_offset(offset)
+        finally:
+            os.close(fd)
+
+    def reject(self, entry: Any, error: str) -> None:
+        """DB가 받지 않는 주문(없는 손님 id 등)이나 읽을 수 없는 항목은 따로 빼 두고 넘어간다 → 뒤 주문을 막지 않게"""
+        record = {**entry, "error": error} if isinstance(entry, dict) else {"entry": entry, "error": error}
+        with open(self.rejected_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def find(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """아직 replay 안 된 부분(offset 이후)에서 주문 하나 (다른 워커가 받은 주문 조회용)"""
+        needle = json.dumps(order_id).encode("utf-8")
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset())
+                for line in f:
+                    if needle not in line or not line.endswith(b"\n"):
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(entry, dict) and entry.get("id") == order_id:
+                        return entry
+        except FileNotFoundError:
+            pass
+        return None
+
+    def backlog_bytes(self) -> int:
+        try:
+            return max(0, os.path.getsize(self.path) - self.offset())
+        except FileNotFoundError:
+            return 0
+
+
+_journals: Dict[str, Journal] = {}
+_journals_lock = threading.Lock()
+# (tenant_id, order_id) -> 접수증 (replay 전까지 GET /orders/{id} 용)
+_pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_counts = {"journaled": 0, "replayed": 0, "duplicates": 0, "rejected": 0, "replayErrors": 0}
+
+
+def journal(tenant: Optional[tenants.Tenant] = None) -> Journal:
+    tenant = tenant or tenants.current()
+    j = _journals.get(tenant.id)
+    if j is None:
+        with _journals_lock:
+            j = _journals.setdefault(tenant.id, Journal(tenant.id))
+    return j
+
+
+def accept(order_id: str, customer_id: Optional[str], note: Optional[str], priced: Dict[str, Any]) -> Dict[str, Any]:
+    """journal 에 fsync 로 적고 접수증 반환 (DB 안 탐)"""
+    tenant = tenants.current()
+    received_at = datetime.now(timezone.utc).isoformat()
+    journal(tenant).append({
+        "id": order_id, "customerId": customer_id, "customerNote": note,
+        "priced": priced, "receivedAt": received_at,
+    })
+    receipt = _receipt(order_id, priced, received_at)
+    _pending[(tenant.id, order_id)] = receipt
+    _counts["journaled"] += 1
+    return receipt
+
+
+def _receipt(order_id: str, priced: Dict[str, Any], received_at: str) -> Dict[str, Any]:
+    return {
+        "id": order_id, "order_no": None, "status": "PLACED", "total_amount": priced["totalAmount"],
+        "created_at": received_at, "pending": True,
+    }
+
+
+def pending(order_id: str) -> Optional[Dict[str, Any]]:
+    """replay 전인 접수증 (이 프로세스가 받은 것 → 같은 호스트 journal 순)"""
+    tenant = tenants.current()
+    receipt = _pending.get((tenant.id, order_id))
+    if receipt is not None:
+        return receipt
+    j = journal(tenant)
+    if not j.backlog_bytes():
+        return None
+    entry = j.find(order_id)
+    if entry is None:
+        return None
+    try:
+        return _receipt(order_id, entry["priced"], entry["receivedAt"])
+    except (KeyError, TypeError):
+        return None
+
+
+def replay(limit: int = INTAKE_REPLAY_BATCH) -> Dict[str, int]:
+    """현재 매장 journal 에서 아직 안 넣은 주문을 DB로. DB 가 아직 안 되면 그 자리에서 멈춘다(순서 유지)"""
+    out = {"replayed": 0, "duplicates": 0, "rejected": 0}
+    tenant = tenants.current()
+    j = journal(tenant)
+    if not os.path.exists(j.path):
+        return out
+    fd = os.open(j.replay_lock_path, os.O_WRONLY | os.O_CREAT, 0o600)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return out  # 다른 프로세스가 replay 중
+        offset = j.offset()
+        if offset > os.path.getsize(j.path):
+            offset = 0
+        done = offset
+        try:
+            for next_offset, e in j.read(offset, limit):
+                if e is None:
+                    done = next_offset
+                    continue
+                order_id = e.get("id") if isinstance(e, dict) else None
+                try:
+                    saved = save_order(e["id"], e["customerId"], e["customerNote"], e["priced"], created_at=e["receivedAt"])
+                    out["replayed" if saved else "duplicates"] += 1
+                except DB_UNAVAILABLE:
+                    raise
+                except Exception as err:
+                    # 제약 위반 같은 DB 거절이든 항목이 깨진 것(KeyError 등)이든 다시 해도 같다 → 빼고 넘어간다
+                    if isinstance(err, psycopg2.Error):
+                        log.error("intake replay rejected order %s (tenant=%s): %s", order_id, tenant.id, err)
+                    else:
+                        log.exception("intake replay rejected malformed entry %s (tenant=%s)", order_id, tenant.id)
+                    j.reject(e, (str(err).strip() or type(err).__name__)[:1000])
+                    out["rejected"] += 1
+                _pending.pop((tenant.id, order_id), None)
+                done = next_offset
+        except DB_UNAVAILABLE:
+            _counts["replayErrors"] += 1
+        finally:
+            if done != offset:
+                j.commit(done)
+        for k, v in out.items():
+            _counts[k] += v
+        return out
+    finally:
+        os.close(fd)
+
+
+def metrics() -> Dict[str, Any]:
+    return {
+        "mode": INTAKE_MODE, **_counts, "pending": len(_pending),
+        "backlogBytes": {t.id: journal(t).backlog_bytes() for t in tenants.all_tenants()},
+    }
+
+
+# ---- replayer ----
+_stop = threading.Event()
+_replayer: threading.Thread | None = None
+
+
+def _replay_loop() -> None:
+    while not _stop.wait(INTAKE_REPLAY_SEC):
+        for tenant in tenants.all_tenants():
+            try:
+                with tenants.use(tenant):
+                    while not _stop.is_set() and sum(replay().values()) > 0:
+                        pass
+            except Exception:
+                log.exception("intake replay failed (tenant=%s)", tenant.id)
+
+
+def start_replayer() -> None:
+    global _replayer
+    if _replayer is not None or INTAKE_REPLAY_SEC <= 0:
+        return
+    _stop.clear()
+    _replayer = threading.Thread(target=_replay_loop, name="intake-replayer", daemon=True)
+    _replayer.start()
+
+
+def stop_replayer() -> None:
+    global _replayer
+    _stop.set()
+    if _replayer is not None:
+        _replayer.join(timeout=INTAKE_REPLAY_SEC + 5)
+        _replayer = None
@@ -0,0 +1,314 @@
+# app/kitchen.py
+"""
+주방 디스플레이용 "메뉴별 밀린 수량" 집계 (프로세스 메모리, 매장별)
+
+- 시작 시 PLACED/ACCEPTED 주문으로 seed() 하고,
+  이후 create_order / 접수 / 완료 / 취소가 커밋된 뒤 order_placed / order_status_changed 로 갱신.
+- 다른 워커 프로세스가 처리한 주문은 app.peer_events(LISTEN/NOTIFY)가 peer_changed() 로 반영하고,
+  그 연결이 끊겼다 붙으면 resync() 로 DB와 다시 맞춘다(놓친 변경, 없어진 주문까지).
+- 메뉴별 + (메뉴, 옵션값)별로 placed(접수 전) / accepted(조리 중) 수량을 들고 있다.
+- 바뀐 행만 delta로 SSE 구독자에게 push → 주방 화면은 새로고침 비용이 없다.
+- 모든 함수는 현재 매장(tenants.current()) 기준.
+"""
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import tenants
+from app.db import get_conn
+
+PENDING = ("PLACED", "ACCEPTED")
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+class _Board:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seeded = False
+        self.version = 0
+        # order_id -> {"status": str, "lines": [(menu_item_id, name, qty, [(option_key, value_key, label)])]}
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        # menu_item_id -> {"menuItemId", "name", "placed", "accepted"}
+        self.items: Dict[str, Dict[str, Any]] = {}
+        # (menu_item_id, option_key, value_key) -> {..., "placed", "accepted"}
+        self.options: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        # seed 도중 끝난 주문이 다시 살아나지 않게 최근 종료 주문을 기억
+        self.closed: deque = deque(maxlen=5000)
+        # resync 도중 이벤트로 바뀐 주문(DB에서 읽은 값보다 최신) / resync 중이 아니면 None
+        self.resync_touched: Optional[set] = None
+        self.seed_lock = threading.Lock()
+        # SSE 구독자: (loop, queue)
+        self.subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+
+
+_boards: Dict[str, _Board] = {}
+_boards_lock = threading.Lock()
+
+
+def _board() -> _Board:
+    tenant_id = tenants.current().id
+    board = _boards.get(tenant_id)
+    if board is None:
+        with _boards_lock:
+            board = _boards.setdefault(tenant_id, _Board())
+    return board
+
+
+def _column(status: str) -> Optional[str]:
+    return {"PLACED": "placed", "ACCEPTED": "accepted"}.get(status)
+
+
+def _apply(b: _Board, order: Dict[str, Any], status: str, sign: int, changed_items: set, changed_opts: set) -> None:
+    col = _column(status)
+    if not col:
+        return
+    for menu_item_id, name, qty, opts in order["lines"]:
+        it = b.items.setdefault(menu_item_id, {"menuItemId": menu_item_id, "name": name, "placed": 0, "accepted": 0})
+        it[col] += sign * qty
+        changed_items.add(menu_item_id)
+        for option_key, value_key, label in opts:
+            key = (menu_item_id, option_key, value_key)
+            ov = b.options.setdefault(key, {
+                "menuItemId": menu_item_id, "optionKey": option_key, "valueKey": value_key,
+                "label": label, "placed": 0, "accepted": 0,
+            })
+            ov[col] += sign * qty
+            changed_opts.add(key)
+
+
+def _delta(b: _Board, changed_items: set, changed_opts: set) -> Dict[str, Any]:
+    b.version += 1
+    items, options = [], []
+    for k in changed_items:
+        row = b.items.get(k)
+        if row and row["placed"] == 0 and row["accepted"] == 0:
+            del b.items[k]
+            items.append({**row, "removed": True})
+        elif row:
+            items.append(dict(row))
+    for k in changed_opts:
+        row = b.options.get(k)
+        if row and row["placed"] == 0 and row["accepted"] == 0:
+            del b.options[k]
+            options.append({**row, "removed": True})
+        elif row:
+            options.append(dict(row))
+    return {"version": b.version, "items": items, "options": options}
+
+
+def _offer(q: asyncio.Queue, msg) -> None:
+    # 루프 스레드에서 실행. 느린 구독자는 큐를 비우고 전체 스냅샷으로 다시 맞춘다(None)
+    try:
+        q.put_nowait(msg)
+    except asyncio.QueueFull:
+        while not q.empty():
+            q.get_nowait()
+        q.put_nowait(None)
+
+
+def _publish(b: _Board, delta: Dict[str, Any]) -> None:
+    for loop, q in list(b.subscribers):
+        try:
+            loop.call_soon_threadsafe(_offer, q, delta)
+        except RuntimeError:
+            # 루프가 이미 닫힘
+            pass
+
+
+# ---- 갱신 ----
+def order_placed(order_id: str, lines: List[Tuple[str, str, int, List[Tuple[str, str, str]]]]) -> None:
+    """create_order 커밋 후 호출. lines: (menu_item_id, name, qty, [(option_key, value_key, label)])"""
+    b = _board()
+    with b.lock:
+        if b.resync_touched is not None:
+            b.resync_touched.add(order_id)
+        if order_id in b.orders:
+            return
+        order = {"status": "PLACED", "lines": lines}
+        b.orders[order_id] = order
+        ci, co = set(), set()
+        _apply(b, order, "PLACED", 1, ci, co)
+        delta = _delta(b, ci, co)
+    _publish(b, delta)
+
+
+def order_status_changed(order_id: str, to_status: str) -> None:
+    """접수/완료/취소 커밋 후 호출"""
+    b = _board()
+    with b.lock:
+        if b.resync_touched is not None:
+            b.resync_touched.add(order_id)
+        order = b.orders.get(order_id)
+        if to_status not in PENDING:
+            b.closed.append(order_id)
+        if not order or order["status"] == to_status:
+            return
+        ci, co = set(), set()
+        _apply(b, order, order["status"], -1, ci, co)
+        if to_status in PENDING:
+            order["status"] = to_status
+            _apply(b, order, to_status, 1, ci, co)
+        else:
+            del b.orders[order_id]
+        delta = _delta(b, ci, co)
+    _publish(b, delta)
+
+
+def load_lines(cur, order_ids: List[str]) -> Dict[str, list]:
+    """order_id -> 주방 집계용 lines (order_placed 인자와 같은 모양). app.intake 중복 replay 에서도 쓴다"""
+    lines_by_id: Dict[str, list] = {}
+    if not order_ids:
+        return lines_by_id
+    cur.execute("""
+        select oi.id::text as id, oi.order_id::text as order_id,
+               oi.menu_item_id::text as menu_item_id, oi.name_snapshot, oi.qty
+        from order_items oi
+        where oi.order_id = any(%s::uuid[])
+    """, (order_ids,))
+    order_items = cur.fetchall() or []
+
+    opts_by_item: Dict[str, list] = {}
+    if order_items:
+        cur.execute("""
+            select order_item_id::text as order_item_id, option_key, value_key, value_label
+            from order_item_options
+            where order_item_id = any(%s::uuid[])
+        """, ([it["id"] for it in order_items],))
+        for o in cur.fetchall() or []:
+            opts_by_item.setdefault(o["order_item_id"], []).append(
+                (o["option_key"], o["value_key"], o["value_label"])
+            )
+
+    for it in order_items:
+        lines_by_id.setdefault(it["order_id"], []).append((
+            it["menu_item_id"], it["name_snapshot"], int(it["qty"]), opts_by_item.get(it["id"], []),
+        ))
+    return lines_by_id
+
+
+def _seed_current(replace: bool = False) -> int:
+    """
+    replace=False: 없는 주문만 채운다(startup).
+    replace=True: DB 기준으로 맞춘다 — 상태가 다르면 옮기고, DB에서 더 이상 대기 중이 아니면 뺀다.
+    읽는 동안 이벤트로 바뀐 주문은 이벤트 쪽이 최신이므로 건드리지 않는다.
+    """
+    b = _board()
+    with b.seed_lock:
+        return _seed_locked(b, replace)
+
+
+def _seed_locked(b: _Board, replace: bool) -> int:
+    with b.lock:
+        b.resync_touched = set()
+    try:
+        conn = get_conn()
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    # PENDING 을 리터럴로: 파라미터 배열이면 generic plan 이 밀린 주문 비율을 몰라 seq scan
+                    cur.execute("""
+                        select id::text as id, status
+                        from orders
+                        where status in ('PLACED', 'ACCEPTED')
+                    """)
+                    status_by_id = {r["id"]: r["status"] for r in (cur.fetchall() or [])}
+                    lines_by_id = load_lines(cur, list(status_by_id))
+        finally:
+            conn.close()
+    except Exception:
+        with b.lock:
+            b.resync_touched = None
+        raise
+
+    with b.lock:
+        touched, b.resync_touched = b.resync_touched or set(), None
+        closed = set(b.closed)
+        ci, co = set(), set()
+        if replace:
+            for order_id in [o for o in b.orders if o not in status_by_id and o not in touched]:
+                order = b.orders.pop(order_id)
+                _apply(b, order, order["status"], -1, ci, co)
+        for order_id, status in status_by_id.items():
+            if order_id in touched or order_id in closed:
+                continue
+            order = b.orders.get(order_id)
+            if order is None:
+                order = {"status": status, "lines": lines_by_id.get(order_id, [])}
+                b.orders[order_id] = order
+                _apply(b, order, status, 1, ci, co)
+            elif replace and order["status"] != status:
+                _apply(b, order, order["status"], -1, ci, co)
+                order["status"] = status
+                _apply(b, order, status, 1, ci, co)
+        b.seeded = True
+        delta = _delta(b, ci, co)
+    _publish(b, delta)
+    return len(status_by_id)
+
+
+def seed() -> int:
+    """매장마다 DB에서 PLACED/ACCEPTED 주문을 읽어 집계를 채운다(startup warmup)"""
+    total = 0
+    for tenant in tenants.all_tenants():
+        with tenants.use(tenant):
+            total += _seed_current()
+    return total
+
+
+def resync() -> int:
+    """현재 매장 집계를 DB와 다시 맞춘다(peer_events 재연결 후 — 그동안 놓친 다른 프로세스 변경)"""
+    return _seed_current(replace=True)
+
+
+def peer_changed(order_id: str, to_status: str) -> None:
+    """
+    다른 프로세스(또는 자기 자신)가 커밋한 상태 변경 (app.peer_events).
+    이미 이 프로세스 이벤트로 반영된 주문이면 아무 일도 안 한다.
+    """
+    if to_status != "PLACED":
+        order_status_changed(order_id, to_status)
+        return
+    b = _board()
+    with b.lock:
+        if order_id in b.orders or order_id in b.closed:
+            return
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                lines = load_lines(cur, [order_id]).get(order_id)
+    finally:
+        conn.close()
+    if lines:
+        order_placed(order_id, lines)
+
+
+# ---- 조회 / 구독 ----
+def is_seeded() -> bool:
+    return _board().seeded
+
+
+def snapshot() -> Dict[str, Any]:
+    b = _board()
+    with b.lock:
+        return {
+            "version": b.version,
+            "seeded": b.seeded,
+            "orders": {s: sum(1 for o in b.orders.values() if o["status"] == s) for s in PENDING},
+            "items": sorted((dict(v) for v in b.items.values()), key=lambda r: (-(r["placed"] + r["accepted"]), r["name"])),
+            "options": [dict(v) for v in b.options.values()],
+        }
+
+
+def subscribe() -> asyncio.Queue:
+    q: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    _board().subscribers.append((asyncio.get_running_loop(), q))
+    return q
+
+
+def unsubscribe(q: asyncio.Queue) -> None:
+    b = _board()
+    for entry in list(b.subscribers):
+        if entry[1] is q:
+            b.subscribers.remove(entry)
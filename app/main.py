@@ -1,16 +1,96 @@
 #  app/main.py
+from contextlib import asynccontextmanager
+import asyncio
+import time
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import os
 
-from app.routers.menu import router as menu_router
+from app import admission, db, events, fcm, intake, kitchen, notify, peer_events, profiler, stats, tenants
+from app import subscribers  # noqa: F401 (이벤트 구독 등록)
+
+from app.routers.menu import router as menu_router, warm_menu
 from app.routers.orders import router as orders_router
 from app.routers.admin_orders import router as admin_orders_router
 from app.routers.devices import router as devices_router
 from app.routers.admin_notifications import router as admin_notifications_router
 from app.routers.users import router as users_router
+from app.routers.admin_stats import router as admin_stats_router
+from app.routers.admin_kitchen import router as admin_kitchen_router
+from app.routers.admin_profiles import router as admin_profiles_router
+from app.routers.admin_menu import router as admin_menu_router
+
+# warmup 상태 (/ready 에서 사용)
+_warm = {"db": "pending", "menu": "pending", "fcm": "pending", "kitchen": "pending"}
+_warm_ms = {}
+
+
+async def _warm_one(name, fn):
+    started = time.perf_counter()
+    try:
+        ok = await asyncio.to_thread(fn)
+        _warm[name] = "ok" if ok is not False else "skipped"
+    except Exception as e:
+        _warm[name] = f"error: {e}"[:300]
+    _warm_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def _warm_menus():
+    for tenant in tenants.all_tenants():
+        with tenants.use(tenant):
+            warm_menu()
+
 
-app = FastAPI(title="임진매운갈비 API")
+async def warmup():
+    """DB 풀 / 메뉴 캐시 / Firebase 앱 / 주방 집계를 (전 매장) 병렬로 준비"""
+    await asyncio.gather(
+        _warm_one("db", db.warm_pool),
+        _warm_one("menu", _warm_menus),
+        _warm_one("fcm", fcm.warm_app),
+        _warm_one("kitchen", kitchen.seed),
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # warmup은 백그라운드로: /health는 바로 응답하고, /ready가 warm 여부를 알려준다
+    task = asyncio.create_task(warmup())
+    # 주문 이벤트 비동기 구독자(푸시) 워커
+    events.start()
+    # 이전 프로세스가 못 보낸 묶음 알림이 있으면 한 window 뒤에 보낸다
+    for tenant in tenants.all_tenants():
+        with tenants.use(tenant):
+            notify.schedule_coalesced_flush()
+    # queued 알림 재시도(백오프) 스케줄러
+    notify.start_scheduler()
+    # 주문별 통계 원장 → 롤업 테이블 (app.stats)
+    stats.start_folder()
+    # DB 장애 중 journal 로 받은 주문을 DB에 저장 (INTAKE_MODE=fallback|journal)
+    intake.start_replayer()
+    # 다른 워커 프로세스가 처리한 주문 변경 → 이 프로세스 주방 집계 (LISTEN order_events)
+    peer_events.start()
+    yield
+    task.cancel()
+    peer_events.stop()
+    # journal 은 디스크에 남으므로 다음 프로세스가 이어서 replay 한다
+    intake.stop_replayer()
+    # 남은 이벤트(푸시)를 먼저 처리 → 그 뒤 묶음 알림 flush
+    await asyncio.to_thread(events.stop)
+    notify.cancel_timer()
+    notify.stop_scheduler()
+    stats.stop_folder()
+    for tenant in tenants.all_tenants():
+        with tenants.use(tenant):
+            try:
+                await asyncio.to_thread(notify.flush_coalesced)
+            except Exception:
+                pass
+    db.close_pool()
+
+
+app = FastAPI(title="임진매운갈비 API", lifespan=lifespan)
 
 ALLOW_ORIGINS = os.getenv("ALLOW_ORIGINS", "")
 origins = [o.strip() for o in ALLOW_ORIGINS.split(",") if o.strip()]
@@ -24,6 +104,12 @@ if not origins:
     "http://127.0.0.1:5173",
   ]
 
+# 매장 라우팅 (X-Store-Id / Host → schema, 커넥션 풀)
+# CORS 보다 먼저 추가 → 안쪽에서 실행되므로 404 응답에도 CORS 헤더가 붙는다
+app.add_middleware(tenants.TenantMiddleware)
+# 서명된 X-Profile 헤더 / PROFILE_SAMPLE_RATE 로 고른 요청만 샘플링 프로파일 (GET /admin/profiles)
+app.add_middleware(profiler.ProfilerMiddleware)
+
 app.add_middleware(
   CORSMiddleware,
   allow_origins=origins,          # 특정 origin만
@@ -38,9 +124,31 @@ app.add_middleware(
 def health():
     return {"status": "ok"}
 
+
+@app.get("/ready")
+def ready():
+    # fcm은 자격증명 없는 환경이면 skipped → 준비 완료로 본다
+    is_ready = (
+        _warm["db"] == "ok" and _warm["menu"] == "ok" and _warm["kitchen"] == "ok"
+        and _warm["fcm"] in ("ok", "skipped")
+    )
+    body = {"ready": is_ready, "components": _warm, "warmupMs": _warm_ms}
+    # 부하 관련 상태 (쓰기 admission / 이벤트 큐 / FCM breaker / 주문 journal / 워커 간 이벤트)
+    body["writes"] = admission.snapshots()
+    body["writesGlobal"] = admission.global_snapshot()
+    body["events"] = events.metrics()
+    body["fcmBreaker"] = fcm.breaker.snapshot()["state"]
+    body["intake"] = intake.metrics()
+    body["peerEvents"] = peer_events.metrics()
+    return JSONResponse(body, status_code=200 if is_ready else 503)
+
 app.include_router(menu_router)
 app.include_router(orders_router)
 app.include_router(admin_orders_router)
 app.include_router(devices_router)
 app.include_router(admin_notifications_router)
 app.include_router(users_router)
+app.include_router(admin_stats_router)
+app.include_router(admin_kitchen_router)
+app.include_router(admin_profiles_router)
+app.include_router(admin_menu_router)
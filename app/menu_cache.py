@@ -0,0 +1,79 @@
+# app/menu_cache.py
+"""
+메뉴 기반 캐시 (프로세스 메모리)
+- "menu" : 메뉴 스냅샷 (app.pricing.MenuSnapshot: GET /menu 응답 + 주문 가격표, 같은 version)
+- 메뉴는 거의 안 바뀌므로 TTL 동안 DB를 안 탄다.
+  다른 프로세스가 바꾼 메뉴는 TTL 이 지나야 보이지만, 주문은 트랜잭션 안에서 version 을 확인한다(app.intake).
+- 만료 시 한 스레드만 다시 읽고(single-flight), 그동안 나머지는 옛 값을 바로 쓴다.
+  처음(값이 없을 때)만 다 같이 그 한 번을 기다린다.
+- 다시 읽다 실패하면(DB 장애) 옛 값을 계속 쓰고 MENU_CACHE_RETRY_SEC 뒤에 다시 시도한다
+  → DB 가 멈춰도 메뉴 조회/가격 계산은 된다.
+- 메뉴가 바뀌면 invalidate() 로 (현재 매장 것) 전부 버린다.
+- 매장(tenant)별로 따로 캐시된다.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from app import tenants
+
+log = logging.getLogger(__name__)
+
+MENU_CACHE_TTL_SEC = float(os.getenv("MENU_CACHE_TTL_SEC", "30"))
+MENU_CACHE_RETRY_SEC = float(os.getenv("MENU_CACHE_RETRY_SEC", "5"))
+
+_lock = threading.Lock()
+# (tenant_id, name) -> (value, loaded_at)
+_entries: Dict[Tuple[str, str], Tuple[Any, float]] = {}
+# 키별 single-flight 락 (한 매장 메뉴 로딩이 다른 매장을 막지 않게)
+_load_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+
+def get(name: str, loader: Callable[[], Any]) -> Any:
+    key = (tenants.current().id, name)
+    entry = _entries.get(key)
+    if entry is not None and time.monotonic() - entry[1] < MENU_CACHE_TTL_SEC:
+        return entry[0]
+
+    load_lock = _load_locks.setdefault(key, threading.Lock())
+    if entry is not None:
+        # 옛 값이 있으면 기다리지 않는다: 다른 스레드가 읽는 중이면 옛 값
+        if not load_lock.acquire(blocking=False):
+            return entry[0]
+        try:
+            try:
+                value = loader()
+            except Exception:
+                log.warning("menu cache %s reload failed; serving stale value", name, exc_info=True)
+                _entries[key] = (entry[0], time.monotonic() - MENU_CACHE_TTL_SEC + MENU_CACHE_RETRY_SEC)
+                return entry[0]
+            _entries[key] = (value, time.monotonic())
+            return value
+        finally:
+            load_lock.release()
+
+    with load_lock:
+        entry = _entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] < MENU_CACHE_TTL_SEC:
+            return entry[0]
+        value = loader()
+        _entries[key] = (value, time.monotonic())
+        return value
+
+
+def put(name: str, value: Any) -> None:
+    """더 최신 값을 이미 읽었을 때 (예: 주문 트랜잭션에서 버전이 달라 다시 읽은 메뉴)"""
+    _entries[(tenants.current().id, name)] = (value, time.monotonic())
+
+
+def invalidate() -> None:
+    tenant_id = tenants.current().id
+    with _lock:
+        for key in [k for k in _entries if k[0] == tenant_id]:
+            del _entries[key]
+
+
+def is_warm(name: str) -> bool:
+    return (tenants.current().id, name) in _entries
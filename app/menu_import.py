@@ -0,0 +1,206 @@
+# app/menu_import.py
+"""
+메뉴 일괄 반영 (POST /admin/menu/import)
+
+입력은 GET /menu 응답과 같은 모양(categories, items, options, optionValues, itemOptionMap)
+→ 내려받아 고친 뒤 그대로 올리면 된다. 새 행은 클라이언트가 uuid 를 만들어 넣는다.
+
+- 문서 전체를 COPY 로 임시(staging) 테이블에 올리고, 트랜잭션 하나에서 diff → upsert.
+  커밋 전까지 GET /menu / create_order 는 이전 메뉴만 본다(부분 반영 상태가 안 보임).
+- 값이 같은 행은 건드리지 않는다 → row_version 이 안 바뀌어 GET /menu?since 델타가 작다.
+- 문서에 없는 행
+  - 카테고리/메뉴/옵션값: is_active=false (지난 주문이 메뉴를 참조하므로 지우지 않음)
+  - 옵션/메뉴-옵션 매핑: 삭제 (주문에는 이름이 스냅샷으로 남는다)
+- 버전: 바뀐 행마다 menu_sync 트리거가 row_version 을 올린다. 응답의 version 이 새 메뉴 버전.
+- 동시에 두 import 가 돌지 않도록 advisory lock.
+"""
+import io
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from app import menu_cache, menu_sync
+from app.db import get_conn
+
+
+class CategoryIn(BaseModel):
+    id: str
+    name: str
+    sort_order: int = 0
+    is_active: bool = True
+
+
+class ItemIn(BaseModel):
+    id: str
+    category_id: Optional[str] = None
+    name: str
+    description: Optional[str] = None
+    price: int
+    image_url: Optional[str] = None
+    sort_order: int = 0
+    is_active: bool = True
+
+
+class OptionIn(BaseModel):
+    id: str
+    key: str
+    name: str
+    selection_type: str
+    is_required: bool = False
+    sort_order: int = 0
+
+
+class OptionValueIn(BaseModel):
+    id: str
+    option_id: str
+    value_key: str
+    label: str
+    price_delta: int = 0
+    sort_order: int = 0
+    is_active: bool = True
+
+
+class ItemOptionMapIn(BaseModel):
+    menu_item_id: str
+    option_id: str
+    sort_order: int = 0
+
+
+class MenuDocument(BaseModel):
+    categories: List[CategoryIn]
+    items: List[ItemIn]
+    options: List[OptionIn] = []
+    optionValues: List[OptionValueIn] = []
+    itemOptionMap: List[ItemOptionMapIn] = []
+
+
+# 문서 키 -> (staging 테이블, 대상 테이블, 컬럼, 키 컬럼, 없는 행 처리: "deactivate" | "delete")
+STAGES = {
+    "categories": ("stage_menu_categories", "menu_categories",
+                   ["id", "name", "sort_order", "is_active"], ["id"], "deactivate"),
+    "items": ("stage_menu_items", "menu_items",
+              ["id", "category_id", "name", "description", "price", "image_url", "sort_order", "is_active"],
+              ["id"], "deactivate"),
+    "options": ("stage_menu_item_options", "menu_item_options",
+                ["id", "key", "name", "selection_type", "is_required", "sort_order"], ["id"], "delete"),
+    "optionValues": ("stage_menu_option_values", "menu_option_values",
+                     ["id", "option_id", "value_key", "label", "price_delta", "sort_order", "is_active"],
+                     ["id"], "deactivate"),
+    "itemOptionMap": ("stage_menu_item_option_map", "menu_item_option_map",
+                      ["menu_item_id", "option_id", "sort_order"], ["menu_item_id", "option_id"], "delete"),
+}
+
+STAGING_DDL = """
+create temp table stage_menu_categories (
+  id uuid primary key, name text not null, sort_order integer not null, is_active boolean not null
+) on commit drop;
+create temp table stage_menu_items (
+  id uuid primary key, category_id uuid, name text not null, description text, price integer not null,
+  image_url text, sort_order integer not null, is_active boolean not null
+) on commit drop;
+create temp table stage_menu_item_options (
+  id uuid primary key, key text not null unique, name text not null, selection_type text not null,
+  is_required boolean not null, sort_order integer not null
+) on commit drop;
+create temp table stage_menu_option_values (
+  id uuid primary key, option_id uuid not null, value_key text not null, label text not null,
+  price_delta integer not null, sort_order integer not null, is_active boolean not null,
+  unique (option_id, value_key)
+) on commit drop;
+create temp table stage_menu_item_option_map (
+  menu_item_id uuid not null, option_id uuid not null, sort_order integer not null,
+  primary key (menu_item_id, option_id)
+) on commit drop;
+"""
+
+# 반영 순서: 없어진 매핑/옵션 삭제(옵션 key 를 새 옵션이 이어받을 수 있게) → 부모부터 upsert → 자식부터 비활성화
+_DELETE_ORDER = ["itemOptionMap", "options"]
+_UPSERT_ORDER = ["categories", "items", "options", "optionValues", "itemOptionMap"]
+_DEACTIVATE_ORDER = ["optionValues", "items", "categories"]
+
+
+def _csv_field(v: Any) -> str:
+    # COPY csv: 따옴표 없는 빈 칸 = null, "" = 빈 문자열
+    if v is None:
+        return ""
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    if isinstance(v, int):
+        return str(v)
+    return '"' + str(v).replace('"', '""') + '"'
+
+
+def _copy(cur, stage: str, columns: List[str], rows: List[BaseModel]) -> None:
+    buf = io.StringIO()
+    for r in rows:
+        buf.write(",".join(_csv_field(getattr(r, c)) for c in columns))
+        buf.write("\n")
+    buf.seek(0)
+    cur.copy_expert(f"copy {stage} ({', '.join(columns)}) from stdin with (format csv)", buf)
+
+
+def _upsert(cur, stage: str, table: str, columns: List[str], keys: List[str]) -> int:
+    cols = ", ".join(columns)
+    rest = [c for c in columns if c not in keys]
+    cur.execute(f"""
+        insert into {table} ({cols})
+        select {cols} from {stage}
+        on conflict ({', '.join(keys)}) do update
+        set {', '.join(f'{c} = excluded.{c}' for c in rest)}
+        where ({', '.join(f'{table}.{c}' for c in rest)}) is distinct from ({', '.join(f'excluded.{c}' for c in rest)})
+    """)
+    return cur.rowcount
+
+
+def _cleanup(cur, stage: str, table: str, keys: List[str], mode: str) -> int:
+    missing = f"not exists (select 1 from {stage} s where {' and '.join(f's.{k} = t.{k}' for k in keys)})"
+    if mode == "delete":
+        cur.execute(f"delete from {table} t where {missing}")
+    else:
+        cur.execute(f"update {table} t set is_active = false where t.is_active and {missing}")
+    return cur.rowcount
+
+
+def import_menu(doc: MenuDocument, dry_run: bool = False) -> Dict[str, Any]:
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("select pg_advisory_xact_lock(hashtext('menu_import'))")
+                before = menu_sync.current_version(cur)
+                cur.execute(STAGING_DDL)
+                try:
+                    for name, (stage, _, columns, _, _) in STAGES.items():
+                        _copy(cur, stage, columns, getattr(doc, name))
+
+                    changes: Dict[str, Dict[str, int]] = {name: {} for name in STAGES}
+                    for name in _DELETE_ORDER:
+                        stage, table, _, keys, mode = STAGES[name]
+                        changes[name]["deleted"] = _cleanup(cur, stage, table, keys, mode)
+                    for name in _UPSERT_ORDER:
+                        stage, table, columns, keys, _ = STAGES[name]
+                        changes[name]["upserted"] = _upsert(cur, stage, table, columns, keys)
+                    for name in _DEACTIVATE_ORDER:
+                        stage, table, _, keys, mode = STAGES[name]
+                        changes[name]["deactivated"] = _cleanup(cur, stage, table, keys, mode)
+                except (psycopg2.IntegrityError, psycopg2.DataError) as e:
+                    # 중복 id/key, 없는 카테고리·옵션 참조, uuid 형식 오류 등
+                    raise HTTPException(400, f"invalid menu document: {str(e).strip().splitlines()[0]}")
+
+                version = menu_sync.current_version(cur)
+                if dry_run:
+                    conn.rollback()
+        if not dry_run:
+            # 이 프로세스는 바로, 다른 프로세스 메뉴판은 MENU_CACHE_TTL_SEC 안에 새 메뉴.
+            # 주문 금액은 저장 트랜잭션이 버전을 확인하므로 어느 프로세스든 바로 새 가격 (app.pricing)
+            menu_cache.invalidate()
+        return {
+            "applied": not dry_run,
+            "previousVersion": before,
+            "version": version if not dry_run else before,
+            "changes": changes,
+        }
+    finally:
+        conn.close()
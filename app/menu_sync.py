@@ -0,0 +1,188 @@
+# app/menu_sync.py
+"""
+메뉴 증분 동기화 (GET /menu?since=<version>)
+
+- 메뉴 테이블 5개에 row_version 컬럼. insert/update 마다 공용 시퀀스(menu_row_version_seq)에서
+  새 값을 받는다(default + before update 트리거).
+- delete 는 트리거가 menu_tombstones 에 (table, key, row_version) 을 남긴다.
+- 트리거는 pg_advisory_xact_lock 으로 메뉴 쓰기를 직렬화한다
+  → 커밋 순서 = row_version 순서라서 "since 이후" 조회가 늦게 커밋된 행을 놓치지 않는다.
+  (메뉴 수정은 드물어서 직렬화 비용은 없는 것과 같다)
+- 클라이언트가 가진 버전 v 가 정리된 tombstone 보다 오래됐으면(pruned_through) 전체 스냅샷.
+
+  python -m app.menu_sync prune [--days]  # 오래된 tombstone 정리
+  (시퀀스/컬럼/트리거/인덱스는 python -m app.migrate: 0006)
+"""
+import argparse
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import tenants
+from app.db import get_conn
+
+MENU_TOMBSTONE_RETENTION_DAYS = int(os.getenv("MENU_TOMBSTONE_RETENTION_DAYS", "30"))
+
+# GET /menu 키 -> (테이블, select 컬럼, is_active 컬럼 유무)
+TABLES = {
+    "categories": (
+        "menu_categories",
+        "id::text, name, sort_order, is_active",
+        True,
+    ),
+    "items": (
+        "menu_items",
+        """id::text, category_id::text as category_id, name, description, price, image_url,
+           sort_order, is_active""",
+        True,
+    ),
+    "options": (
+        "menu_item_options",
+        "id::text, key, name, selection_type, is_required, sort_order",
+        False,
+    ),
+    "optionValues": (
+        "menu_option_values",
+        "id::text, option_id::text as option_id, value_key, label, price_delta, sort_order, is_active",
+        True,
+    ),
+    "itemOptionMap": (
+        "menu_item_option_map",
+        "menu_item_id::text as menu_item_id, option_id::text as option_id, sort_order",
+        False,
+    ),
+}
+
+# 전체 스냅샷(read_tables) 정렬 = GET /menu 응답 순서
+SNAPSHOT_ORDER = {
+    "categories": "sort_order asc, name asc",
+    "items": "sort_order asc, name asc",
+    "options": "sort_order asc, name asc",
+    "optionValues": "sort_order asc, label asc",
+    "itemOptionMap": "sort_order asc",
+}
+
+# 테이블별 SQL 은 여기서 한 번 만들어 둔다 (app.planchecks 가 같은 문자열로 플랜을 검사)
+VERSION_SQL = "select coalesce(max(v), 0) as v from ({}) s".format(" union all ".join(
+    [f"select max(row_version) as v from {table}" for table, _, _ in TABLES.values()]
+    + ["select max(row_version) as v from menu_tombstones"]
+))
+SNAPSHOT_SQL = {
+    name: f"select {columns} from {table} order by {SNAPSHOT_ORDER[name]}"
+    for name, (table, columns, _) in TABLES.items()
+}
+DELTA_SQL = {
+    name: f"""
+        select {columns}
+        from {table}
+        where row_version > %s
+        order by row_version asc
+    """
+    for name, (table, columns, _) in TABLES.items()
+}
+
+def current_version(cur) -> int:
+    """현재 스냅샷에서 보이는 가장 큰 row_version (커밋 안 된 쓰기는 포함하지 않음)"""
+    cur.execute(VERSION_SQL)
+    return int(cur.fetchone()["v"])
+
+
+def read_tables(cur) -> Tuple[int, Dict[str, List[Dict[str, Any]]]]:
+    """
+    메뉴 테이블 전체(비활성 포함)와 그 버전. 한 스냅샷이어야 하므로 호출부가
+    repeatable read 트랜잭션이거나 메뉴 쓰기를 막은 상태(lock_shared)여야 한다.
+    """
+    version = current_version(cur)
+    rows: Dict[str, List[Dict[str, Any]]] = {}
+    for name in TABLES:
+        cur.execute(SNAPSHOT_SQL[name])
+        rows[name] = cur.fetchall() or []
+    return version, rows
+
+
+def lock_shared(cur) -> None:
+    """트랜잭션 끝까지 메뉴 쓰기(트리거의 배타 advisory lock)를 막는다. 읽는 쪽끼리는 안 막힌다"""
+    cur.execute("select pg_advisory_xact_lock_shared(hashtext('menu_row_version'))")
+
+
+def load_delta(since: int) -> Optional[Dict[str, Any]]:
+    """
+    since 이후 바뀐 행만. since 가 너무 오래됐거나(정리된 tombstone) 미래 값이면 None → 전체 스냅샷.
+    비활성화된 행(is_active=false)은 손님 메뉴에서 빠져야 하므로 delete 로 내려준다.
+    """
+    conn = get_conn(readonly=True)
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                # 여러 select 가 같은 스냅샷을 보도록
+                cur.execute("set transaction isolation level repeatable read")
+                version = current_version(cur)
+                cur.execute("select pruned_through from menu_sync_state")
+                row = cur.fetchone()
+                if since < (row["pruned_through"] if row else 0) or since > version:
+                    return None
+
+                upserts: Dict[str, List[Dict[str, Any]]] = {}
+                deletes: Dict[str, List[Dict[str, Any]]] = {}
+                for name, (_, _, has_active) in TABLES.items():
+                    cur.execute(DELTA_SQL[name], (since,))
+                    rows = cur.fetchall() or []
+                    if has_active:
+                        upserts[name] = [r for r in rows if r["is_active"]]
+                        deletes[name] = [{"id": r["id"]} for r in rows if not r["is_active"]]
+                    else:
+                        upserts[name] = rows
+                        deletes[name] = []
+
+                cur.execute("""
+                    select table_name, row_key
+                    from menu_tombstones
+                    where row_version > %s
+                    order by row_version asc
+                """, (since,))
+                by_table = {table: name for name, (table, _, _) in TABLES.items()}
+                for t in cur.fetchall() or []:
+                    name = by_table.get(t["table_name"])
+                    if name:
+                        deletes[name].append(t["row_key"])
+
+        return {"full": False, "since": since, "version": version, "upserts": upserts, "deletes": deletes}
+    finally:
+        conn.close()
+
+
+def prune(days: int = MENU_TOMBSTONE_RETENTION_DAYS) -> Dict[str, int]:
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    with d as (
+                      delete from menu_tombstones
+                      where deleted_at < now() - make_interval(days => %s)
+                      returning row_version
+                    )
+                    select count(*) as n, max(row_version) as v from d
+                """, (days,))
+                row = cur.fetchone()
+                if row["v"] is not None:
+                    cur.execute("""
+                        update menu_sync_state set pruned_through = greatest(pruned_through, %s)
+                    """, (row["v"],))
+                return {"pruned": int(row["n"])}
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.menu_sync")
+    parser.add_argument("cmd", choices=["prune"])
+    parser.add_argument("--days", type=int, default=MENU_TOMBSTONE_RETENTION_DAYS)
+    args = parser.parse_args()
+
+    for tenant in tenants.all_tenants():
+        with tenants.use(tenant):
+            print(tenant.id, prune(args.days))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+# app/migrate.py
+"""
+스키마 마이그레이션 (매장별 schema 마다 적용)
+
+  python -m app.migrate            # = up: 아직 안 돌린 마이그레이션 전부
+  python -m app.migrate up --to 3  # 0003 까지만
+  python -m app.migrate status     # 적용 여부 / 파일 변경 여부
+
+- migrations/NNNN_이름.sql 또는 NNNN_이름.py (up(cur) 함수) 를 번호 순으로 실행.
+- 기본은 파일 하나 = 트랜잭션 하나, 성공하면 schema_migrations 에 같은 트랜잭션으로 기록.
+- .sql 첫 줄들에 `-- migrate:no-transaction` 이 있으면 autocommit 으로 문장 단위 실행
+  (create index concurrently 용). 중간에 실패하면 기록되지 않으므로 다시 돌리면 되고,
+  그 전에 그 파일이 만드는 인덱스 중 실패로 남은 INVALID 인덱스만 지운다
+  (다른 세션이 지금 concurrently 로 만드는 중인 인덱스도 INVALID 로 보이므로 건드리지 않는다).
+- 적용된 마이그레이션은 나중에 바뀌지 않아야 하므로 app.* 모듈의 DDL 을 import 하지 말고
+  그 시점의 SQL 을 파일 안에 그대로 둔다.
+- 여러 인스턴스가 동시에 돌려도 advisory lock 으로 한 곳만 적용.
+- 매장 schema 가 없으면 만든다(search_path 는 app.db 가 매장별로 맞춘다).
+"""
+import argparse
+import hashlib
+import importlib.util
+import os
+import re
+from typing import Dict, List, Optional
+
+from psycopg2 import sql
+
+from app import tenants
+from app.db import get_conn
+
+MIGRATIONS_DIR = os.getenv(
+    "MIGRATIONS_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations"),
+)
+NO_TRANSACTION = "-- migrate:no-transaction"
+_NAME_RE = re.compile(r"^(\d{4})_([A-Za-z0-9_]+)\.(sql|py)$")
+_CONCURRENT_INDEX_RE = re.compile(
+    r"create\s+(?:unique\s+)?index\s+concurrently\s+(?:if\s+not\s+exists\s+)?\"?([A-Za-z0-9_]+)\"?",
+    re.IGNORECASE,
+)
+
+DDL = """
+create table if not exists schema_migrations (
+  version integer primary key,
+  name text not null,
+  checksum text not null,
+  applied_at timestamptz not null default now()
+);
+"""
+
+
+class Migration:
+    def __init__(self, version: int, name: str, path: str):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, "rb") as f:
+            raw = f.read()
+        self.checksum = hashlib.sha256(raw).hexdigest()
+        self.source = raw.decode("utf-8")
+
+    @property
+    def is_python(self) -> bool:
+        return self.path.endswith(".py")
+
+    @property
+    def transactional(self) -> bool:
+        if self.is_python:
+            return True
+        header = [ln.strip() for ln in self.source.splitlines()[:5]]
+        return NO_TRANSACTION not in header
+
+    def __repr__(self):
+        return f"Migration({self.version:04d}_{self.name})"
+
+
+def discover(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    out, seen = [], set()
+    for fname in sorted(os.listdir(directory)):
+        m = _NAME_RE.match(fname)
+        if not m:
+            continue
+        version = int(m.group(1))
+        if version in seen:
+            raise RuntimeError(f"duplicate migration version {version:04d}")
+        seen.add(version)
+        out.append(Migration(version, m.group(2), os.path.join(directory, fname)))
+    return out
+
+
+def _statements(source: str) -> List[str]:
+    """no-transaction 파일용: 줄 끝의 ; 로 나눈다 (함수 본문 같은 $$ 블록은 쓰지 말 것)"""
+    out, buf = [], []
+    for line in source.splitlines():
+        if line.strip().startswith("--"):
+            continue
+        buf.append(line)
+        if line.rstrip().endswith(";"):
+            stmt = "\n".join(buf).strip().rstrip(";").strip()
+            if stmt:
+                out.append(stmt)
+            buf = []
+    tail = "\n".join(buf).strip()
+    if tail:
+        out.append(tail)
+    return out
+
+
+def _run_python(m: Migration, cur) -> None:
+    spec = importlib.util.spec_from_file_location(f"migration_{m.version:04d}", m.path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.up(cur)
+
+
+def _concurrent_indexes(source: str) -> List[str]:
+    """마이그레이션이 create index concurrently 로 만드는 인덱스 이름"""
+    return [m.group(1) for m in _CONCURRENT_INDEX_RE.finditer(source)]
+
+
+def _drop_invalid_indexes(conn, schema: str, names: List[str]) -> List[str]:
+    if not names:
+        return []
+    with conn.cursor() as cur:
+        cur.execute("""
+            select c.relname as name
+            from pg_index i
+            join pg_class c on c.oid = i.indexrelid
+            join pg_namespace n on n.oid = c.relnamespace
+            where not i.indisvalid and n.nspname = %s and c.relname = any(%s)
+        """, (schema, names))
+        invalid = [r["name"] for r in cur.fetchall() or []]
+        for name in invalid:
+            cur.execute(sql.SQL("drop index concurrently if exists {}").format(sql.Identifier(name)))
+    return invalid
+
+
+def applied(cur) -> Dict[int, Dict]:
+    cur.execute("select version, name, checksum, applied_at from schema_migrations order by version")
+    return {r["version"]: r for r in cur.fetchall() or []}
+
+
+def _apply(conn, m: Migration, schema: str) -> None:
+    if m.transactional:
+        with conn:
+            with conn.cursor() as cur:
+                if m.is_python:
+                    _run_python(m, cur)
+                else:
+                    cur.execute(m.source)
+                cur.execute("""
+                    insert into schema_migrations (version, name, checksum) values (%s, %s, %s)
+                """, (m.version, m.name, m.checksum))
+        return
+
+    conn.autocommit = True
+    try:
+        _drop_invalid_indexes(conn, schema, _concurrent_indexes(m.source))
+        with conn.cursor() as cur:
+            for stmt in _statements(m.source):
+                cur.execute(stmt)
+            cur.execute("""
+                insert into schema_migrations (version, name, checksum) values (%s, %s, %s)
+            """, (m.version, m.name, m.checksum))
+    finally:
+        conn.autocommit = False
+
+
+def up(target: Optional[int] = None, dry_run: bool = False) -> List[str]:
+    """현재 매장 schema 에 아직 안 돌린 마이그레이션 적용"""
+    schema = tenants.current().schema
+    migrations = discover()
+    done = []
+    conn = get_conn()
+    try:
+        # advisory lock 은 세션 단위라 autocommit 구간을 지나도 유지된다
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("create schema if not exists {}").format(sql.Identifier(schema)))
+            cur.execute("select pg_advisory_lock(hashtext('schema_migrations:' || %s))", (schema,))
+            cur.execute(DDL)
+        conn.autocommit = False
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    already = applied(cur)
+            for m in migrations:
+                if m.version in already or (target is not None and m.version > target):
+                    continue
+                done.append(f"{m.version:04d}_{m.name}")
+                if not dry_run:
+                    _apply(conn, m, schema)
+        finally:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("select pg_advisory_unlock(hashtext('schema_migrations:' || %s))", (schema,))
+            conn.autocommit = False
+        return done
+    finally:
+        conn.close()
+
+
+def status() -> List[Dict]:
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("select to_regclass('schema_migrations') as r")
+                already = applied(cur) if cur.fetchone()["r"] else {}
+        out = []
+        for m in discover():
+            row = already.get(m.version)
+            out.append({
+                "migration": f"{m.version:04d}_{m.name}",
+                "applied": bool(row),
+                "appliedAt": str(row["applied_at"]) if row else None,
+                # 적용 후 파일이 바뀌었으면 표시 (다시 돌리지는 않는다)
+                "changed": bool(row) and row["checksum"] != m.checksum,
+                "transaction": m.transactional,
+            })
+        return out
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.migrate")
+    parser.add_argument("cmd", nargs="?", default="up", choices=["up", "status"])
+    parser.add_argument("--to", type=int, default=None, help="이 번호까지만 적용")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    for tenant in tenants.all_tenants():
+        with tenants.use(tenant):
+            if args.cmd == "status":
+                for row in status():
+                    print(tenant.id, row)
+            else:
+                print(tenant.id, {"applied" if not args.dry_run else "pending": up(args.to, args.dry_run)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,614 @@
+# app/notify.py
+"""
+알림 파이프라인 (notification_logs → FCM)
+
+발송/재시도
+- notification_logs 는 queued 로 기록되고, attempts / next_attempt_at 로 재시도 시점을 관리한다.
+- 일시적 오류(fcm.is_transient: 네트워크, UNAVAILABLE, INTERNAL, 쿼터 등)만
+  지수 백오프 + jitter 로 다시 queued, RETRY_MAX_ATTEMPTS 를 넘거나 영구 오류면 failed.
+- FCM circuit breaker 가 열려 있으면(fcm.CircuitOpenError) 남은 행은 attempts 를 올리지 않고
+  queued 그대로 retry_after 뒤로 미룬다(defer_logs) → 장애가 길어도 failed 로 떨어지지 않는다.
+- dispatch_due() 는 next_attempt_at <= now() 인 행만 부분 인덱스로 가져간다.
+- 발송은 잡기(claim) → 보내기 → 결과 기록(settle) 3단계, DB 트랜잭션은 잡기/기록에만:
+  잡는 트랜잭션이 행을 sending 으로 바꾸고 NOTIFY_SEND_LEASE_SEC 리스(next_attempt_at)를 건 뒤 커밋,
+  FCM 호출은 트랜잭션/행 락/커넥션 없이, 결과는 행마다 따로 커밋한다.
+  → 결과 커밋이 실패해도 이미 보낸 행이 queued 로 돌아가 바로 다시 나가지 않는다.
+- 리스가 지나도록 sending 인 행(보내는 도중 프로세스가 죽음 등)은 reclaim_expired() 가
+  attempts 를 올려 다시 queued (한도면 failed). 보냈는지 알 수 없는 경우라 이때만 중복 발송이 가능하다.
+- start_scheduler() 가 RETRY_POLL_SEC 마다 dispatch_due() + flush_coalesced() + reclaim_expired() 를 돌린다.
+- DISPATCH_MAX_AGE_HOURS 안에 못 보낸 queued 알림은 expire_stale() 이 failed(expired) 로 마감한다
+  (발송 대상 조회는 최근 파티션만 보므로 그대로 두면 상태가 끝나지 않은 채 남는다).
+
+우선순위 레인 (notification_logs.priority, 작을수록 먼저)
+- 0 손님 주문 상태("조리가 시작되었습니다") / 1 사장님 새 주문 / 2 일괄(bulk)
+- dispatch_due() 는 priority 순으로 가져가되, STARVATION_SEC 이상 밀린 행은
+  레인과 상관없이 먼저 가져간다(starvation 방지).
+- 레인별 대기→발송 지연(p50/p95/p99)은 lane_metrics() 로 조회.
+
+사장님 "새 주문" 푸시 묶어 보내기(coalescing)
+- create_order 는 owner별 notification_logs 를 coalesce_key='new_order',
+  next_attempt_at = now() + COALESCE_WINDOW_SEC 로 queued 기록만 하고, 커밋 후 schedule_coalesced_flush() 로 타이머를 건다.
+  (바로 보내는 deliver_logs() 는 묶음 대상 행을 가져가지 않는다)
+- flush_coalesced() 는 가장 오래된 행의 window 가 끝난 (user_id, coalesce_key) 묶음만 골라
+  그 사이 쌓인 행까지 모아 "새 주문 3건 (주문번호 101, 102, 103)" 한 번만 보낸다.
+  타이머와 스케줄러(RETRY_POLL_SEC) 중 먼저 도는 쪽이 보내고, window 전에는 둘 다 건드리지 않는다.
+- 한 번의 발송은 notification_deliveries 1행, 묶인 notification_logs 는 delivery_id 로 연결.
+  delivery 상태는 sent / failed / retried(일시 오류, 로그는 다음 묶음으로) 중 하나로 끝난다.
+- 워커가 여러 개여도 for update skip locked 로 한 워커만 같은 행을 가져간다.
+
+  python -m app.notify flush  # 지금 보낼 차례인 알림 발송
+  (테이블/컬럼/인덱스는 python -m app.migrate: 0005, 0009)
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+from app import tenants
+from app.db import get_conn
+from app.fcm import CircuitOpenError, is_transient, send_fcm_to_tokens
+
+log = logging.getLogger(__name__)
+
+COALESCE_WINDOW_SEC = float(os.getenv("COALESCE_WINDOW_SEC", "10"))
+COALESCE_MAX_ORDER_NOS = 10  # 본문에 나열할 주문번호 최대 개수
+COALESCE_BATCH = 500
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "5"))
+RETRY_BASE_SEC = float(os.getenv("RETRY_BASE_SEC", "5"))
+RETRY_MAX_SEC = float(os.getenv("RETRY_MAX_SEC", "600"))
+RETRY_POLL_SEC = float(os.getenv("RETRY_POLL_SEC", "5"))
+# sending 으로 잡은 행의 결과를 이 안에 못 남기면 reclaim_expired() 가 다시 queued 로
+NOTIFY_SEND_LEASE_SEC = float(os.getenv("NOTIFY_SEND_LEASE_SEC", "60"))
+
+PRIORITY_STATUS = 0  # 손님 주문 상태 알림
+PRIORITY_OWNER = 1   # 사장님 새 주문
+PRIORITY_BULK = 2    # 일괄/마케팅 등
+LANES = {PRIORITY_STATUS: "status", PRIORITY_OWNER: "owner", PRIORITY_BULK: "bulk"}
+STARVATION_SEC = float(os.getenv("NOTIFY_STARVATION_SEC", "60"))
+
+# 이보다 오래된 queued 알림은 보내도 의미가 없으므로 대상에서 제외하고 expire_stale() 이 failed 로 마감
+# (notification_logs가 월별 파티션이라 최근 파티션만 스캔하게 됨)
+DISPATCH_MAX_AGE_HOURS = int(os.getenv("DISPATCH_MAX_AGE_HOURS", "48"))
+
+def owner_ids(cur) -> List[str]:
+    cur.execute("""
+        select id::text as id
+        from users
+        where role in ('owner', 'admin')
+    """)
+    return [r["id"] for r in (cur.fetchall() or [])]
+
+
+def active_tokens(cur, user_id: str, limit: int = 20) -> List[str]:
+    cur.execute("""
+        select fcm_token
+        from devices
+        where user_id=%s and is_active=true and fcm_token is not null and fcm_token <> ''
+        order by last_seen_at desc nulls last
+        limit %s
+    """, (user_id, limit))
+    return [r["fcm_token"] for r in (cur.fetchall() or []) if r.get("fcm_token")]
+
+
+def backoff_delay(attempts: int) -> float:
+    """attempts번째 실패 후 대기 시간(초): 지수 증가 상한 + equal jitter"""
+    cap = min(RETRY_MAX_SEC, RETRY_BASE_SEC * (2 ** max(attempts - 1, 0)))
+    return cap / 2 + random.uniform(0, cap / 2)
+
+
+def send_to_user(cur, user_id: Optional[str], title: str, body: str, data: Dict[str, Any]) -> Tuple[bool, Optional[str], bool]:
+    """user의 활성 토큰으로 발송 (cur 는 토큰 조회에만, FCM 호출 동안 트랜잭션을 열어 두지 않게 주의)"""
+    return send_to_tokens(active_tokens(cur, user_id) if user_id else [], title, body, data)
+
+
+def send_to_tokens(tokens: List[str], title: str, body: str, data: Dict[str, Any]) -> Tuple[bool, Optional[str], bool]:
+    """
+    토큰들로 발송 (DB 없음)
+    returns: (ok, error_message, transient)
+      ok: 한 기기라도 성공(부분 실패를 재시도하면 성공한 기기에 중복 발송되므로 성공으로 본다)
+    """
+    if not tokens:
+        return False, "no active device tokens", False
+    try:
+        resp = send_fcm_to_tokens(
+            tokens=tokens,
+            title=title,
+            body=body,
+            data={k: str(v) for k, v in (data or {}).items()},
+        )
+    except CircuitOpenError:
+        # 호출부가 행을 미룬다(defer_logs)
+        raise
+    except Exception as e:
+        return False, str(e)[:4000], is_transient(e)
+
+    if resp.get("sent", 0) > 0:
+        return True, None, False
+    results = resp.get("results", [])
+    transient = bool(results) and all(r.get("transient") for r in results)
+    return False, json.dumps({"tokens": len(tokens), "results": results})[:4000], transient
+
+
+# ---- 레인별 지연 지표 (프로세스 메모리, 최근 N건) ----
+_latency_lock = threading.Lock()
+_latency: Dict[int, deque] = {p: deque(maxlen=1000) for p in LANES}
+_lane_counts: Dict[int, Dict[str, int]] = {p: {"sent": 0, "retry": 0, "failed": 0} for p in LANES}
+
+
+def _record(rows: List[Dict[str, Any]], outcome: str) -> None:
+    now = datetime.now(timezone.utc)
+    with _latency_lock:
+        for r in rows:
+            lane = r.get("priority", PRIORITY_BULK)
+            if lane not in _lane_counts:
+                lane = PRIORITY_BULK
+            _lane_counts[lane][outcome] += 1
+            if outcome == "sent" and r.get("created_at"):
+                _latency[lane].append((now - r["created_at"]).total_seconds())
+
+
+def _pct(sorted_vals: List[float], p: float) -> Optional[float]:
+    if not sorted_vals:
+        return None
+    return round(sorted_vals[min(len(sorted_vals) - 1, int(len(sorted_vals) * p))] * 1000, 1)
+
+
+def lane_metrics() -> Dict[str, Any]:
+    """레인별 enqueue→발송 지연(ms)과 결과 건수"""
+    out = {}
+    with _latency_lock:
+        for lane, name in LANES.items():
+            vals = sorted(_latency[lane])
+            out[name] = {
+                "priority": lane,
+                **_lane_counts[lane],
+                "samples": len(vals),
+                "p50Ms": _pct(vals, 0.50),
+                "p95Ms": _pct(vals, 0.95),
+                "p99Ms": _pct(vals, 0.99),
+                "maxMs": round(vals[-1] * 1000, 1) if vals else None,
+            }
+    return out
+
+
+def settle_logs(cur, rows: List[Dict[str, Any]], ok: bool, error: Optional[str], transient: bool,
+                delivery_id: Optional[str] = None) -> str:
+    """
+    발송 결과를 notification_logs 에 반영 (sending 으로 잡아 둔 행만). rows: id, created_at, attempts (+ priority) 포함
+    returns: 'sent' | 'retry' | 'failed'
+    """
+    if not rows:
+        return "sent" if ok else "failed"
+    attempts = max(int(r.get("attempts") or 0) for r in rows) + 1
+    ids = [r["id"] for r in rows]
+    created = [r["created_at"] for r in rows]
+
+    if ok:
+        outcome, status, delay = "sent", "sent", None
+    elif transient and attempts < RETRY_MAX_ATTEMPTS:
+        outcome, status, delay = "retry", "queued", backoff_delay(attempts)
+    else:
+        outcome, status, delay = "failed", "failed", None
+
+    cur.execute("""
+        update notification_logs
+        set send_status=%s,
+            attempts=attempts + 1,
+            error_message=%s,
+            next_attempt_at=case when %s::float8 is null then next_attempt_at
+                                 else now() + make_interval(secs => %s::float8) end,
+            sent_at=case when %s = 'queued' then null else now() end,
+            delivery_id=coalesce(%s::uuid, delivery_id)
+        where (id, created_at) in (select * from unnest(%s::uuid[], %s::timestamptz[]))
+          and send_status='sending'
+    """, (status, error, delay, delay, status, delivery_id if outcome != "retry" else None, ids, created))
+    _record(rows, outcome)
+    return outcome
+
+
+def defer_logs(cur, rows: List[Dict[str, Any]], delay_sec: float) -> int:
+    """발송을 시도하지 않은 (잡아 둔) 행: 다시 queued, attempts 유지, next_attempt_at 만 뒤로"""
+    if not rows:
+        return 0
+    cur.execute("""
+        update notification_logs
+        set send_status='queued', next_attempt_at = now() + make_interval(secs => %s::float8)
+        where (id, created_at) in (select * from unnest(%s::uuid[], %s::timestamptz[]))
+          and send_status='sending'
+    """, (max(delay_sec, 1.0), [r["id"] for r in rows], [r["created_at"] for r in rows]))
+    return len(rows)
+
+
+# ---- 개별 알림 발송 ----
+_DUE_SQL = """
+    select id::text as id,
+           order_id::text as order_id,
+           user_id::text as user_id,
+           title, body, payload, created_at, attempts, priority
+    from notification_logs
+    where send_status='queued' and channel='fcm' and coalesce_key is null
+      and next_attempt_at <= now()
+      and created_at >= now() - make_interval(hours => %s)
+      {extra}
+      and id <> all(%s::uuid[])
+    order by {order}
+    limit %s
+    for update skip locked
+"""
+
+
+def dispatch_due(limit: int = 50) -> Dict[str, int]:
+    """next_attempt_at 이 된 queued 알림(묶음 대상 제외)을 priority 순으로 잡아서 발송"""
+    out = {"processed": 0, "sent": 0, "failed": 0, "retry": 0, "deferred": 0}
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                # 1) 레인과 상관없이 STARVATION_SEC 이상 밀린 행 먼저
+                cur.execute(_DUE_SQL.format(extra="and next_attempt_at <= now() - make_interval(secs => %s)",
+                                            order="next_attempt_at asc"),
+                            (DISPATCH_MAX_AGE_HOURS, STARVATION_SEC, [], limit))
+                rows = cur.fetchall() or []
+                # 2) 남은 자리는 priority 순
+                if len(rows) < limit:
+                    cur.execute(_DUE_SQL.format(extra="", order="priority asc, next_attempt_at asc"),
+                                (DISPATCH_MAX_AGE_HOURS, [r["id"] for r in rows], limit - len(rows)))
+                    rows += cur.fetchall() or []
+                _claim(cur, rows)
+    finally:
+        conn.close()
+    _send_claimed(rows, out)
+    return out
+
+
+def _claim(cur, rows: List[Dict[str, Any]]) -> None:
+    """
+    잡은(for update) 행을 sending + 리스로 바꾸고 보낼 토큰을 rows 에 붙인다.
+    호출부가 커밋한 뒤에 트랜잭션 밖에서 보낸다.
+    """
+    if not rows:
+        return
+    cur.execute("""
+        update notification_logs
+        set send_status='sending', next_attempt_at = now() + make_interval(secs => %s::float8)
+        where (id, created_at) in (select * from unnest(%s::uuid[], %s::timestamptz[]))
+    """, (NOTIFY_SEND_LEASE_SEC, [r["id"] for r in rows], [r["created_at"] for r in rows]))
+    tokens: Dict[str, List[str]] = {}
+    for r in rows:
+        user_id = r["user_id"]
+        if user_id and user_id not in tokens:
+            tokens[user_id] = active_tokens(cur, user_id)
+        r["tokens"] = tokens.get(user_id, []) if user_id else []
+
+
+def _in_tx(fn):
+    """fn(cur) 를 짧은 트랜잭션 하나로"""
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                return fn(cur)
+    finally:
+        conn.close()
+
+
+def _payload(n: Dict[str, Any]) -> Dict[str, Any]:
+    # payload: jsonb -> dict
+    data_payload = n["payload"] or {}
+    if isinstance(data_payload, str):
+        try:
+            data_payload = json.loads(data_payload)
+        except ValueError:
+            data_payload = {}
+    return data_payload
+
+
+def _send_claimed(rows: List[Dict[str, Any]], out: Dict[str, int]) -> None:
+    """_claim 으로 잡은 행을 (DB 트랜잭션 없이) 보내고 행마다 결과를 따로 커밋"""
+    for i, n in enumerate(rows):
+        try:
+            ok, error, transient = send_to_tokens(n["tokens"], n["title"], n["body"], _payload(n))
+        except CircuitOpenError as e:
+            out["deferred"] += _in_tx(lambda cur: defer_logs(cur, rows[i:], e.retry_after))
+            return
+        out["processed"] += 1
+        out[_in_tx(lambda cur: settle_logs(cur, [n], ok, error, transient))] += 1
+
+
+def queue_logs(cur, order_id: str, user_ids: List[str], title: str, body: str, data: Dict[str, Any],
+               priority: int, coalesce_key: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    주문 트랜잭션 안에서 queued 알림을 기록(outbox). 반환 행을 커밋 후 deliver_logs() 에 넘긴다.
+    coalesce_key 가 있으면 COALESCE_WINDOW_SEC 뒤로 미뤄 두고 [] 반환 → flush_coalesced() 만 보낸다.
+    """
+    if not user_ids:
+        return []
+    delay = COALESCE_WINDOW_SEC if coalesce_key else 0
+    rows = execute_values(cur, """
+        insert into notification_logs
+          (order_id, user_id, channel, title, body, payload, send_status, coalesce_key, priority, next_attempt_at)
+        values %s
+        returning id::text as id, created_at
+    """, [(order_id, user_id, "fcm", title, body, json.dumps(data), "queued", coalesce_key, priority, delay)
+          for user_id in user_ids],
+        template="(%s, %s, %s, %s, %s, %s::jsonb, %s, %s, %s, now() + make_interval(secs => %s::float8))",
+        fetch=True)
+    return [] if coalesce_key else (rows or [])
+
+
+def deliver_logs(logs: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    커밋된 queued 알림을 바로 발송 (이벤트 구독자에서 호출).
+    스케줄러(dispatch_due)와 같은 행을 잡지 않게 skip locked + send_status='queued' 재확인.
+    묶음 대상(coalesce_key)은 window 를 기다려야 하므로 넘어와도 보내지 않는다.
+    """
+    out = {"processed": 0, "sent": 0, "failed": 0, "retry": 0, "deferred": 0}
+    if not logs:
+        return out
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    select id::text as id, order_id::text as order_id, user_id::text as user_id,
+                           title, body, payload, created_at, attempts, priority
+                    from notification_logs
+                    where (id, created_at) in (select * from unnest(%s::uuid[], %s::timestamptz[]))
+                      and send_status='queued' and coalesce_key is null
+                    for update skip locked
+                """, ([r["id"] for r in logs], [r["created_at"] for r in logs]))
+                rows = cur.fetchall() or []
+                _claim(cur, rows)
+    finally:
+        conn.close()
+    _send_claimed(rows, out)
+    return out
+
+
+# ---- coalescing ----
+# settle_logs 결과 -> notification_deliveries.send_status
+DELIVERY_STATUS = {"sent": "sent", "failed": "failed", "retry": "retried"}
+_timer_lock = threading.Lock()
+# tenant_id -> 타이머 (매장마다 window 하나)
+_timers: Dict[str, threading.Timer] = {}
+
+
+def schedule_coalesced_flush() -> None:
+    """커밋 후 호출. 이미 (현재 매장) 타이머가 걸려 있으면 그 flush에 같이 묶인다."""
+    tenant = tenants.current()
+    with _timer_lock:
+        if tenant.id in _timers:
+            return
+        # Timer 스레드는 contextvar 를 물려받지 않으므로 매장을 직접 넘긴다
+        timer = threading.Timer(COALESCE_WINDOW_SEC, _fire, args=(tenant,))
+        timer.daemon = True
+        _timers[tenant.id] = timer
+        timer.start()
+
+
+def _fire(tenant: tenants.Tenant) -> None:
+    with _timer_lock:
+        _timers.pop(tenant.id, None)
+    try:
+        with tenants.use(tenant):
+            flush_coalesced()
+    except Exception:
+        log.exception("coalesced notification flush failed (tenant=%s)", tenant.id)
+
+
+def cancel_timer() -> None:
+    with _timer_lock:
+        for timer in _timers.values():
+            timer.cancel()
+        _timers.clear()
+
+
+def _summary(group: List[Dict[str, Any]]) -> tuple:
+    first = group[0]
+    if len(group) == 1:
+        payload = first["payload"] or {}
+        if isinstance(payload, str):
+            payload = json.loads(payload)
+        return first["title"], first["body"], payload
+
+    order_nos = [str(r["order_no"]) for r in group if r["order_no"] is not None]
+    shown = ", ".join(order_nos[:COALESCE_MAX_ORDER_NOS])
+    if len(order_nos) > COALESCE_MAX_ORDER_NOS:
+        shown += f" 외 {len(order_nos) - COALESCE_MAX_ORDER_NOS}건"
+    body = f"새 주문 {len(group)}건이 들어왔습니다! (주문번호 {shown})"
+    payload = {
+        "type": "new_order_batch",
+        "count": len(group),
+        "orderIds": ",".join(r["order_id"] for r in group if r["order_id"]),
+    }
+    return first["title"], body, payload
+
+
+def flush_coalesced() -> Dict[str, int]:
+    """window 가 끝난 (user, key) 묶음의 queued 알림을 한 번씩 발송 (window 안에 쌓인 행까지 같이)"""
+    out = {"groups": 0, "logs": 0, "sent": 0, "failed": 0, "retry": 0, "deferred": 0}
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    with due as (
+                      select distinct user_id, coalesce_key
+                      from notification_logs
+                      where send_status='queued' and channel='fcm' and coalesce_key is not null
+                        and next_attempt_at <= now()
+                        and created_at >= now() - make_interval(hours => %s)
+                    )
+                    select n.id::text as id, n.created_at, n.attempts, n.priority, n.order_id::text as order_id,
+                           n.user_id::text as user_id, n.coalesce_key, n.title, n.body, n.payload,
+                           o.order_no
+                    from notification_logs n
+                    join due d on d.user_id = n.user_id and d.coalesce_key = n.coalesce_key
+                    left join orders o on o.id = n.order_id
+                    where n.send_status='queued' and n.channel='fcm'
+                      and n.created_at >= now() - make_interval(hours => %s)
+                    order by n.created_at asc
+                    limit %s
+                    for update of n skip locked
+                """, (DISPATCH_MAX_AGE_HOURS, DISPATCH_MAX_AGE_HOURS, COALESCE_BATCH))
+                groups: Dict[tuple, List[Dict[str, Any]]] = {}
+                for r in cur.fetchall() or []:
+                    groups.setdefault((r["user_id"], r["coalesce_key"]), []).append(r)
+
+                batches = []
+                for (user_id, key), group in groups.items():
+                    title, body, payload = _summary(group)
+                    cur.execute("""
+                        insert into notification_deliveries
+                          (user_id, channel, coalesce_key, title, body, payload, log_count, send_status)
+                        values (%s, 'fcm', %s, %s, %s, %s::jsonb, %s, 'sending')
+                        returning id::text as id
+                    """, (user_id, key, title, body, json.dumps(payload), len(group)))
+                    batches.append({"delivery_id": cur.fetchone()["id"], "rows": group,
+                                    "title": title, "body": body, "payload": payload})
+                _claim(cur, [r for g in groups.values() for r in g])
+    finally:
+        conn.close()
+
+    # 보내기는 트랜잭션 밖, 결과는 묶음마다 따로 커밋
+    for i, b in enumerate(batches):
+        try:
+            ok, error, transient = send_to_tokens(b["rows"][0]["tokens"], b["title"], b["body"], b["payload"])
+        except CircuitOpenError as e:
+            rest = batches[i:]
+
+            def _defer(cur):
+                cur.execute("delete from notification_deliveries where id = any(%s::uuid[])",
+                            ([x["delivery_id"] for x in rest],))
+                return defer_logs(cur, [r for x in rest for r in x["rows"]], e.retry_after)
+            out["deferred"] += _in_tx(_defer)
+            break
+        out["groups"] += 1
+        out["logs"] += len(b["rows"])
+
+        def _settle(cur):
+            # 묶인 로그 전부를 같은 delivery에 연결 (재시도면 로그는 queued 로 돌아가 다음 묶음에 다시 포함되고
+            # 이 delivery 는 retried 로 남는다 → failed 인데 로그는 다시 나가는 delivery 가 생기지 않게)
+            outcome = settle_logs(cur, b["rows"], ok, error, transient, delivery_id=b["delivery_id"])
+            cur.execute("""
+                update notification_deliveries
+                set send_status=%s, error_message=%s, sent_at=now()
+                where id=%s
+            """, (DELIVERY_STATUS[outcome], error, b["delivery_id"]))
+            return outcome
+        out[_in_tx(_settle)] += 1
+    return out
+
+
+def reclaim_expired() -> int:
+    """
+    NOTIFY_SEND_LEASE_SEC 가 지나도록 sending 인 행(보내는 중 프로세스가 죽음 등)을 다시 queued 로.
+    보냈는지 알 수 없으므로 attempts 를 올리고, 한도면 failed.
+    """
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    update notification_logs
+                    set send_status = case when attempts + 1 >= %s then 'failed' else 'queued' end,
+                        attempts = attempts + 1,
+                        error_message = concat_ws(' / ', error_message, 'send lease expired'),
+                        next_attempt_at = now()
+                    where send_status='sending' and next_attempt_at < now()
+                """, (RETRY_MAX_ATTEMPTS,))
+                reclaimed = cur.rowcount
+                cur.execute("""
+                    update notification_deliveries
+                    set send_status='failed', error_message='send lease expired'
+                    where send_status='sending' and created_at < now() - make_interval(secs => %s::float8)
+                """, (NOTIFY_SEND_LEASE_SEC,))
+        if reclaimed:
+            log.warning("reclaimed %s notifications with expired send lease (tenant=%s)",
+                        reclaimed, tenants.current().id)
+        return reclaimed
+    finally:
+        conn.close()
+
+
+def expire_stale() -> int:
+    """DISPATCH_MAX_AGE_HOURS 가 지나도록 못 보낸 queued 알림을 failed 로 마감"""
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    update notification_logs
+                    set send_status='failed',
+                        error_message=concat_ws(' / ', error_message, 'expired: not sent within ' || %s || 'h')
+                    where send_status='queued' and channel='fcm'
+                      and created_at < now() - make_interval(hours => %s)
+                """, (DISPATCH_MAX_AGE_HOURS, DISPATCH_MAX_AGE_HOURS))
+                expired = cur.rowcount
+        if expired:
+            log.warning("expired %s queued notifications older than %sh (tenant=%s)",
+                        expired, DISPATCH_MAX_AGE_HOURS, tenants.current().id)
+        return expired
+    finally:
+        conn.close()
+
+
+# ---- 재시도 스케줄러 ----
+_stop = threading.Event()
+_scheduler: threading.Thread | None = None
+
+
+def _scheduler_loop() -> None:
+    while not _stop.wait(RETRY_POLL_SEC):
+        for tenant in tenants.all_tenants():
+            try:
+                with tenants.use(tenant):
+                    # 손님 상태 알림(priority 0)이 dispatch_due 에 있으므로 먼저
+                    # 한 번에 limit 만큼씩, 밀린 게 있으면 바로 이어서
+                    while not _stop.is_set() and dispatch_due()["processed"] > 0:
+                        pass
+                    flush_coalesced()
+                    reclaim_expired()
+                    expire_stale()
+            except Exception:
+                log.exception("notification retry scheduler failed (tenant=%s)", tenant.id)
+
+
+def start_scheduler() -> None:
+    global _scheduler
+    if _scheduler is not None or RETRY_POLL_SEC <= 0:
+        return
+    _stop.clear()
+    _scheduler = threading.Thread(target=_scheduler_loop, name="notify-scheduler", daemon=True)
+    _scheduler.start()
+
+
+def stop_scheduler() -> None:
+    global _scheduler
+    _stop.set()
+    if _scheduler is not None:
+        _scheduler.join(timeout=RETRY_POLL_SEC + 5)
+        _scheduler = None
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.notify")
+    parser.add_argument("cmd", choices=["flush"])
+    args = parser.parse_args()
+
+    for tenant in tenants.all_tenants():
+        with tenants.use(tenant):
+            print(tenant.id, {"coalesced": flush_coalesced(), "dispatched": dispatch_due(limit=500),
+                              "reclaimed": reclaim_expired(), "expired": expire_stale()})
+
+
+if __name__ == "__main__":
+    main()
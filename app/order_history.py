@@ -0,0 +1,154 @@
+# app/order_history.py
+"""
+손님별 최근 주문 목록 캐시 (GET /orders?customerId=, 프로세스 메모리 LRU)
+
+- 첫 조회 때 최근 HISTORY_CACHE_ORDERS 건을 읽어 채우고, 이후 같은 손님 조회는 DB를 안 탄다.
+- 주문 생성 / 상태 변경 이벤트(app.subscribers)가 캐시된 목록을 제자리에서 갱신한다.
+- 다른 워커 프로세스의 변경은 app.peer_events(LISTEN/NOTIFY)가 peer_changed() 로 넘겨준다
+  (모르는 새 주문이면 그 손님 목록을 버린다 → 다음 조회에서 DB).
+- 그래도 놓친 변경(LISTEN 연결이 끊긴 사이 등)은 HISTORY_CACHE_TTL_SEC 가 지나면 DB에서 다시 읽어 맞춘다.
+- 손님 수는 HISTORY_CACHE_CUSTOMERS 로 제한(가장 오래 안 본 손님부터 eviction).
+- 캐시를 채우는 동안 같은 손님의 주문 이벤트가 들어오면 읽은 결과를 버린다(다음 조회에서 다시).
+  이 검사는 읽은 결과가 이벤트보다 앞선 커밋을 다 본다는 전제라 loader 는 primary 에서 읽어야 한다
+  (replica 는 이벤트보다 늦을 수 있다). 미스 때만 DB 를 타므로 primary 부하는 크지 않다.
+- 매장(tenant)별로 키가 나뉜다.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app import tenants
+
+HISTORY_CACHE_CUSTOMERS = int(os.getenv("HISTORY_CACHE_CUSTOMERS", "10000"))
+HISTORY_CACHE_ORDERS = int(os.getenv("HISTORY_CACHE_ORDERS", "50"))
+HISTORY_CACHE_TTL_SEC = float(os.getenv("HISTORY_CACHE_TTL_SEC", "60"))
+
+Key = Tuple[str, str]
+
+_lock = threading.Lock()
+# (tenant_id, customer_id) -> {"orders": [summary, ...] (created_at desc), "complete": 전부 들고 있는지,
+#                              "loaded_at": DB에서 읽은 시각(monotonic)}
+_entries: "OrderedDict[Key, Dict[str, Any]]" = OrderedDict()
+# 이벤트 순번: 채우는 도중 바뀐 손님을 알아보기 위함
+_seq = 0
+_touched: "OrderedDict[Key, int]" = OrderedDict()
+_counts = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "updates": 0, "discarded": 0}
+
+SUMMARY_FIELDS = ("id", "order_no", "status", "total_amount", "created_at")
+
+
+def _key(customer_id: str) -> Key:
+    return (tenants.current().id, customer_id)
+
+
+def _touch(key: Key) -> None:
+    global _seq
+    _seq += 1
+    _touched[key] = _seq
+    _touched.move_to_end(key)
+    while len(_touched) > HISTORY_CACHE_CUSTOMERS:
+        _touched.popitem(last=False)
+
+
+def get(customer_id: str, limit: int, loader: Callable[[int], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """loader(n): 최근 n건을 created_at desc 로 읽는 함수"""
+    key = _key(customer_id)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and time.monotonic() - entry["loaded_at"] >= HISTORY_CACHE_TTL_SEC:
+            del _entries[key]
+            _counts["expired"] += 1
+            entry = None
+        if entry is not None and (limit <= len(entry["orders"]) or entry["complete"]):
+            _entries.move_to_end(key)
+            _counts["hits"] += 1
+            return [dict(o) for o in entry["orders"][:limit]]
+        _counts["misses"] += 1
+        started = _seq
+
+    fetch = max(limit, HISTORY_CACHE_ORDERS)
+    loaded_at = time.monotonic()
+    rows = loader(fetch)
+
+    with _lock:
+        if _touched.get(key, 0) > started:
+            _counts["discarded"] += 1
+        else:
+            orders = [{k: r[k] for k in SUMMARY_FIELDS} for r in rows]
+            _entries[key] = {"orders": orders, "complete": len(rows) < fetch, "loaded_at": loaded_at}
+            _entries.move_to_end(key)
+            while len(_entries) > HISTORY_CACHE_CUSTOMERS:
+                _entries.popitem(last=False)
+                _counts["evictions"] += 1
+    return rows[:limit]
+
+
+def order_placed(customer_id: Optional[str], summary: Dict[str, Any]) -> None:
+    if not customer_id:
+        return
+    key = _key(customer_id)
+    with _lock:
+        _touch(key)
+        entry = _entries.get(key)
+        if entry is None:
+            return
+        if any(o["id"] == summary["id"] for o in entry["orders"]):
+            return
+        entry["orders"].insert(0, {k: summary.get(k) for k in SUMMARY_FIELDS})
+        if len(entry["orders"]) > max(HISTORY_CACHE_ORDERS, 1):
+            del entry["orders"][HISTORY_CACHE_ORDERS:]
+            entry["complete"] = False
+        _counts["updates"] += 1
+
+
+def status_changed(customer_id: Optional[str], order_id: str, status: str) -> None:
+    if not customer_id:
+        return
+    key = _key(customer_id)
+    with _lock:
+        _touch(key)
+        entry = _entries.get(key)
+        if entry is None:
+            return
+        for o in entry["orders"]:
+            if o["id"] == order_id:
+                o["status"] = status
+                _counts["updates"] += 1
+                return
+
+
+def peer_changed(customer_id: Optional[str], order_id: str, status: str) -> None:
+    """다른 프로세스(또는 자기 자신)가 커밋한 변경 (app.peer_events). 이미 반영된 변경이면 그대로 둔다"""
+    if not customer_id:
+        return
+    key = _key(customer_id)
+    with _lock:
+        _touch(key)
+        entry = _entries.get(key)
+        if entry is None:
+            return
+        for o in entry["orders"]:
+            if o["id"] == order_id:
+                if o["status"] != status:
+                    o["status"] = status
+                    _counts["updates"] += 1
+                return
+        if status == "PLACED":
+            # 요약(주문번호/금액)을 모르는 새 주문 → 목록을 버리고 다음 조회에서 DB
+            del _entries[key]
+            _counts["updates"] += 1
+
+
+def metrics() -> Dict[str, Any]:
+    with _lock:
+        lookups = _counts["hits"] + _counts["misses"]
+        return {
+            **_counts,
+            "hitRate": round(_counts["hits"] / lookups, 3) if lookups else None,
+            "customers": len(_entries),
+            "maxCustomers": HISTORY_CACHE_CUSTOMERS,
+            "ordersPerCustomer": HISTORY_CACHE_ORDERS,
+            "ttlSec": HISTORY_CACHE_TTL_SEC,
+        }
@@ -0,0 +1,311 @@
+# app/partitions.py
+"""
+notification_logs / order_status_logs 월별 파티션 관리
+
+  python -m app.partitions migrate     # 기존 테이블 → created_at 기준 월별 파티션 (1회, python -m app.migrate: 0003)
+  python -m app.partitions maintain    # 앞으로 쓸 파티션 생성 + 보관기간 지난 파티션 아카이브/삭제
+
+- 파티션 이름: <table>_pYYYYMM  (예: notification_logs_p202610)
+- <table>_default: DEFAULT 파티션. maintain 이 늦어 월 파티션이 없어도 로그 insert(→ 주문 생성)가
+  실패하지 않고 여기에 쌓인다. 다음 maintain 이 그 달 파티션을 만들면서 행을 옮기고,
+  DEFAULT 에 행이 있으면 경고로 알린다 (0007 마이그레이션).
+- 보관기간(LOG_RETENTION_MONTHS)이 지난 파티션은 LOG_ARCHIVE_DIR 가 있으면
+  gzip CSV로 떨군 뒤 detach+drop, 없으면 바로 drop.
+- cron 등으로 하루 한 번 maintain 을 돌리면 된다.
+"""
+import argparse
+import gzip
+import logging
+import os
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+
+from psycopg2 import sql
+
+from app import tenants
+from app.db import get_conn
+
+log = logging.getLogger(__name__)
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "2"))
+LOG_RETENTION_MONTHS = int(os.getenv("LOG_RETENTION_MONTHS", "12"))
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "").strip()
+
+# 파티션 부모에 만드는 인덱스 (각 파티션에 자동 생성됨)
+LOG_TABLES: Dict[str, Dict[str, List]] = {
+    "notification_logs": {
+        "indexes": [
+            ("send_status", "channel", "created_at"),
+            ("order_id", "created_at"),
+            ("created_at",),
+        ],
+        "fks": [("order_id", "orders"), ("user_id", "users")],
+    },
+    "order_status_logs": {
+        "indexes": [
+            ("order_id", "created_at"),
+        ],
+        "fks": [("order_id", "orders")],
+    },
+}
+
+
+def _month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _add_months(d: date, n: int) -> date:
+    m = d.year * 12 + (d.month - 1) + n
+    return date(m // 12, m % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def is_partitioned(cur, table: str) -> bool:
+    cur.execute("select relkind from pg_class where oid = to_regclass(%s)", (table,))
+    row = cur.fetchone()
+    return bool(row) and row["relkind"] == "p"
+
+
+def ensure_partitions(cur, table: str, start: date, end: date) -> List[str]:
+    """[start, end) 구간의 월 파티션을 없으면 만든다 (DEFAULT 에 들어가 있던 그 달 행은 옮긴다)"""
+    created = []
+    cur.execute("select to_regclass(%s) as r", (default_name(table),))
+    has_default = cur.fetchone()["r"] is not None
+    month = _month_start(start)
+    while month < end:
+        name = partition_name(table, month)
+        cur.execute("select to_regclass(%s) as r", (name,))
+        if cur.fetchone()["r"] is None:
+            if has_default and _default_has_rows(cur, table, month, _add_months(month, 1)):
+                _move_from_default(cur, table, name, month, _add_months(month, 1))
+            else:
+                cur.execute(sql.SQL("create table {} partition of {} for values from (%s) to (%s)").format(
+                    sql.Identifier(name), sql.Identifier(table),
+                ), (month, _add_months(month, 1)))
+            created.append(name)
+        month = _add_months(month, 1)
+    return created
+
+
+def _default_has_rows(cur, table: str, lo: date, hi: date) -> bool:
+    cur.execute(sql.SQL("select exists (select 1 from {} where created_at >= %s and created_at < %s) as e").format(
+        sql.Identifier(default_name(table)),
+    ), (lo, hi))
+    return cur.fetchone()["e"]
+
+
+def _move_from_default(cur, table: str, name: str, lo: date, hi: date) -> None:
+    # DEFAULT 에 그 달 행이 있으면 바로 partition of 로 만들 수 없다 → 따로 만들어 옮긴 뒤 attach
+    ident, default_ident = sql.Identifier(table), sql.Identifier(default_name(table))
+    cur.execute(sql.SQL("create table {} (like {} including defaults including constraints including storage)").format(
+        sql.Identifier(name), ident,
+    ))
+    cur.execute(sql.SQL("""
+        with moved as (delete from {} where created_at >= %s and created_at < %s returning *)
+        insert into {} select * from moved
+    """).format(default_ident, sql.Identifier(name)), (lo, hi))
+    cur.execute(sql.SQL("alter table {} attach partition {} for values from (%s) to (%s)").format(
+        ident, sql.Identifier(name),
+    ), (lo, hi))
+
+
+def ensure_default(cur, table: str) -> None:
+    cur.execute(sql.SQL("create table if not exists {} partition of {} default").format(
+        sql.Identifier(default_name(table)), sql.Identifier(table),
+    ))
+
+
+def default_months(cur, table: str) -> Dict[date, int]:
+    """DEFAULT 파티션에 쌓인 행 수 (월별). 비어 있지 않으면 maintain 이 밀린 것"""
+    cur.execute("select to_regclass(%s) as r", (default_name(table),))
+    if cur.fetchone()["r"] is None:
+        return {}
+    cur.execute(sql.SQL("""
+        select date_trunc('month', created_at)::date as month, count(*) as n
+        from {} group by 1
+    """).format(sql.Identifier(default_name(table))))
+    return {r["month"]: int(r["n"]) for r in cur.fetchall() or []}
+
+
+def list_partitions(cur, table: str) -> List[Dict]:
+    cur.execute("""
+        select c.relname as name
+        from pg_inherits i
+        join pg_class c on c.oid = i.inhrelid
+        where i.inhparent = to_regclass(%s)
+        order by c.relname
+    """, (table,))
+    out = []
+    prefix = f"{table}_p"
+    for r in cur.fetchall() or []:
+        suffix = r["name"][len(prefix):]
+        if r["name"].startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            out.append({"name": r["name"], "month": date(int(suffix[:4]), int(suffix[4:]), 1)})
+    return out
+
+
+# ---- migrate ----
+def _convert_table(cur, table: str, spec: Dict) -> None:
+    legacy = f"{table}_legacy"
+    ident, legacy_ident = sql.Identifier(table), sql.Identifier(legacy)
+
+    cur.execute(sql.SQL("lock table {} in access exclusive mode").format(ident))
+    cur.execute(sql.SQL("alter table {} rename to {}").format(ident, legacy_ident))
+    # PK에는 파티션 키가 포함돼야 하므로 인덱스/PK는 복사하지 않고 새로 만든다
+    cur.execute(sql.SQL("""
+        create table {} (like {} including defaults including constraints including storage including comments)
+        partition by range (created_at)
+    """).format(ident, legacy_ident))
+
+    # serial 시퀀스 소유권을 새 테이블로 (legacy drop 시 같이 지워지지 않게)
+    cur.execute("""
+        select s.oid::regclass::text as seq, a.attname
+        from pg_depend d
+        join pg_class s on s.oid = d.objid and s.relkind = 'S'
+        join pg_attribute a on a.attrelid = d.refobjid and a.attnum = d.refobjsubid
+        where d.refobjid = to_regclass(%s) and d.deptype = 'a'
+    """, (legacy,))
+    for r in cur.fetchall() or []:
+        cur.execute(sql.SQL("alter sequence {} owned by {}.{}").format(
+            sql.SQL(r["seq"]), ident, sql.Identifier(r["attname"]),
+        ))
+
+    cur.execute(sql.SQL("select min(created_at) as lo from {}").format(legacy_ident))
+    lo = cur.fetchone()["lo"]
+    start = _month_start(lo.date()) if lo else _month_start(_today())
+    ensure_partitions(cur, table, start, _add_months(_month_start(_today()), PARTITION_MONTHS_AHEAD + 1))
+    ensure_default(cur, table)
+
+    cur.execute(sql.SQL("insert into {} select * from {}").format(ident, legacy_ident))
+    cur.execute(sql.SQL("drop table {}").format(legacy_ident))
+
+    cur.execute(sql.SQL("alter table {} add primary key (id, created_at)").format(ident))
+    for col, ref in spec["fks"]:
+        cur.execute(sql.SQL("alter table {} add foreign key ({}) references {}(id)").format(
+            ident, sql.Identifier(col), sql.Identifier(ref),
+        ))
+    for cols in spec["indexes"]:
+        cur.execute(sql.SQL("create index if not exists {} on {} ({})").format(
+            sql.Identifier(f"{table}_{'_'.join(cols)}_idx"), ident,
+            sql.SQL(", ").join(sql.Identifier(c) for c in cols),
+        ))
+
+
+def migrate(cur) -> List[str]:
+    """이미 파티션 테이블이면 건너뜀. 한 트랜잭션 안에서 호출할 것."""
+    converted = []
+    for table, spec in LOG_TABLES.items():
+        if is_partitioned(cur, table):
+            continue
+        _convert_table(cur, table, spec)
+        converted.append(table)
+    return converted
+
+
+# ---- maintain ----
+def _archive_partition(cur, name: str, archive_dir: str) -> str:
+    # 매장(schema)마다 같은 파티션 이름이 있으므로 schema 로 나눈다
+    archive_dir = os.path.join(archive_dir, tenants.current().schema)
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    tmp = path + ".tmp"
+    with gzip.open(tmp, "wb") as f:
+        cur.copy_expert(sql.SQL("copy {} to stdout with (format csv, header)").format(
+            sql.Identifier(name),
+        ).as_string(cur), f)
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def maintain(
+    months_ahead: int = PARTITION_MONTHS_AHEAD,
+    retention_months: int = LOG_RETENTION_MONTHS,
+    archive_dir: Optional[str] = LOG_ARCHIVE_DIR,
+    dry_run: bool = False,
+) -> Dict:
+    this_month = _month_start(_today())
+    cutoff = _add_months(this_month, -retention_months)
+    report = {"created": [], "archived": [], "dropped": [], "defaultRows": {}}
+
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                for table in LOG_TABLES:
+                    if not is_partitioned(cur, table):
+                        raise RuntimeError(f"{table} is not partitioned (run: python -m app.partitions migrate)")
+
+                    if not dry_run:
+                        ensure_default(cur, table)
+                    stray = default_months(cur, table)
+                    if stray:
+                        log.warning("%s rows in %s (partition maintenance fell behind)",
+                                    sum(stray.values()), default_name(table))
+                    if not dry_run:
+                        # DEFAULT 에 쌓인 달은 파티션을 만들면서 행을 옮긴다
+                        for month in sorted(stray):
+                            report["created"] += ensure_partitions(cur, table, month, _add_months(month, 1))
+                        report["created"] += ensure_partitions(cur, table, this_month, _add_months(this_month, months_ahead + 1))
+                        stray = default_months(cur, table)
+                    report["defaultRows"][table] = sum(stray.values())
+
+                    for p in list_partitions(cur, table):
+                        if p["month"] >= cutoff:
+                            continue
+                        if dry_run:
+                            report["dropped"].append(p["name"])
+                            continue
+                        # 파티션 단위로 커밋 → 하나 실패해도 앞선 것은 반영
+                        if archive_dir:
+                            report["archived"].append(_archive_partition(cur, p["name"], archive_dir))
+                        cur.execute(sql.SQL("alter table {} detach partition {}").format(
+                            sql.Identifier(table), sql.Identifier(p["name"]),
+                        ))
+                        cur.execute(sql.SQL("drop table {}").format(sql.Identifier(p["name"])))
+                        conn.commit()
+                        report["dropped"].append(p["name"])
+        return report
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.partitions")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("migrate")
+    m = sub.add_parser("maintain")
+    m.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    m.add_argument("--retention-months", type=int, default=LOG_RETENTION_MONTHS)
+    m.add_argument("--archive-dir", default=LOG_ARCHIVE_DIR)
+    m.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    for tenant in tenants.all_tenants():
+        with tenants.use(tenant):
+            if args.cmd == "migrate":
+                conn = get_conn()
+                try:
+                    with conn:
+                        with conn.cursor() as cur:
+                            print(tenant.id, {"converted": migrate(cur)})
+                finally:
+                    conn.close()
+            else:
+                print(tenant.id, maintain(args.months_ahead, args.retention_months, args.archive_dir or None, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# app/peer_events.py
+"""
+다른 워커 프로세스가 커밋한 주문 상태 변경 받기 (Postgres LISTEN/NOTIFY)
+
+주방 집계(app.kitchen)와 손님 주문내역 캐시(app.order_history)는 프로세스 메모리이고
+이벤트 버스(app.events)도 프로세스 안에서만 돈다. 워커가 여러 개면 워커 A 가 받은 주문/접수/취소를
+워커 B 의 주방 화면과 주문내역이 모른다.
+
+- order_status_logs insert 트리거가 pg_notify('order_events', {schema, orderId, from, to, customerId})
+  (마이그레이션 0008). 커밋된 변경만, 커밋 순서대로 모든 세션에 전달된다.
+- 매장마다 풀 밖 LISTEN 전용 커넥션(db.dedicated_conn) 1개를 스레드 하나가 들고 받는다.
+  자기 프로세스가 보낸 변경도 돌아오지만 kitchen / order_history 의 peer_changed 가 멱등이라 그대로 넘긴다.
+- LISTEN 을 건 직후(처음 포함)마다 kitchen.resync() → 연결이 없던 동안 놓친 변경도 맞춰진다.
+- 연결이 끊기면 PEER_EVENTS_RETRY_SEC 뒤 다시 붙는다.
+- PEER_EVENTS_ENABLED=false 면 끈다(워커 1개로만 띄우는 배포).
+"""
+import json
+import logging
+import os
+import select
+import threading
+from typing import Any, Callable, Dict, List
+
+from app import db, kitchen, order_history, tenants
+
+log = logging.getLogger(__name__)
+
+PEER_EVENTS_ENABLED = os.getenv("PEER_EVENTS_ENABLED", "true").lower() not in ("0", "false", "no")
+PEER_EVENTS_RETRY_SEC = float(os.getenv("PEER_EVENTS_RETRY_SEC", "5"))
+PEER_EVENTS_POLL_SEC = 1.0  # stop() 을 알아차리는 주기
+
+CHANNEL = "order_events"
+
+# payload(dict) 를 받는 함수들. 현재 매장 컨텍스트(tenants.use) 안에서 호출된다
+_handlers: List[Callable[[Dict[str, Any]], None]] = []
+
+_stop = threading.Event()
+_threads: List[threading.Thread] = []
+_state: Dict[str, Dict[str, Any]] = {}
+
+
+def on_change(fn: Callable[[Dict[str, Any]], None]) -> Callable[[Dict[str, Any]], None]:
+    _handlers.append(fn)
+    return fn
+
+
+@on_change
+def _kitchen(payload: Dict[str, Any]) -> None:
+    kitchen.peer_changed(payload["orderId"], payload["to"])
+
+
+@on_change
+def _history(payload: Dict[str, Any]) -> None:
+    order_history.peer_changed(payload.get("customerId"), payload["orderId"], payload["to"])
+
+
+def _dispatch(tenant: tenants.Tenant, raw: str) -> None:
+    try:
+        payload = json.loads(raw)
+    except ValueError:
+        log.warning("ignored malformed %s payload: %r", CHANNEL, raw[:200])
+        return
+    # 같은 DB 를 쓰는 다른 매장(schema) 알림은 그 매장 스레드가 처리
+    if payload.get("schema") != tenant.schema:
+        return
+    _state[tenant.id]["received"] += 1
+    for fn in _handlers:
+        try:
+            fn(payload)
+        except Exception:
+            log.exception("peer event handler %s failed (tenant=%s, order=%s)",
+                          fn.__name__, tenant.id, payload.get("orderId"))
+
+
+def _listen(tenant: tenants.Tenant) -> None:
+    state = _state[tenant.id]
+    with tenants.use(tenant):
+        while not _stop.is_set():
+            conn = None
+            try:
+                conn = db.dedicated_conn(tenant)
+                with conn.cursor() as cur:
+                    cur.execute(f"listen {CHANNEL}")
+                state["connected"] = True
+                state["connects"] += 1
+                # LISTEN 이전에 커밋된 변경은 알림으로 오지 않으므로 DB 기준으로 한 번 맞춘다
+                kitchen.resync()
+                while not _stop.is_set():
+                    if select.select([conn], [], [], PEER_EVENTS_POLL_SEC) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        _dispatch(tenant, conn.notifies.pop(0).payload)
+            except Exception as e:
+                state["error"] = str(e)[:300]
+                log.exception("peer event listener failed (tenant=%s)", tenant.id)
+            finally:
+                state["connected"] = False
+                if conn is not None:
+                    conn.close()
+            _stop.wait(PEER_EVENTS_RETRY_SEC)
+
+
+def start() -> None:
+    if not PEER_EVENTS_ENABLED or _threads:
+        return
+    _stop.clear()
+    for tenant in tenants.all_tenants():
+        _state[tenant.id] = {"connected": False, "connects": 0, "received": 0, "error": None}
+        t = threading.Thread(target=_listen, args=(tenant,), name=f"peer-events-{tenant.id}", daemon=True)
+        t.start()
+        _threads.append(t)
+
+
+def stop() -> None:
+    _stop.set()
+    for t in _threads:
+        t.join(timeout=PEER_EVENTS_POLL_SEC + 5)
+    _threads.clear()
+
+
+def metrics() -> Dict[str, Any]:
+    return {"enabled": PEER_EVENTS_ENABLED, "tenants": {k: dict(v) for k, v in _state.items()}}
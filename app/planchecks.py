@@ -0,0 +1,363 @@
+# app/planchecks.py
+"""
+쿼리 플랜 회귀 검사 (로컬/CI DB 전용)
+
+  python -m app.planchecks --seed        # 대량 데이터 채우고(비어 있을 때만) 검사
+  python -m app.planchecks               # 검사만
+  python -m app.planchecks --record      # 현재 플랜/비용을 기준선(planchecks.json)으로 저장
+
+- 저장소의 planchecks.json 은 빈 DB 에 python -m app.migrate 후 기본값 --seed 로 기록한 것.
+  CI 도 같은 순서로 돌려야 비용 비교가 의미 있다. 쿼리/인덱스를 바꿨으면 다시 --record 해서 같이 커밋.
+- 라우터 파일과 라우터가 매 요청 부르는 모듈(ROUTER_FILES)을 ast 로 읽어 cur.execute(...) 의 SQL 을 전부 뽑는다.
+  문자열 리터럴 외에 모듈 상수(_DUE_SQL), 상수.format(키=리터럴), 문자열 dict 상수[변수](dict 값 전부)도
+  모듈을 import 해서 실제 값으로 푼다. 그래도 못 읽는 SQL(f-string 등)은 skip 으로 표시.
+- 요청 경로가 아닌 함수(SKIP_FUNCTIONS: CLI, 재계산)와 EXPLAIN 할 수 없는 문장(set/lock 등)은 건너뛴다.
+- 각 SQL 을 PREPARE 한 뒤 plan_cache_mode=force_generic_plan 으로
+  EXPLAIN (FORMAT JSON) EXECUTE → 실제 파라미터 값과 무관한 generic plan 을 본다.
+  EXPLAIN 만 하므로 insert/update 도 실행되지 않는다.
+- 실패 조건
+  1) LARGE_TABLES 에 Seq Scan (행이 SEQ_SCAN_MIN_ROWS 미만인 파티션/테이블은 seq scan 이 맞으므로 제외)
+  2) 총 비용이 기준선 * (1 + tolerance) 초과 → 기준선 대비 플랜 diff 출력
+"""
+import argparse
+import ast
+import difflib
+import importlib
+import json
+import os
+import re
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import partitions
+from app.db import get_conn
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUTER_FILES = [
+    "app/routers/orders.py",
+    "app/routers/admin_orders.py",
+    "app/routers/admin_notifications.py",
+    "app/routers/devices.py",
+    "app/routers/menu.py",
+    "app/intake.py",
+    # 라우터 밖이지만 주문/상태 변경/알림 발송/메뉴 조회마다 도는 SQL
+    "app/notify.py",
+    "app/stats.py",
+    "app/pricing.py",
+    "app/menu_sync.py",
+    "app/kitchen.py",
+]
+SKIP_FUNCTIONS = {"main", "rebuild"}
+PLANCHECKS_FILE = os.getenv("PLANCHECKS_FILE", os.path.join(ROOT, "planchecks.json"))
+# 데이터가 많아지는 테이블 (메뉴 테이블은 작아서 seq scan 이 정상)
+LARGE_TABLES = {
+    "orders", "order_items", "order_item_options", "order_status_logs",
+    "notification_logs", "notification_deliveries", "devices", "users",
+}
+SEQ_SCAN_MIN_ROWS = 1000
+DEFAULT_TOLERANCE = 0.5
+
+
+# ---- SQL 추출 ----
+_EXPLAINABLE = re.compile(r"^\s*(select|insert|update|delete|with|values)\b", re.IGNORECASE)
+
+
+def _resolve(module, arg: ast.expr) -> Optional[List[Tuple[str, str]]]:
+    """execute 첫 인자 → [(key 접미사, SQL)]. 정적으로 정해지지 않으면 None"""
+    if isinstance(arg, ast.Constant):
+        return [("", arg.value)] if isinstance(arg.value, str) else None
+    if isinstance(arg, ast.Name):
+        value = getattr(module, arg.id, None)
+        return [("", value)] if isinstance(value, str) else None
+    if isinstance(arg, ast.Subscript) and isinstance(arg.value, ast.Name):
+        # SNAPSHOT_SQL[name] → dict 값 전부
+        value = getattr(module, arg.value.id, None)
+        if isinstance(value, dict) and value and all(isinstance(v, str) for v in value.values()):
+            return [(f"[{k}]", v) for k, v in value.items()]
+        return None
+    if (isinstance(arg, ast.Call) and isinstance(arg.func, ast.Attribute) and arg.func.attr == "format"
+            and not arg.args and all(kw.arg and isinstance(kw.value, ast.Constant) for kw in arg.keywords)):
+        base = _resolve(module, arg.func.value)
+        if base is None:
+            return None
+        kwargs = {kw.arg: kw.value.value for kw in arg.keywords}
+        return [(suffix, text.format(**kwargs)) for suffix, text in base]
+    return None
+
+
+def extract_queries(files: List[str] = ROUTER_FILES) -> List[Dict[str, Any]]:
+    out = []
+    for rel in files:
+        with open(os.path.join(ROOT, rel), encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=rel)
+        module = importlib.import_module(rel[:-len(".py")].replace("/", "."))
+        for func in ast.walk(tree):
+            if not isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)) or func.name in SKIP_FUNCTIONS:
+                continue
+            n = 0
+            for node in ast.walk(func):
+                if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                        and node.func.attr == "execute" and node.args):
+                    continue
+                n += 1
+                key = f"{os.path.basename(rel)}:{func.name}:{n}"
+                resolved = _resolve(module, node.args[0])
+                if resolved is None:
+                    out.append({"key": key, "line": node.lineno, "sql": None})
+                    continue
+                for suffix, sql_text in resolved:
+                    if not _EXPLAINABLE.match(sql_text):
+                        continue
+                    out.append({"key": key + suffix, "line": node.lineno, "sql": sql_text})
+    return out
+
+
+def _to_prepared(sql_text: str) -> Tuple[str, int]:
+    count = 0
+
+    def repl(_):
+        nonlocal count
+        count += 1
+        return f"${count}"
+
+    body = re.sub(r"(?<!%)%s", repl, sql_text).replace("%%", "%")
+    return body, count
+
+
+# ---- 플랜 ----
+_PARTITION_RE = re.compile(r"_p\d{6}(?=_|$)")
+
+
+def _walk(plan: Dict[str, Any], depth: int = 0):
+    yield plan, depth
+    for child in plan.get("Plans", []) or []:
+        yield from _walk(child, depth + 1)
+
+
+def _relation(node: Dict[str, Any]) -> Optional[str]:
+    rel = node.get("Relation Name")
+    if not rel:
+        return None
+    # 파티션(notification_logs_p202610, _default)은 부모 이름으로
+    return re.sub(r"_(p\d{6}|default)$", "", rel)
+
+
+def plan_lines(plan: Dict[str, Any]) -> List[str]:
+    """비교/diff 용 요약 (비용 숫자는 빼고 구조만)"""
+    # 월 파티션 이름은 달마다 바뀌므로 기준선과 비교할 수 있게 _pYYYYMM 으로 바꾼다
+    lines = []
+    for node, depth in _walk(plan):
+        label = node["Node Type"]
+        if node.get("Relation Name"):
+            label += f" on {_PARTITION_RE.sub('_pYYYYMM', node['Relation Name'])}"
+        if node.get("Index Name"):
+            label += f" using {_PARTITION_RE.sub('_pYYYYMM', node['Index Name'])}"
+        lines.append("  " * depth + label)
+    return lines
+
+
+def explain(cur, sql_text: str) -> Dict[str, Any]:
+    body, nparams = _to_prepared(sql_text)
+    cur.execute("savepoint planchecks")
+    try:
+        cur.execute(f"prepare planchecks_stmt as {body}")
+        args = ", ".join(["null"] * nparams)
+        cur.execute(f"explain (format json) execute planchecks_stmt{f'({args})' if nparams else ''}")
+        raw = cur.fetchone()
+        plan = list(raw.values())[0][0]["Plan"]
+        cur.execute("deallocate planchecks_stmt")
+        cur.execute("release savepoint planchecks")
+        return plan
+    except Exception:
+        cur.execute("rollback to savepoint planchecks")
+        # prepare 는 트랜잭션과 무관하게 남으므로 따로 지운다
+        cur.execute("deallocate all")
+        raise
+
+
+def check(baseline: Dict[str, Any], tolerance: float, record: bool = False) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    results, recorded = [], {}
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("set local plan_cache_mode = force_generic_plan")
+                cur.execute("""
+                    select c.relname as name, c.reltuples as n
+                    from pg_class c
+                    where c.relnamespace = current_schema()::regnamespace and c.relkind in ('r', 'p')
+                """)
+                reltuples = {r["name"]: float(r["n"]) for r in cur.fetchall() or []}
+                for q in extract_queries():
+                    r = {"key": q["key"], "line": q["line"], "status": "ok", "problems": []}
+                    results.append(r)
+                    if q["sql"] is None:
+                        r["status"] = "skip"
+                        r["problems"].append("dynamic SQL (not a string literal)")
+                        continue
+                    try:
+                        plan = explain(cur, q["sql"])
+                    except Exception as e:
+                        r["status"] = "error"
+                        r["problems"].append(str(e).strip().splitlines()[0])
+                        continue
+
+                    cost = float(plan["Total Cost"])
+                    lines = plan_lines(plan)
+                    r["cost"] = cost
+                    recorded[q["key"]] = {"maxCost": round(cost * (1 + tolerance), 2), "cost": cost, "plan": lines}
+
+                    for node, _ in _walk(plan):
+                        if (node["Node Type"] == "Seq Scan" and _relation(node) in LARGE_TABLES
+                                and reltuples.get(node["Relation Name"], 0) >= SEQ_SCAN_MIN_ROWS):
+                            r["problems"].append(f"seq scan on {node['Relation Name']}")
+
+                    base = baseline.get(q["key"])
+                    if base and not record and cost > float(base["maxCost"]):
+                        r["problems"].append(f"cost {cost:.1f} > threshold {base['maxCost']} (recorded {base['cost']})")
+                    if r["problems"]:
+                        r["status"] = "fail"
+                        if base and base.get("plan") != lines:
+                            r["diff"] = list(difflib.unified_diff(base.get("plan", []), lines,
+                                                                  "recorded", "current", lineterm=""))
+                        else:
+                            r["plan"] = lines
+            # 검사만 했으므로 아무것도 남기지 않는다
+            conn.rollback()
+    finally:
+        conn.close()
+    return results, recorded
+
+
+# ---- 시드 ----
+SEED_SQL = """
+create temp table seed_users on commit drop as
+select gen_random_uuid() as id, g as n from generate_series(1, %(customers)s) g;
+create index on seed_users (n);
+
+insert into users (id, role, name)
+select id, case when n <= 3 then 'owner' else 'customer' end, 'seed-' || n
+from seed_users;
+
+insert into devices (user_id, platform, fcm_token, is_active, last_seen_at)
+select u.id, (array['web','ios','android'])[1 + (g %% 3)], 'seed-token-' || g, g %% 7 <> 0,
+       now() - make_interval(mins => g %% 100000)
+from generate_series(1, %(devices)s) g
+join seed_users u on u.n = 1 + g %% %(customers)s;
+
+insert into menu_categories (name, sort_order) values ('seed', 0);
+
+insert into menu_items (category_id, name, price, sort_order)
+select (select id from menu_categories where name='seed' limit 1), 'seed-item-' || g, 1000 * (1 + g %% 20), g
+from generate_series(1, 60) g;
+
+create temp table seed_items on commit drop as
+select id, name, price, row_number() over (order by sort_order) - 1 as n
+from menu_items where name like 'seed-item-%%';
+
+-- 대기 중(PLACED/ACCEPTED) 주문은 최근 2시간 것만 — 실제 매장처럼 밀린 주문은 소수
+insert into orders (customer_id, status, total_amount, created_at)
+select u.id,
+       case when m < 120 then (array['PLACED','ACCEPTED'])[1 + g %% 2]
+            else (array['COMPLETED','COMPLETED','COMPLETED','CANCELED'])[1 + g %% 4] end,
+       10000,
+       now() - make_interval(mins => m)
+from (select g, (g * 7) %% (60 * 24 * 60) as m from generate_series(1, %(orders)s) g) s
+join seed_users u on u.n = 4 + g %% (%(customers)s - 3);
+
+insert into order_items (order_id, menu_item_id, name_snapshot, price_snapshot, qty, line_amount)
+select o.id, mi.id, mi.name, mi.price, 1 + (o.order_no %% 3)::int, mi.price
+from orders o
+join seed_items mi on mi.n in (o.order_no %% 60, (o.order_no + 1) %% 60);
+
+insert into order_item_options (order_item_id, option_key, option_name, value_key, value_label, price_delta)
+select id, 'spicy', '맵기', 'mild', '순한맛', 0 from order_items;
+
+insert into order_status_logs (order_id, from_status, to_status, created_at)
+select id, null, 'PLACED', created_at from orders;
+
+insert into notification_logs (order_id, user_id, channel, title, body, payload, send_status, created_at)
+select o.id, o.customer_id, 'fcm', 'seed', 'seed', '{}'::jsonb,
+       (array['sent','sent','sent','failed','queued'])[1 + (o.order_no %% 5)::int], o.created_at
+from orders o, generate_series(1, %(logs_per_order)s);
+
+insert into notification_deliveries (user_id, channel, coalesce_key, title, body, payload, log_count, send_status,
+                                     created_at, sent_at)
+select o.customer_id, 'fcm', 'order:' || o.id, 'seed', 'seed', '{}'::jsonb, 2, 'sent', o.created_at, o.created_at
+from orders o
+where o.order_no %% 3 = 0;
+"""
+
+
+def seed(orders: int, customers: int, devices: int, logs_per_order: int) -> Dict[str, Any]:
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("select count(*) as n from orders")
+                if cur.fetchone()["n"] > 0:
+                    return {"seeded": False, "reason": "orders is not empty"}
+                today = partitions._today()
+                for table in partitions.LOG_TABLES:
+                    if partitions.is_partitioned(cur, table):
+                        partitions.ensure_partitions(cur, table, partitions._add_months(today, -3), partitions._add_months(today, 1))
+                # 0008 order_events 트리거: 시드 데이터는 다른 워커에 알리지 않는다
+                cur.execute("set local app.skip_order_events = 'on'")
+                cur.execute(SEED_SQL, {
+                    "orders": orders, "customers": customers, "devices": devices, "logs_per_order": logs_per_order,
+                })
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("analyze")
+        conn.autocommit = False
+        return {"seeded": True, "orders": orders, "customers": customers, "devices": devices}
+    finally:
+        conn.close()
+
+
+def _load_baseline() -> Dict[str, Any]:
+    if not os.path.exists(PLANCHECKS_FILE):
+        return {}
+    with open(PLANCHECKS_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.planchecks")
+    parser.add_argument("--seed", action="store_true", help="orders 가 비어 있으면 대량 데이터 생성 (로컬 DB 전용)")
+    parser.add_argument("--orders", type=int, default=300_000)
+    parser.add_argument("--customers", type=int, default=50_000)
+    parser.add_argument("--devices", type=int, default=60_000)
+    parser.add_argument("--logs-per-order", type=int, default=2)
+    parser.add_argument("--record", action="store_true", help="현재 결과를 기준선으로 저장")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="기준선 비용 대비 허용 증가율")
+    args = parser.parse_args()
+
+    if args.seed:
+        print(seed(args.orders, args.customers, args.devices, args.logs_per_order))
+
+    baseline = _load_baseline()
+    if not baseline and not args.record:
+        print(f"(no baseline at {PLANCHECKS_FILE}; only seq scans are checked. run with --record)")
+    results, recorded = check(baseline, args.tolerance, record=args.record)
+
+    failed = 0
+    for r in results:
+        cost = f" cost={r['cost']:.1f}" if "cost" in r else ""
+        print(f"[{r['status']:5}] {r['key']} (line {r['line']}){cost}")
+        for p in r["problems"]:
+            print(f"        - {p}")
+        for line in r.get("diff") or r.get("plan") or []:
+            print(f"          {line}")
+        failed += r["status"] == "fail"
+
+    if args.record:
+        with open(PLANCHECKS_FILE, "w", encoding="utf-8") as f:
+            json.dump(recorded, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"recorded {len(recorded)} plans -> {PLANCHECKS_FILE}")
+    print({"checked": len(results), "failed": failed})
+    sys.exit(1 if failed and not args.record else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# app/pricing.py
+"""
+주문 가격 계산 (create_order / POST /orders/quote 공용)
+
+메뉴/옵션/옵션값/메뉴-옵션 매핑을 한 번에 읽어 만든 가격표(PriceTable)로
+DB 왕복 없이 검증 + 가격 계산을 한다.
+
+- 가격표와 GET /menu 응답은 primary 에서 한 스냅샷으로 읽은 MenuSnapshot 하나로 만들어
+  menu_cache("menu")에 같이 캐시한다 → 메뉴판과 견적 금액이 서로 다른 버전일 수 없다.
+- 가격표에는 menu_sync 버전이 붙고 price_cart 결과(menuVersion)로 따라간다.
+  주문 저장 트랜잭션이 DB 버전과 비교해 다르면 새 메뉴로 다시 계산한다(app.intake.save_order)
+  → 다른 프로세스가 메뉴를 바꿨어도 캐시 TTL 동안 옛 가격으로 주문이 들어가지 않는다.
+- DB 장애 중에도 가격 계산이 되도록(app.intake fallback/journal)
+  - 캐시를 다시 읽다 실패하면 옛 스냅샷을 계속 쓴다(app.menu_cache)
+  - 읽어 온 스냅샷은 MENU_SNAPSHOT_DIR/<tenant>.menu.json 에도 적어 두고, 캐시가 빈 채로 막 뜬 워커가
+    DB 에서 못 읽으면(MENU_LOAD_TIMEOUT_MS 안에) 그 사본을 쓴다.
+
+규칙(기존 create_order와 동일):
+- 메뉴 없음 404 / 비활성 400
+- 옵션 없음 404 / 메뉴에 안 붙은 옵션 400
+- single은 값 정확히 1개, multi는 1개 이상
+- 없는 값 / 비활성 값 400
+- line_amount = (price + sum(price_delta)) * qty
+"""
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+
+from app import db, menu_cache, menu_sync, tenants
+from app.db import DB_UNAVAILABLE, get_conn
+
+log = logging.getLogger(__name__)
+
+MENU_SNAPSHOT_DIR = os.getenv("MENU_SNAPSHOT_DIR", "var/menu")
+# 캐시 밖에서 스냅샷을 읽을 때 풀 대기 / 소켓 상한. 넘으면 디스크 사본 (기본은 주문 fallback 과 같게)
+MENU_LOAD_TIMEOUT_MS = int(os.getenv("MENU_LOAD_TIMEOUT_MS", os.getenv("INTAKE_DB_TIMEOUT_MS", "3000")))
+
+
+class PriceTable:
+    def __init__(self, items, options, item_options, values, version: int = 0):
+        self.items: Dict[str, Dict[str, Any]] = items
+        self.options: Dict[str, Dict[str, Any]] = options
+        self.item_options: Set[Tuple[str, str]] = item_options
+        # option_id -> value_key -> row
+        self.values: Dict[str, Dict[str, Dict[str, Any]]] = values
+        self.version = version
+
+
+class MenuSnapshot:
+    """같은 메뉴 버전의 GET /menu 응답(menu)과 가격표(prices)"""
+
+    def __init__(self, version: int, rows: Dict[str, List[Dict[str, Any]]]):
+        self.version = version
+        self.rows = rows
+        self.menu = {
+            "version": version,
+            "categories": [r for r in rows["categories"] if r["is_active"]],
+            "items": [r for r in rows["items"] if r["is_active"]],
+            "options": rows["options"],
+            "optionValues": [r for r in rows["optionValues"] if r["is_active"]],
+            "itemOptionMap": rows["itemOptionMap"],
+        }
+        values: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for r in rows["optionValues"]:
+            values.setdefault(r["option_id"], {})[r["value_key"]] = r
+        self.prices = PriceTable(
+            {r["id"]: r for r in rows["items"]},
+            {r["id"]: r for r in rows["options"]},
+            {(r["menu_item_id"], r["option_id"]) for r in rows["itemOptionMap"]},
+            values,
+            version,
+        )
+
+
+def load_snapshot(cur=None) -> MenuSnapshot:
+    """
+    primary 에서 메뉴 스냅샷을 읽는다 (replica 는 지연만큼 옛 가격일 수 있으므로 쓰지 않는다).
+    cur 를 주면 그 트랜잭션 안에서 메뉴 쓰기를 잠깐 막고 읽는다(주문 저장 중 버전이 다를 때).
+    """
+    if cur is not None:
+        menu_sync.lock_shared(cur)
+        return MenuSnapshot(*menu_sync.read_tables(cur))
+    timeout_sec = MENU_LOAD_TIMEOUT_MS / 1000 if MENU_LOAD_TIMEOUT_MS > 0 else None
+    conn = get_conn(wait=timeout_sec)
+    try:
+        with db.socket_deadline(conn, timeout_sec):
+            with conn:
+                with conn.cursor() as cur:
+                    # version 과 행들이 같은 스냅샷이어야 다음 since 조회가 맞는다
+                    cur.execute("set transaction isolation level repeatable read")
+                    return MenuSnapshot(*menu_sync.read_tables(cur))
+    finally:
+        conn.close()
+
+
+# ---- 디스크 사본 (cold start 중 DB 장애) ----
+_saved_versions: Dict[str, int] = {}
+_save_lock = threading.Lock()
+
+
+def _snapshot_path(tenant_id: str) -> str:
+    return os.path.join(MENU_SNAPSHOT_DIR, f"{tenant_id}.menu.json")
+
+
+def _save_copy(tenant_id: str, snapshot: MenuSnapshot) -> None:
+    if _saved_versions.get(tenant_id) == snapshot.version:
+        return
+    with _save_lock:
+        os.makedirs(MENU_SNAPSHOT_DIR, exist_ok=True)
+        path = _snapshot_path(tenant_id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": snapshot.version, "rows": snapshot.rows}, f, ensure_ascii=False, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        _saved_versions[tenant_id] = snapshot.version
+
+
+def _read_copy(tenant_id: str) -> Optional[MenuSnapshot]:
+    try:
+        with open(_snapshot_path(tenant_id), encoding="utf-8") as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        return None
+    return MenuSnapshot(int(saved["version"]), saved["rows"])
+
+
+def _load_cached() -> MenuSnapshot:
+    tenant_id = tenants.current().id
+    try:
+        snapshot = load_snapshot()
+    except DB_UNAVAILABLE:
+        # 캐시에 옛 값이 있으면 menu_cache 가 그걸 계속 쓰고 곧 다시 시도한다. 사본은 빈 캐시(막 뜬 워커)용
+        saved = None if menu_cache.is_warm("menu") else _read_copy(tenant_id)
+        if saved is None:
+            raise
+        log.warning("menu snapshot load failed (tenant=%s); using saved copy version %s", tenant_id, saved.version)
+        return saved
+    try:
+        _save_copy(tenant_id, snapshot)
+    except OSError:
+        log.exception("failed to save menu snapshot copy (tenant=%s)", tenant_id)
+    return snapshot
+
+
+def get_snapshot() -> MenuSnapshot:
+    return menu_cache.get("menu", _load_cached)
+
+
+def get_price_table() -> PriceTable:
+    return get_snapshot().prices
+
+
+def reprice_if_stale(cur, items, priced: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    주문 저장 트랜잭션 안에서 호출. priced 를 계산한 가격표 버전이 지금 DB 메뉴 버전과 다르면
+    새 스냅샷으로 다시 계산하고 이 프로세스 캐시도 바꿔 둔다. (검증 실패면 HTTPException → 롤백)
+    """
+    if priced.get("menuVersion") == menu_sync.current_version(cur):
+        return priced
+    snapshot = load_snapshot(cur)
+    menu_cache.put("menu", snapshot)
+    return price_cart(items, snapshot.prices)
+
+
+def price_cart(items, table: Optional[PriceTable] = None) -> Dict[str, Any]:
+    """
+    items: [{menuItemId, qty, selectedOptions: [{optionId, valueKeys}]}] (pydantic 모델)
+    returns: {"lines": [...], "totalAmount": int, "menuVersion": 계산에 쓴 메뉴 버전}
+      line: menuItemId, name, unitPrice, qty, optionDelta, lineAmount,
+            options: [(option_key, option_name, value_key, value_label, price_delta)]  # order_item_options 스냅샷
+    """
+    table = table or get_price_table()
+    lines: List[Dict[str, Any]] = []
+    total_amount = 0
+
+    for item in items:
+        mi = table.items.get(item.menuItemId)
+        if not mi: raise HTTPException(404, f"menu item not found: {item.menuItemId}")
+        if not mi["is_active"]: raise HTTPException(400, f"menu item inactive: {item.menuItemId}")
+        unit_price = int(mi["price"])
+        qty = int(item.qty)
+
+        option_delta_sum = 0
+        option_rows = []  # snapshot rows
+
+        for so in item.selectedOptions:
+            opt = table.options.get(so.optionId)
+            if not opt: raise HTTPException(404, f"option not found: {so.optionId}")
+            if (mi["id"], opt["id"]) not in table.item_options:
+                raise HTTPException(400, f"option not allowed for menu item (menuItemId={mi['id']}, optionId={opt['id']})")
+
+            if opt["selection_type"] == "single" and len(so.valueKeys) != 1:
+                raise HTTPException(400, f"option {opt['key']} is single-select")
+            if opt["selection_type"] == "multi" and len(so.valueKeys) < 1:
+                raise HTTPException(400, f"option {opt['key']} is multi-select")
+
+            by_key = table.values.get(opt["id"], {})
+            missing = [k for k in so.valueKeys if k not in by_key]
+            if missing:
+                raise HTTPException(400, f"invalid option values: {missing}")
+            for k in so.valueKeys:
+                if not by_key[k]["is_active"]:
+                    raise HTTPException(400, f"option value inactive: {k}")
+
+            for k in so.valueKeys:
+                v = by_key[k]
+                pd = int(v["price_delta"])
+                option_delta_sum += pd
+                option_rows.append((opt["key"], opt["name"], v["value_key"], v["label"], pd))
+
+        line_unit = unit_price + option_delta_sum
+        line_amount = line_unit * qty
+        total_amount += line_amount
+
+        lines.append({
+            "menuItemId": mi["id"],
+            "name": mi["name"],
+            "unitPrice": unit_price,
+            "qty": qty,
+            "optionDelta": option_delta_sum,
+            "lineAmount": line_amount,
+            "options": option_rows,
+        })
+
+    return {"lines": lines, "totalAmount": total_amount, "menuVersion": table.version}
@@ -0,0 +1,424 @@
+# app/profiler.py
+"""
+요청 단위 샘플링 프로파일러 (opt-in)
+
+켜지는 경우
+- 서명된 헤더: X-Profile: <unix_ts>.<hex hmac_sha256(PROFILE_SECRET, "<unix_ts>:<METHOD>:<path>")>
+  (PROFILE_SIGNATURE_TTL_SEC 안의 ts 만 유효)
+- 랜덤 샘플링: PROFILE_SAMPLE_RATE (0~1, 기본 0)
+
+동작
+- 요청 컨텍스트(contextvar)에 Profile 을 넣고,
+  요청 스레드가 app.db / app.fcm 에서 register_thread() 로 등록된다.
+- 요청이 넘긴 일도 따라간다: app.fcm executor 는 bind(), app.events 비동기 구독자는
+  hold() → attach(background=True) (응답 뒤 시간은 summary()["background"], 스택 앞에 [after response]).
+- 샘플러 스레드가 PROFILE_INTERVAL_MS 마다 등록된 스레드의 스택을 모은다.
+  DB / FCM 대기는 wait() 로 재고 그 샘플에 [db wait] / [fcm wait] 프레임을 붙인다.
+- 결과: PROFILE_DIR 에 speedscope JSON (PROFILE_FORMAT=collapsed 면 collapsed stacks),
+  최대 PROFILE_MAX_FILES 개. 파일 쓰기는 이벤트 루프 밖에서. 목록은 GET /admin/profiles,
+  응답 헤더 X-Profile-Id 로 파일 이름을 알려준다.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+PROFILE_SECRET = os.getenv("PROFILE_SECRET", "")
+PROFILE_SIGNATURE_TTL_SEC = int(os.getenv("PROFILE_SIGNATURE_TTL_SEC", "300"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.getenv("TMPDIR", "/tmp"), "store-profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "speedscope")  # speedscope | collapsed
+PROFILE_HEADER = b"x-profile"
+
+_SKIP_FILES = (os.sep + "asyncio" + os.sep, os.sep + "threading.py", os.sep + "anyio" + os.sep,
+               os.sep + "concurrent" + os.sep)
+
+
+class Profile:
+    def __init__(self, name: str, reason: str):
+        self.name = name
+        self.reason = reason
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+        self.finished: Optional[float] = None  # 응답 뒤 구독자까지 끝난 시각
+        self.threads: Dict[int, Optional[str]] = {}  # thread ident -> 현재 대기 종류(db/fcm) 또는 None
+        self.background: set = set()  # 응답 뒤 작업 중인 thread ident
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        # 요청 구간 / 응답 뒤(background) 구간
+        self.waits = {"db": 0.0, "fcm": 0.0}
+        self.calls = {"db": 0, "fcm": 0}
+        self.bg_waits = {"db": 0.0, "fcm": 0.0}
+        self.bg_calls = {"db": 0, "fcm": 0}
+        self.jobs = 0  # hold() 한 작업 수
+        self.pending = 0  # 그 중 아직 release() 안 된 것
+        self.lock = threading.Lock()
+
+    def summary(self) -> Dict[str, Any]:
+        wall = ((self.ended or time.perf_counter()) - self.started) * 1000
+        db_ms, fcm_ms = self.waits["db"] * 1000, self.waits["fcm"] * 1000
+        out = {
+            "name": self.name,
+            "reason": self.reason,
+            "wallMs": round(wall, 1),
+            "pythonMs": round(max(0.0, wall - db_ms - fcm_ms), 1),
+            "dbMs": round(db_ms, 1),
+            "dbCalls": self.calls["db"],
+            "fcmMs": round(fcm_ms, 1),
+            "fcmCalls": self.calls["fcm"],
+            "samples": self.samples,
+            "intervalMs": PROFILE_INTERVAL_MS,
+        }
+        if self.jobs:
+            out["background"] = {
+                "jobs": self.jobs,
+                "wallMs": round(max(0.0, (self.finished or time.perf_counter()) - (self.ended or self.started)) * 1000, 1),
+                "dbMs": round(self.bg_waits["db"] * 1000, 1),
+                "dbCalls": self.bg_calls["db"],
+                "fcmMs": round(self.bg_waits["fcm"] * 1000, 1),
+                "fcmCalls": self.bg_calls["fcm"],
+            }
+        return out
+
+
+_active: ContextVar[Optional[Profile]] = ContextVar("profile", default=None)
+_in_background: ContextVar[bool] = ContextVar("profile_background", default=False)
+_running: List[Profile] = []
+_running_lock = threading.Lock()
+_sampler: Optional[threading.Thread] = None
+_recent: deque = deque(maxlen=PROFILE_MAX_FILES)
+
+
+# ---- 요청 쪽 훅 (프로파일 중이 아니면 contextvar 조회 1번) ----
+def register_thread() -> None:
+    prof = _active.get()
+    if prof is not None:
+        prof.threads.setdefault(threading.get_ident(), None)
+
+
+@contextmanager
+def wait(kind: str):
+    """DB/FCM 대기 구간 측정: with profiler.wait("db"): ..."""
+    prof = _active.get()
+    if prof is None:
+        yield
+        return
+    tid = threading.get_ident()
+    prof.threads[tid] = kind
+    background = _in_background.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        prof.threads[tid] = None
+        with prof.lock:
+            (prof.bg_waits if background else prof.waits)[kind] += elapsed
+            (prof.bg_calls if background else prof.calls)[kind] += 1
+
+
+def current() -> Optional[Profile]:
+    return _active.get()
+
+
+@contextmanager
+def attach(prof: Optional[Profile], waiting: Optional[str] = None, background: bool = False):
+    """
+    다른 스레드에서 prof 를 이어서 잰다 (이 스레드를 샘플링 대상에 넣고 wait() 가 prof 에 기록).
+    waiting: 이 스레드 샘플 전체에 붙일 대기 종류 (fcm executor 는 "fcm")
+    """
+    if prof is None:
+        yield
+        return
+    tid = threading.get_ident()
+    token, bg_token = _active.set(prof), _in_background.set(background)
+    prof.threads[tid] = waiting
+    if background:
+        prof.background.add(tid)
+    try:
+        yield
+    finally:
+        prof.threads.pop(tid, None)
+        prof.background.discard(tid)
+        _in_background.reset(bg_token)
+        _active.reset(token)
+
+
+def bind(fn: Callable, waiting: Optional[str] = None) -> Callable:
+    """executor 에 넘길 fn 을 현재 프로파일(있으면)을 이어 받도록 감싼다. 프로파일 중이 아니면 fn 그대로"""
+    prof = _active.get()
+    if prof is None:
+        return fn
+    background = _in_background.get()
+
+    def run(*args, **kwargs):
+        with attach(prof, waiting=waiting, background=background):
+            return fn(*args, **kwargs)
+    return run
+
+
+def hold() -> Optional[Profile]:
+    """
+    응답 뒤에 다른 스레드에서 돌 작업(이벤트 구독자)을 현재 프로파일에 묶는다.
+    그 작업이 release() 할 때까지 샘플링을 계속하고 저장을 미룬다.
+    """
+    prof = _active.get()
+    if prof is not None:
+        with prof.lock:
+            prof.jobs += 1
+            prof.pending += 1
+    return prof
+
+
+def release(prof: Optional[Profile]) -> None:
+    if prof is None:
+        return
+    with prof.lock:
+        prof.pending -= 1
+        last = prof.pending == 0 and prof.ended is not None
+    if last:
+        _finish(prof)
+
+
+# ---- 샘플러 ----
+def _frame_label(frame) -> Optional[str]:
+    code = frame.f_code
+    if any(s in code.co_filename for s in _SKIP_FILES):
+        return None
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _stack(frame) -> List[str]:
+    out = []
+    while frame is not None:
+        label = _frame_label(frame)
+        if label:
+            out.append(label)
+        frame = frame.f_back
+    out.reverse()
+    return out
+
+
+def _sample_loop() -> None:
+    global _sampler
+    interval = PROFILE_INTERVAL_MS / 1000.0
+    while True:
+        with _running_lock:
+            running = list(_running)
+            if not running:
+                _sampler = None
+                return
+        frames = sys._current_frames()
+        for prof in running:
+            for tid, waiting in list(prof.threads.items()):
+                frame = frames.get(tid)
+                if frame is None:
+                    continue
+                stack = _stack(frame)
+                if waiting:
+                    stack.append(f"[{waiting} wait]")
+                if stack and tid in prof.background:
+                    stack.insert(0, "[after response]")
+                if stack:
+                    prof.stacks[";".join(stack)] += 1
+                    prof.samples += 1
+        del frames
+        time.sleep(interval)
+
+
+def start(name: str, reason: str) -> Profile:
+    global _sampler
+    prof = Profile(name, reason)
+    with _running_lock:
+        _running.append(prof)
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name="profiler-sampler", daemon=True)
+            _sampler.start()
+    return prof
+
+
+def stop(prof: Profile) -> bool:
+    """요청 끝. 묶인 구독자가 남아 있으면 False (마지막 release() 가 저장) → True 면 호출부가 save()"""
+    with prof.lock:
+        prof.ended = time.perf_counter()
+        done = prof.pending == 0
+    if done:
+        _unregister(prof)
+    return done
+
+
+def _unregister(prof: Profile) -> None:
+    prof.finished = time.perf_counter()
+    with _running_lock:
+        if prof in _running:
+            _running.remove(prof)
+
+
+def _finish(prof: Profile) -> None:
+    _unregister(prof)
+    _save_logged(prof)
+
+
+# ---- 출력 ----
+def _speedscope(prof: Profile) -> Dict[str, Any]:
+    frames: List[Dict[str, str]] = []
+    index: Dict[str, int] = {}
+    samples, weights = [], []
+    for stack, count in prof.stacks.most_common():
+        ids = []
+        for label in stack.split(";"):
+            if label not in index:
+                index[label] = len(frames)
+                frames.append({"name": label})
+            ids.append(index[label])
+        samples.append(ids)
+        weights.append(count * PROFILE_INTERVAL_MS)
+    s = prof.summary()
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": prof.name,
+        "exporter": "app.profiler",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": f"{prof.name} wall={s['wallMs']}ms python={s['pythonMs']}ms db={s['dbMs']}ms fcm={s['fcmMs']}ms",
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+        "summary": s,
+    }
+
+
+def save(prof: Profile) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    if PROFILE_FORMAT == "collapsed":
+        path = os.path.join(PROFILE_DIR, prof.name + ".collapsed.txt")
+        body = "".join(f"{stack} {count}\n" for stack, count in prof.stacks.most_common())
+    else:
+        path = os.path.join(PROFILE_DIR, prof.name + ".speedscope.json")
+        body = json.dumps(_speedscope(prof), ensure_ascii=False)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(body)
+    _recent.append(prof.summary())
+    _prune()
+    return path
+
+
+def _save_logged(prof: Profile) -> None:
+    try:
+        save(prof)
+    except OSError:
+        log.exception("failed to save profile %s", prof.name)
+
+
+def _prune() -> None:
+    files = list_files()
+    for f in files[PROFILE_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, f["file"]))
+        except OSError:
+            pass
+
+
+def list_files() -> List[Dict[str, Any]]:
+    """최신순"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    summaries = {s["name"]: s for s in _recent}
+    out = []
+    for fname in os.listdir(PROFILE_DIR):
+        path = os.path.join(PROFILE_DIR, fname)
+        if not os.path.isfile(path):
+            continue
+        st = os.stat(path)
+        name = fname.split(".")[0]
+        out.append({"file": fname, "bytes": st.st_size, "mtime": st.st_mtime, "summary": summaries.get(name)})
+    out.sort(key=lambda f: f["mtime"], reverse=True)
+    return out
+
+
+def file_path(fname: str) -> Optional[str]:
+    if os.path.basename(fname) != fname or fname.startswith("."):
+        return None
+    path = os.path.join(PROFILE_DIR, fname)
+    return path if os.path.isfile(path) else None
+
+
+# ---- 트리거 ----
+def sign(ts: int, method: str, path: str, secret: str = PROFILE_SECRET) -> str:
+    msg = f"{ts}:{method.upper()}:{path}".encode()
+    return hmac.new(secret.encode(), msg, hashlib.sha256).hexdigest()
+
+
+def _verify(header: str, method: str, path: str) -> bool:
+    if not PROFILE_SECRET:
+        return False
+    ts_str, _, sig = header.partition(".")
+    try:
+        ts = int(ts_str)
+    except ValueError:
+        return False
+    if abs(time.time() - ts) > PROFILE_SIGNATURE_TTL_SEC:
+        return False
+    return hmac.compare_digest(sig, sign(ts, method, path))
+
+
+def _name(method: str, path: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-")[:60] or "root"
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{method.lower()}-{slug}-{os.urandom(3).hex()}"
+
+
+class ProfilerMiddleware:
+    """순수 ASGI 미들웨어: 서명 헤더 / 랜덤 샘플링으로 고른 요청만 프로파일"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/admin/profiles"):
+            return await self.app(scope, receive, send)
+
+        reason = None
+        for k, v in scope.get("headers") or []:
+            if k == PROFILE_HEADER:
+                if _verify(v.decode("latin-1"), scope["method"], scope["path"]):
+                    reason = "header"
+                break
+        if reason is None and PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            reason = "sampled"
+        if reason is None:
+            return await self.app(scope, receive, send)
+
+        prof = start(_name(scope["method"], scope["path"]), reason)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", prof.name.encode())]}
+            await send(message)
+
+        token = _active.set(prof)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _active.reset(token)
+            if stop(prof):
+                # 파일 쓰기/정리(listdir, remove)가 이벤트 루프를 막지 않게
+                await asyncio.to_thread(_save_logged, prof)
@@ -0,0 +1,193 @@
+# app/ratelimit.py
+"""
+쓰기 API용 token bucket rate limit (손님/기기/IP 별)
+
+- 키마다 [tokens, updated_at] 두 값만 들고 있다(O(1) 메모리).
+  토큰은 요청 시점에 경과 시간만큼 채우므로 별도 타이머가 없다.
+- 버킷이 가득 찰 만큼(burst / rate) 쉬고 있던 키는 상태가 없는 것과 같으므로 지운다.
+  OrderedDict 를 마지막 사용 순으로 유지해 앞에서부터 몇 개씩만 보면 된다.
+- 한 번 검사 = 락 1번 + 산술 몇 번 (수 μs).
+- 한 요청이 버킷 여러 개(IP + 손님)를 보면 모두 토큰이 있을 때만 한꺼번에 차감한다
+  → 손님 버킷에서 거절된 요청이 IP 토큰만 먹지 않는다.
+- RATE_LIMIT_REDIS_URL 이 있으면 워커 간 공유 버킷(Lua 스크립트로 원자적 갱신)을 쓴다.
+  redis 패키지(requirements.txt)가 없거나 연결이 안 되면 프로세스 메모리로 fallback (시작 시 경고 로그).
+
+설정 (초당 rate / burst):
+  RATE_ORDERS=0.2/5      손님(customerId)별 POST /orders
+  RATE_DEVICES=0.2/5     기기(fcmToken)별 POST /devices/register
+  RATE_GUEST=0.2/5       손님(id)별 POST /users/guest
+  RATE_IP=2/30           IP별 (위 세 라우트 공통)
+  RATE_LIMIT_ENABLED=false 로 끌 수 있다.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "").strip()
+# 프록시 뒤라면 X-Forwarded-For 첫 값을 IP로 쓴다
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("rate limited")
+        self.retry_after = retry_after
+
+
+class Limit:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate    # 초당 채워지는 토큰
+        self.burst = burst  # 최대 토큰(연속 허용 횟수)
+
+    @classmethod
+    def parse(cls, spec: str) -> "Limit":
+        rate, burst = spec.split("/")
+        return cls(float(rate), float(burst))
+
+    @property
+    def idle_sec(self) -> float:
+        # 이만큼 안 쓰면 버킷이 가득 참 → 상태를 버려도 결과가 같다
+        return self.burst / self.rate
+
+
+LIMITS: Dict[str, Limit] = {
+    "orders": Limit.parse(os.getenv("RATE_ORDERS", "0.2/5")),
+    "devices": Limit.parse(os.getenv("RATE_DEVICES", "0.2/5")),
+    "guest": Limit.parse(os.getenv("RATE_GUEST", "0.2/5")),
+    "ip": Limit.parse(os.getenv("RATE_IP", "2/30")),
+}
+
+
+class MemoryBuckets:
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # key -> [tokens, updated_at, idle_sec], 마지막 사용 순
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self.evicted = 0
+
+    def take(self, checks: List[Tuple[str, Limit]]) -> float:
+        """
+        checks 의 버킷마다 토큰 1개를 쓴다 (전부 있을 때만 한꺼번에).
+        성공이면 0, 실패면 (아무것도 차감하지 않고) 모든 버킷에 토큰이 생길 때까지 남은 초
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = []
+            for key, limit in checks:
+                b = self._buckets.get(key)
+                if b is None:
+                    b = [limit.burst, now, limit.idle_sec]
+                    self._buckets[key] = b
+                else:
+                    b[0] = min(limit.burst, b[0] + (now - b[1]) * limit.rate)
+                    b[1] = now
+                    self._buckets.move_to_end(key)
+                state.append((b, limit))
+            wait = max((1.0 - b[0]) / limit.rate if b[0] < 1.0 else 0.0 for b, limit in state)
+            if wait == 0:
+                for b, _ in state:
+                    b[0] -= 1.0
+            self._evict(now)
+            return wait
+
+    def _evict(self, now: float) -> None:
+        # 가장 오래 안 쓴 키부터 몇 개만 확인 (요청당 비용을 상수로 유지)
+        for _ in range(4):
+            if not self._buckets:
+                return
+            key, b = next(iter(self._buckets.items()))
+            if now - b[1] < b[2] and len(self._buckets) <= self.max_keys:
+                return
+            del self._buckets[key]
+            self.evicted += 1
+
+    def size(self) -> int:
+        return len(self._buckets)
+
+
+# KEYS=버킷들, ARGV: (rate, burst) 버킷 수만큼 + now(ms). 반환: 대기 ms (0이면 허용 → 전부 차감)
+_REDIS_LUA = """
+local now = tonumber(ARGV[#ARGV])
+local tokens, wait = {}, 0
+for i, key in ipairs(KEYS) do
+  local rate, burst = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+  local b = redis.call('HMGET', key, 't', 'u')
+  local t = tonumber(b[1]) or burst
+  local updated = tonumber(b[2]) or now
+  t = math.min(burst, t + (now - updated) / 1000 * rate)
+  if t < 1 then wait = math.max(wait, math.ceil((1 - t) / rate * 1000)) end
+  tokens[i] = t
+end
+for i, key in ipairs(KEYS) do
+  local rate, burst = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+  if wait == 0 then tokens[i] = tokens[i] - 1 end
+  redis.call('HSET', key, 't', tokens[i], 'u', now)
+  redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000))
+end
+return wait
+"""
+
+
+class RedisBuckets:
+    """여러 워커가 같은 버킷을 본다. 요청마다 redis 왕복 1번이 추가된다."""
+
+    def __init__(self, url: str):
+        import redis  # optional dependency
+
+        self._client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.2)
+        self._script = self._client.register_script(_REDIS_LUA)
+        self._fallback = MemoryBuckets()
+
+    def take(self, checks: List[Tuple[str, Limit]]) -> float:
+        args = [v for _, limit in checks for v in (limit.rate, limit.burst)]
+        try:
+            wait_ms = self._script(keys=[f"rl:{key}" for key, _ in checks], args=[*args, int(time.time() * 1000)])
+            return int(wait_ms) / 1000.0
+        except Exception:
+            # redis 장애로 쓰기 API 전체를 막지 않는다
+            return self._fallback.take(checks)
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+def _backend():
+    if RATE_LIMIT_REDIS_URL:
+        try:
+            return RedisBuckets(RATE_LIMIT_REDIS_URL)
+        except ImportError:
+            log.warning("RATE_LIMIT_REDIS_URL is set but redis is not installed; using in-process buckets")
+    return MemoryBuckets()
+
+
+buckets = _backend()
+
+
+def check(*limits: Tuple[str, Optional[str]]) -> None:
+    """
+    (name, key) 마다 LIMITS[name] 버킷에서 key 로 토큰 1개 (key 가 없으면 그 버킷은 건너뜀).
+    하나라도 부족하면 아무 버킷도 차감하지 않고 RateLimited
+    """
+    checks = [(f"{name}:{key}", LIMITS[name]) for name, key in limits if key]
+    if not RATE_LIMIT_ENABLED or not checks:
+        return
+    wait = buckets.take(checks)
+    if wait > 0:
+        raise RateLimited(max(1, math.ceil(wait)))
+
+
+def client_ip(headers, client_host: Optional[str]) -> Optional[str]:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        fwd = headers.get("x-forwarded-for")
+        if fwd:
+            return fwd.split(",")[0].strip()
+    return client_host
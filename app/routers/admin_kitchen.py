@@ -0,0 +1,49 @@
+# app/routers/admin_kitchen.py
+import asyncio
+import json
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+
+from app import kitchen
+
+router = APIRouter(prefix="/admin/kitchen", tags=["admin-kitchen"])
+
+HEARTBEAT_SEC = 15
+
+
+@router.get("")
+def kitchen_queue():
+    """메뉴별/옵션별 밀린 수량 (PLACED=접수 전, ACCEPTED=조리 중). DB 조회 없음"""
+    return kitchen.snapshot()
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@router.get("/stream")
+async def kitchen_stream(request: Request):
+    """
+    SSE: 처음에 snapshot 한 번, 이후 바뀐 행만 delta 로 push
+    (구독자가 너무 밀리면 snapshot 을 다시 보냄)
+    """
+    q = kitchen.subscribe()
+
+    async def events():
+        try:
+            yield _sse("snapshot", kitchen.snapshot())
+            while not await request.is_disconnected():
+                try:
+                    msg = await asyncio.wait_for(q.get(), HEARTBEAT_SEC)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if msg is None:
+                    yield _sse("snapshot", kitchen.snapshot())
+                else:
+                    yield _sse("delta", msg)
+        finally:
+            kitchen.unsubscribe(q)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,16 @@
+# app/routers/admin_menu.py
+from fastapi import APIRouter, Depends
+
+from app import menu_import
+from app.deps import admit_write
+
+router = APIRouter(prefix="/admin/menu", tags=["admin-menu"])
+
+
+@router.post("/import", dependencies=[Depends(admit_write)])
+def admin_import_menu(payload: menu_import.MenuDocument, dryRun: bool = False):
+    """
+    메뉴 전체를 한 번에 반영 (GET /menu 응답 모양 그대로)
+    - dryRun=true 면 바뀔 행 수만 보고 되돌린다
+    """
+    return menu_import.import_menu(payload, dry_run=dryRun)
@@ -1,16 +1,16 @@
 # app/routers/admin_notifications.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-import json
 
 from app.db import get_conn
-from app.fcm import send_fcm_to_tokens
+from app.deps import admit_write
+from app import fcm, notify
 
 router = APIRouter(prefix="/admin/notifications", tags=["admin-notifications"])
 
 @router.get("")
 def list_notifications(orderId: str | None = None, limit: int = 100):
-    conn = get_conn()
+    conn = get_conn(readonly=True, keys=(f"order:{orderId}" if orderId else None,))
     try:
         with conn:
             with conn.cursor() as cur:
@@ -20,9 +20,10 @@ def list_notifications(orderId: str | None = None, limit: int = 100):
                                channel, title, body, send_status, error_message, created_at, sent_at
                         from notification_logs
                         where order_id=%s
+                          and created_at >= (select created_at from orders where id=%s)
                         order by created_at desc
                         limit %s
-                    """, (orderId, limit))
+                    """, (orderId, orderId, limit))
                 else:
                     cur.execute("""
                         select id::text, order_id::text as order_id, user_id::text as user_id,
@@ -36,107 +37,67 @@ def list_notifications(orderId: str | None = None, limit: int = 100):
         conn.close()
 
 
-class DispatchOut(BaseModel):
-    processed: int
-    sent: int
-    failed: int
-
-@router.post("/dispatch", response_model=DispatchOut)
-def dispatch_notifications(limit: int = 50):
+@router.get("/metrics")
+def notification_metrics():
     """
-    notification_logs에서 send_status='queued'인 것들을 꺼내서
-    devices의 active token들로 실제 FCM 전송하고
-    send_status를 sent/failed 로 업데이트한다.
+    우선순위 레인별 대기 건수(DB) + enqueue→발송 지연 p50/p95/p99(이 프로세스에서 보낸 것 기준)
     """
-    conn = get_conn()
-    processed = 0
-    sent_total = 0
-    failed_total = 0
-
+    conn = get_conn(readonly=True)
     try:
         with conn:
             with conn.cursor() as cur:
-                # 1) queued 알림 가져오기
                 cur.execute("""
-                    select id::text as id,
-                           order_id::text as order_id,
-                           user_id::text as user_id,
-                           title, body, payload
+                    select priority, count(*) as queued,
+                           count(*) filter (where next_attempt_at <= now()) as due,
+                           extract(epoch from now() - min(next_attempt_at) filter (where next_attempt_at <= now())) as oldest_due_sec
                     from notification_logs
                     where send_status='queued' and channel='fcm'
-                    order by created_at asc
-                    limit %s
-                """, (limit,))
-                rows = cur.fetchall() or []
-
-                for n in rows:
-                    processed += 1
+                      and created_at >= now() - make_interval(hours => %s)
+                    group by priority
+                """, (notify.DISPATCH_MAX_AGE_HOURS,))
+                depth = {r["priority"]: r for r in (cur.fetchall() or [])}
+    finally:
+        conn.close()
 
-                    # 2) 사용자 devices 토큰 조회
-                    cur.execute("""
-                        select fcm_token
-                        from devices
-                        where user_id=%s and is_active=true and fcm_token is not null and fcm_token <> ''
-                    """, (n["user_id"],))
-                    tokens = [r["fcm_token"] for r in (cur.fetchall() or [])]
+    lanes = notify.lane_metrics()
+    for lane in lanes.values():
+        d = depth.get(lane["priority"]) or {}
+        lane["queued"] = d.get("queued", 0)
+        lane["due"] = d.get("due", 0)
+        lane["oldestDueSec"] = float(d["oldest_due_sec"]) if d.get("oldest_due_sec") is not None else None
+    return {"lanes": lanes, "starvationSec": notify.STARVATION_SEC}
 
-                    if not tokens:
-                        failed_total += 1
-                        cur.execute("""
-                            update notification_logs
-                            set send_status='failed',
-                                error_message=%s,
-                                sent_at=now()
-                            where id=%s
-                        """, ("no active device tokens", n["id"]))
-                        continue
 
-                    # payload: jsonb -> dict
-                    data_payload = n["payload"] or {}
-                    if isinstance(data_payload, str):
-                        try:
-                            data_payload = json.loads(data_payload)
-                        except:
-                            data_payload = {}
+@router.get("/fcm")
+def fcm_breaker():
+    """FCM circuit breaker 상태 (closed / open / half_open, 이 프로세스 기준)"""
+    return fcm.breaker.snapshot()
 
-                    # 3) FCM 발송
-                    try:
-                        resp = send_fcm_to_tokens(
-                            tokens=tokens,
-                            title=n["title"],
-                            body=n["body"],
-                            data={k: str(v) for k, v in (data_payload or {}).items()},
-                        )
 
-                        # 성공/실패 집계
-                        if resp.get("failed", 0) == 0:
-                            sent_total += 1
-                            cur.execute("""
-                                update notification_logs
-                                set send_status='sent',
-                                    error_message=null,
-                                    sent_at=now()
-                                where id=%s
-                            """, (n["id"],))
-                        else:
-                            failed_total += 1
-                            cur.execute("""
-                                update notification_logs
-                                set send_status='failed',
-                                    error_message=%s,
-                                    sent_at=now()
-                                where id=%s
-                            """, (json.dumps(resp.get("results", []))[:2000], n["id"]))
-                    except Exception as e:
-                        failed_total += 1
-                        cur.execute("""
-                            update notification_logs
-                            set send_status='failed',
-                                error_message=%s,
-                                sent_at=now()
-                            where id=%s
-                        """, (str(e)[:2000], n["id"]))
+class DispatchOut(BaseModel):
+    processed: int
+    sent: int
+    failed: int
+    retry: int = 0
+    deferred: int = 0
+    coalesced: int = 0
 
-        return DispatchOut(processed=processed, sent=sent_total, failed=failed_total)
-    finally:
-        conn.close()
+@router.post("/dispatch", response_model=DispatchOut, dependencies=[Depends(admit_write)])
+def dispatch_notifications(limit: int = 50):
+    """
+    notification_logs에서 send_status='queued'이고 재시도 시각(next_attempt_at)이 된 것들을 꺼내서
+    devices의 active token들로 실제 FCM 전송하고
+    send_status를 sent/failed 로 업데이트한다. (일시적 오류면 백오프 후 다시 queued)
+    (사장님 새 주문처럼 묶어 보내는 알림은 notify.flush_coalesced 가 처리)
+    평소에는 notify 스케줄러가 주기적으로 돌리므로 수동 호출은 즉시 비우고 싶을 때만.
+    """
+    coalesced = notify.flush_coalesced()["logs"]
+    out = notify.dispatch_due(limit)
+    return DispatchOut(
+        processed=out["processed"],
+        sent=out["sent"],
+        failed=out["failed"],
+        retry=out["retry"],
+        deferred=out["deferred"],
+        coalesced=coalesced,
+    )
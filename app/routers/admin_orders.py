@@ -1,17 +1,33 @@
 # app/routers/admin_orders.py
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+import csv
+import io
 import json
+import os
+from datetime import date, timedelta
 
-from app.db import get_conn
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 
-from app.fcm import send_push_to_tokens
+from app.db import get_conn
+from app import events, notify, order_history, stats, tenants
+from app.deps import admit_write
+from app.stats import STATS_TZ
 
 router = APIRouter(prefix="/admin/orders", tags=["admin-orders"])
 
+# export: server-side cursor 가 한 번에 가져오는 행 수 / 응답 chunk 당 행 수
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "2000"))
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "500"))
+EXPORT_COLUMNS = [
+    "order_no", "order_id", "created_at", "status", "customer_id", "total_amount",
+    "accepted_at", "completed_at", "canceled_at",
+    "item_name", "price", "qty", "line_amount", "options",
+]
+
 @router.get("")
 def admin_list_orders(status: str | None = None, limit: int = 50):
-    conn = get_conn()
+    conn = get_conn(readonly=True)
     try:
         with conn:
             with conn.cursor() as cur:
@@ -35,13 +51,134 @@ def admin_list_orders(status: str | None = None, limit: int = 50):
         conn.close()
 
 
+@router.get("/metrics")
+def admin_order_metrics():
+    """손님 주문내역 캐시 hit/miss/eviction"""
+    return {"historyCache": order_history.metrics()}
+
+
+def _export_rows(conn, from_: date, to: date):
+    """
+    주문 라인 단위 행 (라인 없는 주문은 item_* 가 null 인 한 행).
+    named cursor(server-side) 라 EXPORT_FETCH_SIZE 씩만 메모리에 올린다.
+    """
+    with conn.cursor(name="orders_export") as cur:
+        cur.itersize = EXPORT_FETCH_SIZE
+        cur.execute("""
+            select o.order_no, o.id::text as order_id, o.created_at, o.status,
+                   o.customer_id::text as customer_id, o.total_amount,
+                   o.accepted_at, o.completed_at, o.canceled_at,
+                   oi.name_snapshot as item_name, oi.price_snapshot as price, oi.qty, oi.line_amount,
+                   opt.options
+            from orders o
+            left join order_items oi on oi.order_id = o.id
+            left join lateral (
+                select json_agg(json_build_object(
+                         'option', x.option_name, 'value', x.value_label, 'priceDelta', x.price_delta
+                       ) order by x.id) as options
+                from order_item_options x
+                where x.order_item_id = oi.id
+            ) opt on true
+            where o.created_at >= (%s::date)::timestamp at time zone %s
+              and o.created_at < (%s::date + 1)::timestamp at time zone %s
+            order by o.created_at, o.order_no, oi.id
+        """, (from_, STATS_TZ, to, STATS_TZ))
+        yield from cur
+
+
+def _options_cell(options) -> str:
+    return " | ".join(
+        f"{o['option']}:{o['value']}" + (f"(+{o['priceDelta']})" if o["priceDelta"] else "")
+        for o in options or []
+    )
+
+
+def _csv_stream(conn, from_: date, to: date):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    # 엑셀에서 한글이 깨지지 않도록 BOM
+    buf.write("\ufeff")
+    writer.writerow(EXPORT_COLUMNS)
+    n = 0
+    for r in _export_rows(conn, from_, to):
+        writer.writerow([
+            "" if r[c] is None else (_options_cell(r[c]) if c == "options" else r[c])
+            for c in EXPORT_COLUMNS
+        ])
+        n += 1
+        if n % EXPORT_CHUNK_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def _ndjson_stream(conn, from_: date, to: date):
+    """주문 1건 = 1줄 (lines 에 라인/옵션). 행이 주문별로 붙어서 오므로 바뀔 때마다 내보낸다"""
+    out, current = [], None
+    for r in _export_rows(conn, from_, to):
+        if current is None or current["orderId"] != r["order_id"]:
+            if current is not None:
+                out.append(json.dumps(current, ensure_ascii=False, default=str))
+                if len(out) >= EXPORT_CHUNK_ROWS:
+                    yield "\n".join(out) + "\n"
+                    out = []
+            current = {
+                "orderNo": r["order_no"], "orderId": r["order_id"], "createdAt": r["created_at"],
+                "status": r["status"], "customerId": r["customer_id"], "totalAmount": r["total_amount"],
+                "acceptedAt": r["accepted_at"], "completedAt": r["completed_at"], "canceledAt": r["canceled_at"],
+                "lines": [],
+            }
+        if r["item_name"] is not None:
+            current["lines"].append({
+                "name": r["item_name"], "price": r["price"], "qty": r["qty"],
+                "lineAmount": r["line_amount"], "options": r["options"] or [],
+            })
+    if current is not None:
+        out.append(json.dumps(current, ensure_ascii=False, default=str))
+    if out:
+        yield "\n".join(out) + "\n"
+
+
+@router.get("/export")
+def admin_export_orders(
+    from_: date = Query(..., alias="from"),
+    to: date = Query(...),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+):
+    """
+    정산용 주문 export (라인/옵션 포함). 날짜는 STATS_TZ 기준, to 포함
+    - ?from=2026-10-01&to=2026-10-31&format=csv|ndjson
+    - server-side cursor → StreamingResponse: 몇 백만 행이어도 메모리 일정, 첫 바이트 바로 전송
+    """
+    if from_ > to:
+        raise HTTPException(400, "from must be <= to")
+
+    stream = _csv_stream if format == "csv" else _ndjson_stream
+    tenant = tenants.current()
+
+    def body():
+        # 스트림이 실제로 시작될 때 커넥션을 빌린다 (시작 전에 끊겨도 새지 않도록)
+        with tenants.use(tenant):
+            conn = get_conn(readonly=True)
+        try:
+            yield from stream(conn, from_, to)
+        finally:
+            conn.close()
+
+    ext, media = ("csv", "text/csv; charset=utf-8") if format == "csv" else ("ndjson", "application/x-ndjson")
+    filename = f"orders-{tenant.id}-{from_}-{to}.{ext}"
+    return StreamingResponse(body(), media_type=media,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
 class AcceptIn(BaseModel):
     ownerId: str
     message: str | None = None
 
-@router.post("/{order_id}/accept")
+@router.post("/{order_id}/accept", dependencies=[Depends(admit_write)])
 def admin_accept(order_id: str, payload: AcceptIn):
-    title = "임진매운갈비"
+    title = tenants.current().name
     body = payload.message or "조리가 시작되었습니다! 잠시만 기다려 주세요 😊"
     data_payload = {"type": "order_status", "orderId": order_id, "nextStatus": "ACCEPTED"}
 
@@ -49,9 +186,11 @@ def admin_accept(order_id: str, payload: AcceptIn):
     try:
         with conn:
             with conn.cursor() as cur:
+                # for update: 동시 상태 변경이 같은 이전 상태를 보고 둘 다 통과하지 않게
                 cur.execute("""
                     select status, customer_id::text as customer_id, order_no
                     from orders where id=%s
+                    for update
                 """, (order_id,))
                 row = cur.fetchone()
                 if not row:
@@ -76,64 +215,19 @@ def admin_accept(order_id: str, payload: AcceptIn):
                     insert into order_status_logs(order_id, from_status, to_status, changed_by)
                     values (%s, %s, 'ACCEPTED', %s)
                 """, (order_id, prev, payload.ownerId))
+                stats.record_transition(cur, order_id, prev, "ACCEPTED")
 
-                # 3) notification_logs 먼저 queued로 기록
-                cur.execute("""
-                    insert into notification_logs(order_id, user_id, channel, title, body, payload, send_status)
-                    values (%s, %s, 'fcm', %s, %s, %s::jsonb, 'queued')
-                    returning id::text as id
-                """, (order_id, row["customer_id"], title, body, json.dumps(data_payload)))
-                noti = cur.fetchone()
-                noti_id = noti["id"]
-
-                # 4) 고객 devices 토큰 조회
-                cur.execute("""
-                    select fcm_token
-                    from devices
-                    where user_id=%s and is_active=true
-                    order by last_seen_at desc nulls last
-                    limit 20
-                """, (row["customer_id"],))
-                tokens = [r["fcm_token"] for r in (cur.fetchall() or []) if r.get("fcm_token")]
-
-                # 5) 실제 FCM 발송
-                try:
-                    success_count, results = send_push_to_tokens(
-                        tokens=tokens,
-                        title=title,
-                        body=body,
-                        data={k: str(v) for k, v in data_payload.items()},
-                    )
-
-                    # 6) notification_logs 업데이트 (sent/failed)
-                    if tokens and success_count > 0:
-                        cur.execute("""
-                            update notification_logs
-                            set send_status='sent', sent_at=now(), error_message=null
-                            where id=%s
-                        """, (noti_id,))
-                    else:
-                        cur.execute("""
-                            update notification_logs
-                            set send_status='failed',
-                                error_message=%s
-                            where id=%s
-                        """, (json.dumps({"tokens": len(tokens), "results": results})[:4000], noti_id))
-
-                except Exception as e:
-                    # FCM 자체 실패
-                    cur.execute("""
-                        update notification_logs
-                        set send_status='failed',
-                            error_message=%s
-                        where id=%s
-                    """, (str(e)[:4000], noti_id))
-
-                # out에는 status=ACCEPTED 포함 → 고객 주문상세에서도 그대로 보임
-                return {
-                    **out,
-                    "push": {"tokens": len(tokens)}
-                }
+                # 3) notification_logs 를 queued로 기록 → 커밋 후 이벤트 구독자가 발송
+                #    (일시적 오류면 재시도 예약)
+                noti = notify.queue_logs(cur, order_id, [row["customer_id"]] if row["customer_id"] else [],
+                                         title, body, data_payload, notify.PRIORITY_STATUS)
+
+        events.publish(events.OrderAccepted(order_id, row["customer_id"], prev, noti))
+        # out에는 status=ACCEPTED 포함 → 고객 주문상세에서도 그대로 보임
+        return {
+            **out,
+            "push": {"status": "queued" if noti else "skipped"}
+        }
     finally:
         conn.close()
 
@@ -141,13 +235,13 @@ def admin_accept(order_id: str, payload: AcceptIn):
 class CompleteIn(BaseModel):
     ownerId: str
 
-@router.post("/{order_id}/complete")
+@router.post("/{order_id}/complete", dependencies=[Depends(admit_write)])
 def admin_complete(order_id: str, payload: CompleteIn):
     conn = get_conn()
     try:
         with conn:
             with conn.cursor() as cur:
-                cur.execute("""select status from orders where id=%s""", (order_id,))
+                cur.execute("""select status, customer_id::text as customer_id from orders where id=%s for update""", (order_id,))
                 row = cur.fetchone()
                 if not row:
                     raise HTTPException(404, "order not found")
@@ -167,7 +261,17 @@ def admin_complete(order_id: str, payload: CompleteIn):
                     insert into order_status_logs(order_id, from_status, to_status, changed_by)
                     values (%s, %s, 'COMPLETED', %s)
                 """, (order_id, prev, payload.ownerId))
+                stats.record_transition(cur, order_id, prev, "COMPLETED")
+
+                # 손님에게 "준비 완료" 푸시 (커밋 후 발송)
+                noti = notify.queue_logs(
+                    cur, order_id, [row["customer_id"]] if row["customer_id"] else [], tenants.current().name,
+                    "주문하신 메뉴가 준비되었습니다! 맛있게 드세요 😊",
+                    {"type": "order_status", "orderId": order_id, "nextStatus": "COMPLETED"},
+                    notify.PRIORITY_STATUS,
+                )
 
-                return out
+        events.publish(events.OrderCompleted(order_id, row["customer_id"], prev, noti))
+        return out
     finally:
         conn.close()
@@ -0,0 +1,22 @@
+# app/routers/admin_profiles.py
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+
+from app import profiler
+
+router = APIRouter(prefix="/admin/profiles", tags=["admin-profiles"])
+
+
+@router.get("")
+def list_profiles():
+    """저장된 요청 프로파일 (최신순). 파일은 speedscope.app 에 그대로 열면 된다"""
+    return {"dir": profiler.PROFILE_DIR, "maxFiles": profiler.PROFILE_MAX_FILES, "profiles": profiler.list_files()}
+
+
+@router.get("/{name}")
+def download_profile(name: str):
+    path = profiler.file_path(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="profile not found")
+    media = "application/json" if name.endswith(".json") else "text/plain"
+    return FileResponse(path, media_type=media, filename=name)
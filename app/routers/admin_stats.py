@@ -0,0 +1,143 @@
+# app/routers/admin_stats.py
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+from fastapi import APIRouter, HTTPException, Query
+
+from app.db import get_conn
+from app.stats import STATS_TZ
+
+router = APIRouter(prefix="/admin/stats", tags=["admin-stats"])
+
+MAX_RANGE_DAYS = 366
+
+
+def _today() -> date:
+    return datetime.now(ZoneInfo(STATS_TZ)).date()
+
+
+@router.get("/daily")
+def daily_stats(from_: date | None = Query(None, alias="from"), to: date | None = None):
+    """
+    일자별 매출/주문 수 (롤업 + 아직 fold 안 된 stats_ledger)
+    - ?from=2026-10-01&to=2026-10-31  (기본: 최근 7일)
+    """
+    to = to or _today()
+    from_ = from_ or (to - timedelta(days=6))
+    if from_ > to:
+        raise HTTPException(400, "from must be <= to")
+    if (to - from_).days >= MAX_RANGE_DAYS:
+        raise HTTPException(400, f"range too large (max {MAX_RANGE_DAYS} days)")
+
+    conn = get_conn(readonly=True)
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    select day, sum(orders_count)::bigint as orders_count,
+                           sum(gross_amount)::bigint as gross_amount,
+                           sum(completed_amount)::bigint as completed_amount,
+                           sum(canceled_amount)::bigint as canceled_amount
+                    from (
+                      select day, orders_count, gross_amount, completed_amount, canceled_amount
+                      from stats_daily
+                      where day between %s and %s
+                      union all
+                      select day, orders_count, gross_amount, completed_amount, canceled_amount
+                      from stats_ledger
+                      where kind = 'day' and day between %s and %s
+                    ) t
+                    group by day
+                    order by day asc
+                """, (from_, to, from_, to))
+                days = cur.fetchall() or []
+
+                cur.execute("""
+                    select day, status, sum(orders_count)::bigint as orders_count
+                    from (
+                      select day, status, orders_count from stats_daily_status where day between %s and %s
+                      union all
+                      select day, status, orders_count from stats_ledger
+                      where kind = 'status' and day between %s and %s
+                    ) t
+                    group by day, status
+                    order by day asc, status asc
+                """, (from_, to, from_, to))
+                by_status = {}
+                for r in cur.fetchall() or []:
+                    by_status.setdefault(r["day"], {})[r["status"]] = r["orders_count"]
+
+                for d in days:
+                    d["byStatus"] = by_status.get(d["day"], {})
+                return {"from": from_, "to": to, "days": days}
+    finally:
+        conn.close()
+
+
+@router.get("/status")
+def status_stats(day: date | None = None):
+    """특정 일자(기본: 오늘) 주문의 현재 상태별 건수/금액"""
+    day = day or _today()
+    conn = get_conn(readonly=True)
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    select status, sum(orders_count)::bigint as orders_count, sum(amount)::bigint as amount
+                    from (
+                      select status, orders_count, amount from stats_daily_status where day=%s
+                      union all
+                      select status, orders_count, amount from stats_ledger where kind = 'status' and day=%s
+                    ) t
+                    group by status
+                    order by status asc
+                """, (day, day))
+                return {"day": day, "statuses": cur.fetchall() or []}
+    finally:
+        conn.close()
+
+
+@router.get("/top-items")
+def top_items(day: date | None = None, limit: int = 10, by: str = "qty"):
+    """
+    인기 메뉴 (취소 제외)
+    - day 없으면 전체 기간, by=qty|amount
+    """
+    if by not in ("qty", "amount"):
+        raise HTTPException(400, "by must be qty|amount")
+    limit = max(1, min(limit, 100))
+
+    conn = get_conn(readonly=True)
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                if day:
+                    cur.execute(f"""
+                        select menu_item_id::text as menu_item_id, max(name) as name,
+                               sum(qty)::bigint as qty, sum(amount)::bigint as amount
+                        from (
+                          select menu_item_id, name, qty, amount from stats_item_daily where day=%s
+                          union all
+                          select menu_item_id, name, qty, amount from stats_ledger where kind = 'item' and day=%s
+                        ) t
+                        group by menu_item_id
+                        having sum(qty) > 0
+                        order by {by} desc, name asc
+                        limit %s
+                    """, (day, day, limit))
+                else:
+                    cur.execute(f"""
+                        select menu_item_id::text as menu_item_id, max(name) as name,
+                               sum(qty)::bigint as qty, sum(amount)::bigint as amount
+                        from (
+                          select menu_item_id, name, qty, amount from stats_item_total
+                          union all
+                          select menu_item_id, name, qty, amount from stats_ledger where kind = 'item'
+                        ) t
+                        group by menu_item_id
+                        having sum(qty) > 0
+                        order by {by} desc, name asc
+                        limit %s
+                    """, (limit,))
+                return {"day": day, "by": by, "items": cur.fetchall() or []}
+    finally:
+        conn.close()
@@ -1,9 +1,10 @@
 # app/routers/devices.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from uuid import UUID
 
 from app.db import get_conn
+from app.deps import admit_write, rate_limit
 
 router = APIRouter(prefix="/devices", tags=["devices"])
 
@@ -19,7 +20,7 @@ def _assert_uuid(v: str) -> str:
     except Exception:
         raise HTTPException(400, "userId must be uuid")
 
-@router.post("/register")
+@router.post("/register", dependencies=[Depends(rate_limit("devices", "fcmToken")), Depends(admit_write)])
 def register_device(payload: RegisterDeviceIn):
     if payload.platform not in ("web", "ios", "android"):
         raise HTTPException(400, "platform must be web|ios|android")
@@ -59,7 +60,7 @@ def register_device(payload: RegisterDeviceIn):
 class UnregisterDeviceIn(BaseModel):
     fcmToken: str
 
-@router.post("/unregister")
+@router.post("/unregister", dependencies=[Depends(admit_write)])
 def unregister_device(payload: UnregisterDeviceIn):
     if not payload.fcmToken or not payload.fcmToken.strip():
         raise HTTPException(400, "fcmToken is required")
@@ -1,73 +1,44 @@
 # app/routers/menu.py
+from typing import Optional
+
 from fastapi import APIRouter
 from app.db import get_conn
+from app import menu_sync, pricing
 
 router = APIRouter(prefix="/menu", tags=["menu"])
 
 @router.get("")
-def get_menu():
+def get_menu(since: Optional[int] = None):
     """
     카테고리/메뉴/옵션을 한 번에 내려주는 손님용 메뉴판 API
+    - since 없으면 전체 + version
+    - since=v 면 v 이후 바뀐 행만 {full: false, version, upserts, deletes}
+      (v 가 너무 오래됐으면 전체 스냅샷 {full: true, ...})
     """
-    conn = get_conn()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    select id::text, name, sort_order, is_active
-                    from menu_categories
-                    where is_active=true
-                    order by sort_order asc, name asc
-                """)
-                categories = cur.fetchall() or []
-
-                cur.execute("""
-                    select id::text, category_id::text as category_id, name, description, price, image_url,
-                           sort_order, is_active
-                    from menu_items
-                    where is_active=true
-                    order by sort_order asc, name asc
-                """)
-                items = cur.fetchall() or []
-
-                # 옵션 정의/값
-                cur.execute("""
-                    select id::text, key, name, selection_type, is_required, sort_order
-                    from menu_item_options
-                    order by sort_order asc, name asc
-                """)
-                options = cur.fetchall() or []
-
-                cur.execute("""
-                    select id::text, option_id::text as option_id, value_key, label, price_delta, sort_order, is_active
-                    from menu_option_values
-                    where is_active=true
-                    order by sort_order asc, label asc
-                """)
-                option_values = cur.fetchall() or []
-
-                # 메뉴-옵션 매핑
-                cur.execute("""
-                    select menu_item_id::text as menu_item_id, option_id::text as option_id, sort_order
-                    from menu_item_option_map
-                    order by sort_order asc
-                """)
-                maps = cur.fetchall() or []
-
-        return {
-            "categories": categories,
-            "items": items,
-            "options": options,
-            "optionValues": option_values,
-            "itemOptionMap": maps,
-        }
-    finally:
-        conn.close()
+    if since is not None:
+        # 대부분은 이미 최신 버전인 기기의 확인 요청 → 캐시된 스냅샷 버전과 같으면 DB 없이 빈 delta.
+        # since 값별 캐시는 클라이언트가 값을 바꿔 가며 메모리를 키울 수 있어 두지 않는다.
+        if since == pricing.get_snapshot().version:
+            return {
+                "full": False, "since": since, "version": since,
+                "upserts": {name: [] for name in menu_sync.TABLES},
+                "deletes": {name: [] for name in menu_sync.TABLES},
+            }
+        delta = menu_sync.load_delta(since)
+        if delta is not None:
+            return delta
+    # 주문 가격표와 같은 스냅샷 (app.pricing.MenuSnapshot)
+    return {"full": True, **pricing.get_snapshot().menu}
+
+
+def warm_menu() -> bool:
+    pricing.get_snapshot()
+    return True
 
 
 @router.get("/items/{item_id}")
 def get_menu_item(item_id: str):
-    conn = get_conn()
+    conn = get_conn(readonly=True)
     try:
         with conn:
             with conn.cursor() as cur:
@@ -1,14 +1,13 @@
 # app/routers/orders.py
 from __future__ import annotations
+import uuid
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field, conint
-from psycopg2.extras import execute_values
-import json
 
-from app.db import get_conn
-
-from app.fcm import send_push_to_tokens
+from app.db import DB_UNAVAILABLE, get_conn
+from app import events, intake, menu_cache, notify, order_history, pricing, stats, tenants
+from app.deps import admit_write, rate_limit
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
@@ -26,211 +25,88 @@ class CreateOrderIn(BaseModel):
     customerNote: Optional[str] = None
     items: List[OrderItemIn]
 
-# ---- 내부 헬퍼(검증) ----
-def _fetch_menu_item(cur, menu_item_id: str):
-    cur.execute("""select id, name, price, is_active from menu_items where id=%s""", (menu_item_id,))
-    row = cur.fetchone()
-    if not row: raise HTTPException(404, f"menu item not found: {menu_item_id}")
-    if not row["is_active"]: raise HTTPException(400, f"menu item inactive: {menu_item_id}")
-    return row
-
-def _fetch_option_meta(cur, option_id: str):
-    cur.execute("""select id, key, name, selection_type, is_required from menu_item_options where id=%s""", (option_id,))
-    row = cur.fetchone()
-    if not row: raise HTTPException(404, f"option not found: {option_id}")
-    return row
-
-def _assert_option_attached(cur, menu_item_id: str, option_id: str):
-    cur.execute("""select 1 from menu_item_option_map where menu_item_id=%s and option_id=%s""", (menu_item_id, option_id))
-    if not cur.fetchone():
-        raise HTTPException(400, f"option not allowed for menu item (menuItemId={menu_item_id}, optionId={option_id})")
-
-def _fetch_option_values(cur, option_id: str, value_keys: List[str]):
-    if not value_keys: return []
-    cur.execute("""
-        select value_key, label, price_delta, is_active
-        from menu_option_values
-        where option_id=%s and value_key = any(%s)
-    """, (option_id, value_keys))
-    rows = cur.fetchall() or []
-    found = {r["value_key"] for r in rows}
-    missing = [k for k in value_keys if k not in found]
-    if missing:
-        raise HTTPException(400, f"invalid option values: {missing}")
-    for r in rows:
-        if not r["is_active"]:
-            raise HTTPException(400, f"option value inactive: {r['value_key']}")
-    by_key = {r["value_key"]: r for r in rows}
-    return [by_key[k] for k in value_keys]
-
-
-@router.post("")
-def create_order(payload: CreateOrderIn):
+class QuoteIn(BaseModel):
+    items: List[OrderItemIn]
+
+
+@router.post("/quote", dependencies=[Depends(rate_limit("orders", "customerId")), Depends(admit_write)])
+def quote_order(payload: QuoteIn):
+    """
+    장바구니 검증 + 가격 계산만 (주문 생성 X, DB 조회 X)
+    create_order와 같은 app.pricing.price_cart 를 쓰므로 금액이 항상 일치한다.
+    가격표가 식었으면 DB 를 읽으므로 rate limit / admission 도 create_order 와 같게 건다.
+    """
     if not payload.items:
         raise HTTPException(400, "items is required")
-
-    conn = get_conn()
+    priced = _price(payload.items)
+    return {
+        "totalAmount": priced["totalAmount"],
+        "menuVersion": priced["menuVersion"],
+        "lines": [
+            {
+                **{k: v for k, v in line.items() if k != "options"},
+                "options": [
+                    {"optionKey": o[0], "optionName": o[1], "valueKey": o[2], "valueLabel": o[3], "priceDelta": o[4]}
+                    for o in line["options"]
+                ],
+            }
+            for line in priced["lines"]
+        ],
+    }
+
+
+def _price(items):
+    """
+    메뉴 캐시가 비어 있고 디스크 사본도 없는 채로 DB 까지 안 되면 가격을 계산할 수 없다
+    → journal 로도 받을 수 없으므로 500 대신 503 (메뉴를 다시 읽을 수 있을 때 재시도)
+    """
     try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    insert into orders (customer_id, status, customer_note, total_amount)
-                    values (%s, 'PLACED', %s, 0)
-                    returning id::text as id, order_no, status, created_at
-                """, (payload.customerId, payload.customerNote))
-                order = cur.fetchone()
-                order_id = order["id"]
-
-                total_amount = 0
-
-                for item in payload.items:
-                    mi = _fetch_menu_item(cur, item.menuItemId)
-                    unit_price = int(mi["price"])
-                    qty = int(item.qty)
-
-                    option_delta_sum = 0
-                    option_rows = []  # snapshot rows
-
-                    for so in item.selectedOptions:
-                        opt = _fetch_option_meta(cur, so.optionId)
-                        _assert_option_attached(cur, mi["id"], opt["id"])
-
-                        if opt["selection_type"] == "single" and len(so.valueKeys) != 1:
-                            raise HTTPException(400, f"option {opt['key']} is single-select")
-                        if opt["selection_type"] == "multi" and len(so.valueKeys) < 1:
-                            raise HTTPException(400, f"option {opt['key']} is multi-select")
-
-                        vals = _fetch_option_values(cur, opt["id"], so.valueKeys)
-                        for v in vals:
-                            pd = int(v["price_delta"])
-                            option_delta_sum += pd
-                            option_rows.append((opt["key"], opt["name"], v["value_key"], v["label"], pd))
-
-                    line_unit = unit_price + option_delta_sum
-                    line_amount = line_unit * qty
-                    total_amount += line_amount
-
-                    cur.execute("""
-                        insert into order_items (order_id, menu_item_id, name_snapshot, price_snapshot, qty, line_amount)
-                        values (%s, %s, %s, %s, %s, %s)
-                        returning id::text as id
-                    """, (order_id, mi["id"], mi["name"], unit_price, qty, line_amount))
-                    oi = cur.fetchone()
-                    order_item_id = oi["id"]
-
-                    if option_rows:
-                        execute_values(cur, """
-                            insert into order_item_options
-                              (order_item_id, option_key, option_name, value_key, value_label, price_delta)
-                            values %s
-                        """, [(order_item_id, *r) for r in option_rows])
-
-                cur.execute("""
-                    update orders set total_amount=%s where id=%s
-                    returning id::text as id, order_no, status, total_amount, created_at
-                """, (total_amount, order_id))
-                out = cur.fetchone()
-
-                cur.execute("""
-                    insert into order_status_logs(order_id, from_status, to_status, changed_by)
-                    values (%s, null, 'PLACED', %s)
-                """, (order_id, payload.customerId))
+        return pricing.price_cart(items)
+    except DB_UNAVAILABLE:
+        raise HTTPException(
+            503,
+            "menu unavailable, retry later",
+            headers={"Retry-After": str(max(1, round(menu_cache.MENU_CACHE_RETRY_SEC)))},
+        )
 
-                # ✅ (추가) 사장님(owner/admin)에게 "새 주문" 푸시 발송
-                title = "임진매운갈비"
-                body = f"새 주문이 들어왔습니다! (주문번호 {out['order_no']})"
-                data_payload = {"type": "new_order", "orderId": order_id, "nextStatus": "PLACED"}
-
-                # 1) 사장님/관리자 유저 조회
-                cur.execute("""
-                    select id::text as id
-                    from users
-                    where role in ('owner', 'admin')
-                """)
-                owners = [r["id"] for r in (cur.fetchall() or [])]
 
-                push_summary = {"owners": len(owners), "targets": 0, "sent": 0, "failed": 0}
+@router.post("", dependencies=[Depends(rate_limit("orders", "customerId")), Depends(admit_write)])
+def create_order(payload: CreateOrderIn):
+    if not payload.items:
+        raise HTTPException(400, "items is required")
 
-                # 2) owner별로 알림로그 기록 + 토큰 조회 + 즉시 발송
-                for owner_id in owners:
-                    # 2-1) notification_logs queued 기록
-                    cur.execute("""
-                        insert into notification_logs(order_id, user_id, channel, title, body, payload, send_status)
-                        values (%s, %s, 'fcm', %s, %s, %s::jsonb, 'queued')
-                        returning id::text as id
-                    """, (order_id, owner_id, title, body, json.dumps(data_payload)))
-                    noti_id = cur.fetchone()["id"]
+    # 검증 + 가격 계산은 트랜잭션 전에 메모리 가격표로 (실패하면 DB를 아예 안 탄다)
+    # 가격표가 옛 버전이면 저장 트랜잭션 안에서 다시 계산된다 (cart=payload.items)
+    priced = _price(payload.items)
+    # id 를 미리 만들어 두면 journal replay 가 같은 주문을 두 번 넣지 않는다 (app.intake)
+    order_id = str(uuid.uuid4())
 
-                    # 2-2) 사장님 토큰 조회
-                    cur.execute("""
-                        select fcm_token
-                        from devices
-                        where user_id=%s and is_active=true and fcm_token is not null and fcm_token <> ''
-                        order by last_seen_at desc nulls last
-                        limit 20
-                    """, (owner_id,))
-                    tokens = [r["fcm_token"] for r in (cur.fetchall() or []) if r.get("fcm_token")]
-
-                    if not tokens:
-                        push_summary["failed"] += 1
-                        cur.execute("""
-                            update notification_logs
-                            set send_status='failed',
-                                error_message=%s,
-                                sent_at=now()
-                            where id=%s
-                        """, ("no active device tokens", noti_id))
-                        continue
-
-                    push_summary["targets"] += len(tokens)
-
-                    # 2-3) 즉시 FCM 발송 + 로그 업데이트
-                    try:
-                        success_count, results = send_push_to_tokens(
-                            tokens=tokens,
-                            title=title,
-                            body=body,
-                            data={k: str(v) for k, v in data_payload.items()},
-                        )
-
-                        if success_count > 0:
-                            push_summary["sent"] += 1
-                            cur.execute("""
-                                update notification_logs
-                                set send_status='sent',
-                                    sent_at=now(),
-                                    error_message=null
-                                where id=%s
-                            """, (noti_id,))
-                        else:
-                            push_summary["failed"] += 1
-                            cur.execute("""
-                                update notification_logs
-                                set send_status='failed',
-                                    sent_at=now(),
-                                    error_message=%s
-                                where id=%s
-                            """, (json.dumps({"tokens": len(tokens), "results": results})[:4000], noti_id))
-
-                    except Exception as e:
-                        push_summary["failed"] += 1
-                        cur.execute("""
-                            update notification_logs
-                            set send_status='failed',
-                                sent_at=now(),
-                                error_message=%s
-                            where id=%s
-                        """, (str(e)[:4000], noti_id))
-
-                # 응답에 push 요약 포함(프론트 디버깅용)
-                return {**out, "push": push_summary}
-    finally:
-        conn.close()
+    if intake.INTAKE_MODE == "journal":
+        return intake.accept(order_id, payload.customerId, payload.customerNote, priced)
+    try:
+        out, owners = intake.save_order(
+            order_id, payload.customerId, payload.customerNote, priced,
+            timeout_ms=intake.INTAKE_DB_TIMEOUT_MS if intake.INTAKE_MODE == "fallback" else None,
+            cart=payload.items,
+        )
+    except intake.DB_UNAVAILABLE:
+        if intake.INTAKE_MODE != "fallback":
+            raise
+        # DB 가 멈춘 동안에는 로컬 journal 에 받아 두고 접수증만 (replayer 가 나중에 저장)
+        return intake.accept(order_id, payload.customerId, payload.customerNote, priced)
+
+    # 응답에 push 요약 포함(프론트 디버깅용)
+    push_summary = {"owners": owners, "coalesceWindowSec": notify.COALESCE_WINDOW_SEC}
+    return {**out, "push": push_summary}
 
 
 @router.get("/{order_id}")
 def get_order(order_id: str):
-    conn = get_conn()
+    # DB 장애 중 journal 로 접수된 주문 (replay 전에는 DB에 없다). 같은 호스트 워커가 받은 것까지만 보인다
+    receipt = intake.pending(order_id)
+    if receipt:
+        return {"order": receipt, "items": [], "itemOptions": []}
+    conn = get_conn(readonly=True, keys=(f"order:{order_id}",))
     try:
         with conn:
             with conn.cursor() as cur:
@@ -273,31 +149,45 @@ def get_order(order_id: str):
 
 @router.get("")
 def list_orders(customerId: Optional[str] = None, limit: int = 30):
-    conn = get_conn()
+    if customerId:
+        # 손님 주문내역은 캐시 (주문 생성/상태 변경 시 app.subscribers 가 갱신)
+        return {"orders": order_history.get(customerId, limit, lambda n: _load_customer_orders(customerId, n))}
+
+    conn = get_conn(readonly=True)
     try:
         with conn:
             with conn.cursor() as cur:
-                if customerId:
-                    cur.execute("""
-                        select id::text, order_no, status, total_amount, created_at
-                        from orders
-                        where customer_id=%s
-                        order by created_at desc
-                        limit %s
-                    """, (customerId, limit))
-                else:
-                    cur.execute("""
-                        select id::text, order_no, status, total_amount, created_at
-                        from orders
-                        order by created_at desc
-                        limit %s
-                    """, (limit,))
+                cur.execute("""
+                    select id::text, order_no, status, total_amount, created_at
+                    from orders
+                    order by created_at desc
+                    limit %s
+                """, (limit,))
                 return {"orders": cur.fetchall() or []}
     finally:
         conn.close()
 
 
-@router.post("/{order_id}/cancel")
+def _load_customer_orders(customer_id: str, limit: int):
+    # 캐시 채우기는 primary 에서: replica 가 밀린 사이 다른 워커의 새 주문 알림(peer_changed)이 먼저 오면
+    # 그 주문이 빠진 목록이 "채우는 도중 변경 없음"으로 보여 TTL 동안 캐시에 남는다 (app.order_history)
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    select id::text, order_no, status, total_amount, created_at
+                    from orders
+                    where customer_id=%s
+                    order by created_at desc
+                    limit %s
+                """, (customer_id, limit))
+                return cur.fetchall() or []
+    finally:
+        conn.close()
+
+
+@router.post("/{order_id}/cancel", dependencies=[Depends(admit_write)])
 def cancel_order(order_id: str, customerId: Optional[str] = None):
     """
     손님 취소: PLACED까지만 허용 (정책은 바꿀 수 있음)
@@ -306,7 +196,8 @@ def cancel_order(order_id: str, customerId: Optional[str] = None):
     try:
         with conn:
             with conn.cursor() as cur:
-                cur.execute("""select status, customer_id::text as customer_id from orders where id=%s""", (order_id,))
+                # for update: 동시에 들어온 접수/취소가 둘 다 상태 검사를 통과하지 않게 (통계 증감이 두 번 되지 않게)
+                cur.execute("""select status, customer_id::text as customer_id from orders where id=%s for update""", (order_id,))
                 row = cur.fetchone()
                 if not row:
                     raise HTTPException(404, "order not found")
@@ -327,7 +218,18 @@ def cancel_order(order_id: str, customerId: Optional[str] = None):
                     insert into order_status_logs(order_id, from_status, to_status, changed_by)
                     values (%s, 'PLACED', 'CANCELED', %s)
                 """, (order_id, customerId))
-
-                return out
+                stats.record_transition(cur, order_id, "PLACED", "CANCELED")
+
+                # 사장님들에게 취소 알림 (커밋 후 발송)
+                order_no = out["order_no"]
+                noti = notify.queue_logs(
+                    cur, order_id, notify.owner_ids(cur), tenants.current().name,
+                    f"주문이 취소되었습니다. (주문번호 {order_no})",
+                    {"type": "order_status", "orderId": order_id, "nextStatus": "CANCELED"},
+                    notify.PRIORITY_OWNER,
+                )
+
+        events.publish(events.OrderCanceled(order_id, row["customer_id"], "PLACED", noti))
+        return out
     finally:
         conn.close()
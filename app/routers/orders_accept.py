@@ -1,11 +1,12 @@
 from __future__ import annotations
 
 from typing import Optional
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 
 from app.db import get_conn
-from app.fcm import send_fcm_to_tokens
+from app import events, notify, stats, tenants
+from app.deps import admit_write
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
@@ -23,24 +24,22 @@ class AcceptOrderOut(BaseModel):
     notified: dict
 
 
-@router.post("/{order_id}/accept", response_model=AcceptOrderOut)
+@router.post("/{order_id}/accept", response_model=AcceptOrderOut, dependencies=[Depends(admit_write)])
 def accept_order(order_id: str, payload: AcceptOrderIn):
     """
     사장님 접수:
     - orders.status=ACCEPTED, accepted_at=now()
     - order_status_logs 추가
-    - 손님 devices의 fcm_token으로 "조리가 시작되었습니다" 발송
-    - notification_logs 기록
+    - notification_logs 기록 → 커밋 후 손님 기기로 "조리가 시작되었습니다" 발송(app.subscribers)
     """
     # 1) DB에서 주문/손님 토큰 확보 + 상태 업데이트는 트랜잭션으로
     conn = get_conn()
     customer_id = None
     order_no = None
     accepted_at = None
-    tokens: list[str] = []
 
     # 로그에 쓸 푸시 컨텐츠(기본)
-    title = "임진매운갈비"
+    title = tenants.current().name
     body = payload.message or "조리가 시작되었습니다! 잠시만 기다려 주세요 😊"
 
     # data payload (앱에서 딥링크/상세열기용)
@@ -54,11 +53,13 @@ def accept_order(order_id: str, payload: AcceptOrderIn):
         with conn:
             with conn.cursor() as cur:
                 # 주문 존재 + 현재 상태 확인 (중복 접수 방지)
+                # for update: 동시에 온 접수/취소가 같은 이전 상태를 보고 둘 다 통과하지 않게 행을 잠근다
                 cur.execute(
                     """
                     select id::text as id, order_no, status, customer_id::text as customer_id
                     from orders
                     where id = %s
+                    for update
                     """,
                     (order_id,),
                 )
@@ -110,83 +111,15 @@ def accept_order(order_id: str, payload: AcceptOrderIn):
                     """,
                     (order_id, prev_status, payload.ownerId),
                 )
+                stats.record_transition(cur, order_id, prev_status, "ACCEPTED")
 
-                # 손님 토큰 조회 (활성 device만)
-                if customer_id:
-                    cur.execute(
-                        """
-                        select fcm_token
-                        from devices
-                        where user_id = %s and is_active = true
-                        """,
-                        (customer_id,),
-                    )
-                    tokens = [r["fcm_token"] for r in (cur.fetchall() or []) if r.get("fcm_token")]
+                # notification_logs에 queued로 기록 → 커밋 후 이벤트 구독자가 발송
+                # (네트워크 호출은 주문 트랜잭션/요청 경로 밖에서, 일시적 오류면 스케줄러가 재시도)
+                notif = notify.queue_logs(cur, order_id, [customer_id] if customer_id else [],
+                                          title, body, data_payload, notify.PRIORITY_STATUS)
 
-                # notification_logs에 우선 queued로 기록(발송 성공/실패는 아래에서 업데이트)
-                cur.execute(
-                    """
-                    insert into notification_logs
-                      (order_id, user_id, channel, title, body, payload, send_status)
-                    values
-                      (%s, %s, 'fcm', %s, %s, %s::jsonb, 'queued')
-                    returning id::text as id
-                    """,
-                    (order_id, customer_id, title, body, __import__("json").dumps(data_payload)),
-                )
-                notif = cur.fetchone()
-                notif_id = notif["id"]
-
-        # 2) 트랜잭션 커밋 이후 FCM 발송 (네트워크 호출은 DB 트랜잭션 밖에서)
-        notified = {"tokens": len(tokens), "success": 0, "failure": 0}
-
-        if tokens:
-            resp = send_fcm_to_tokens(tokens=tokens, title=title, body=body, data=data_payload)
-            notified.update({"success": resp["success"], "failure": resp["failure"]})
-
-            # 3) notification_logs 결과 업데이트
-            conn2 = get_conn()
-            try:
-                with conn2:
-                    with conn2.cursor() as cur2:
-                        if resp["failure"] == 0:
-                            cur2.execute(
-                                """
-                                update notification_logs
-                                set send_status='sent', sent_at=now(), error_message=null
-                                where id=%s
-                                """,
-                                (notif_id,),
-                            )
-                        else:
-                            # 실패 사유 일부만 저장(너무 길어질 수 있음)
-                            err = str(resp["responses"][:3])
-                            cur2.execute(
-                                """
-                                update notification_logs
-                                set send_status='failed', error_message=%s
-                                where id=%s
-                                """,
-                                (err, notif_id),
-                            )
-            finally:
-                conn2.close()
-        else:
-            # 토큰 없으면 실패로 볼지/스킵으로 볼지 정책 선택 가능 (여기선 failed로 기록)
-            conn2 = get_conn()
-            try:
-                with conn2:
-                    with conn2.cursor() as cur2:
-                        cur2.execute(
-                            """
-                            update notification_logs
-                            set send_status='failed', error_message=%s
-                            where order_id=%s and user_id=%s and channel='fcm' and send_status='queued'
-                            """,
-                            ("no active fcm tokens", order_id, customer_id),
-                        )
-            finally:
-                conn2.close()
+        events.publish(events.OrderAccepted(order_id, customer_id, prev_status, notif))
+        notified = {"status": "queued" if notif else "skipped"}
 
         return {
             "orderId": order_id,
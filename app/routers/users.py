@@ -1,9 +1,10 @@
 # app/routers/users.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from uuid import UUID
 
 from app.db import get_conn
+from app.deps import admit_write, rate_limit
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -11,7 +12,7 @@ class UpsertGuestIn(BaseModel):
     id: str  # uuid string (customerId)
     name: str | None = None
 
-@router.post("/guest")
+@router.post("/guest", dependencies=[Depends(rate_limit("guest", "id")), Depends(admit_write)])
 def upsert_guest(payload: UpsertGuestIn):
     try:
         user_id = str(UUID(payload.id))
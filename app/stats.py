@@ -0,0 +1,252 @@
+# app/stats.py
+"""
+매출/주문 통계 롤업 테이블 (주문 생성일 기준, STATS_TZ)
+
+- stats_daily          : 일자별 주문 수 / 총액 / 완료 매출 / 취소 금액
+- stats_daily_status   : 일자별 현재 상태별 주문 수 / 금액
+- stats_item_daily     : 일자별 메뉴 판매 수량 / 금액 (취소 제외)
+- stats_item_total     : 전체 기간 메뉴 판매 수량 / 금액 (취소 제외)
+
+create_order / 상태 변경과 같은 트랜잭션에서 record_* 가 증분을 stats_ledger 에 insert 만 한다.
+롤업 행을 그 자리에서 upsert 하면 같은 날 주문이 전부 stats_daily 한 행(과 stats_item_total 인기 메뉴 행)
+잠금을 두고 줄을 서므로, 롤업에 더하는 일은 fold() 가 STATS_FOLD_SEC 마다 한 트랜잭션으로 모아서 한다.
+조회(app.routers.admin_stats)는 롤업 + 아직 fold 안 된 원장을 합쳐 읽으므로 fold 주기와 무관하게 정확하다.
+
+  python -m app.stats fold      # 원장을 지금 롤업에 반영
+  python -m app.stats rebuild   # orders/order_items 로부터 전부 다시 계산
+  (테이블은 python -m app.migrate: 0004, 0011)
+"""
+import argparse
+import logging
+import os
+import threading
+
+from app import tenants
+from app.db import get_conn
+
+log = logging.getLogger("stats")
+
+STATS_TZ = os.getenv("STATS_TZ", "Asia/Seoul")
+STATS_FOLD_SEC = float(os.getenv("STATS_FOLD_SEC", "5"))
+STATS_FOLD_BATCH = int(os.getenv("STATS_FOLD_BATCH", "5000"))
+
+
+def _add_day(cur, order_id: str, orders: int = 0, gross: int = 0, completed: int = 0, canceled: int = 0) -> None:
+    """stats_daily 증분 (금액 인자는 total_amount 에 곱할 부호)"""
+    cur.execute("""
+        insert into stats_ledger (kind, day, orders_count, gross_amount, completed_amount, canceled_amount)
+        select 'day', (created_at at time zone %s)::date, %s,
+               %s * total_amount, %s * total_amount, %s * total_amount
+        from orders where id=%s
+    """, (STATS_TZ, orders, gross, completed, canceled, order_id))
+
+
+def _add_status(cur, order_id: str, status: str, sign: int) -> None:
+    cur.execute("""
+        insert into stats_ledger (kind, day, status, orders_count, amount)
+        select 'status', (created_at at time zone %s)::date, %s, %s, %s * total_amount
+        from orders where id=%s
+    """, (STATS_TZ, status, sign, sign, order_id))
+
+
+def _add_items(cur, order_id: str, sign: int) -> None:
+    cur.execute("""
+        insert into stats_ledger (kind, day, menu_item_id, name, qty, amount)
+        select 'item', (o.created_at at time zone %s)::date, oi.menu_item_id, max(oi.name_snapshot),
+               %s * sum(oi.qty), %s * sum(oi.line_amount)
+        from orders o
+        join order_items oi on oi.order_id = o.id
+        where o.id=%s
+        group by 2, 3
+    """, (STATS_TZ, sign, sign, order_id))
+
+
+def record_placed(cur, order_id: str) -> None:
+    """주문 저장 트랜잭션 안에서(주문/라인 insert + total 확정 후) 호출 (app.intake.insert_order)"""
+    _add_day(cur, order_id, orders=1, gross=1)
+    _add_status(cur, order_id, "PLACED", 1)
+    _add_items(cur, order_id, 1)
+
+
+def record_transition(cur, order_id: str, from_status: str, to_status: str) -> None:
+    """상태 변경 트랜잭션 안에서 호출 (주문 행을 for update 로 잠근 뒤)"""
+    if from_status == to_status:
+        return
+    _add_status(cur, order_id, from_status, -1)
+    _add_status(cur, order_id, to_status, 1)
+
+    if to_status == "COMPLETED":
+        _add_day(cur, order_id, completed=1)
+    elif to_status == "CANCELED":
+        _add_items(cur, order_id, -1)
+        _add_day(cur, order_id, canceled=1)
+
+
+# 원장 앞부분(id 순 limit 건)을 지우면서 같은 문장 안에서 롤업에 더한다.
+# 롤업 행마다 group by 로 한 번씩만 갱신되므로 한 문장에 넣어도 된다(CTE 의 insert 는 참조 안 해도 실행).
+_FOLD_SQL = """
+    with moved as (
+      delete from stats_ledger
+      where id in (select id from stats_ledger order by id limit %s)
+      returning *
+    ),
+    days as (
+      insert into stats_daily (day, orders_count, gross_amount, completed_amount, canceled_amount)
+      select day, sum(orders_count), sum(gross_amount), sum(completed_amount), sum(canceled_amount)
+      from moved where kind = 'day'
+      group by day
+      on conflict (day) do update
+        set orders_count = stats_daily.orders_count + excluded.orders_count,
+            gross_amount = stats_daily.gross_amount + excluded.gross_amount,
+            completed_amount = stats_daily.completed_amount + excluded.completed_amount,
+            canceled_amount = stats_daily.canceled_amount + excluded.canceled_amount,
+            updated_at = now()
+    ),
+    statuses as (
+      insert into stats_daily_status (day, status, orders_count, amount)
+      select day, status, sum(orders_count), sum(amount)
+      from moved where kind = 'status'
+      group by day, status
+      on conflict (day, status) do update
+        set orders_count = stats_daily_status.orders_count + excluded.orders_count,
+            amount = stats_daily_status.amount + excluded.amount
+    ),
+    items as (
+      insert into stats_item_daily (day, menu_item_id, name, qty, amount)
+      select day, menu_item_id, max(name), sum(qty), sum(amount)
+      from moved where kind = 'item'
+      group by day, menu_item_id
+      on conflict (day, menu_item_id) do update
+        set qty = stats_item_daily.qty + excluded.qty,
+            amount = stats_item_daily.amount + excluded.amount,
+            name = excluded.name
+    ),
+    totals as (
+      insert into stats_item_total (menu_item_id, name, qty, amount)
+      select menu_item_id, max(name), sum(qty), sum(amount)
+      from moved where kind = 'item'
+      group by menu_item_id
+      on conflict (menu_item_id) do update
+        set qty = stats_item_total.qty + excluded.qty,
+            amount = stats_item_total.amount + excluded.amount,
+            name = excluded.name
+    )
+    select count(*) as n from moved
+"""
+
+
+def fold(limit: int = STATS_FOLD_BATCH) -> int:
+    """
+    원장 limit 건을 롤업에 반영하고 옮긴 건수를 돌려준다 (현재 매장).
+    다른 워커가 fold 중이면 0 (롤업 행을 서로 다른 순서로 잠그다 교착되지 않게 한 곳만).
+    """
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("select pg_try_advisory_xact_lock(hashtext('stats_fold:' || current_schema())) as ok")
+                if not cur.fetchone()["ok"]:
+                    return 0
+                cur.execute(_FOLD_SQL, (limit,))
+                return cur.fetchone()["n"]
+    finally:
+        conn.close()
+
+
+def rebuild(cur) -> None:
+    # 아직 fold 안 된 원장도 orders 에 이미 반영돼 있으므로 같이 비운다
+    cur.execute("truncate stats_daily, stats_daily_status, stats_item_daily, stats_item_total, stats_ledger")
+    cur.execute("""
+        insert into stats_daily (day, orders_count, gross_amount, completed_amount, canceled_amount)
+        select (created_at at time zone %s)::date,
+               count(*),
+               coalesce(sum(total_amount), 0),
+               coalesce(sum(total_amount) filter (where status='COMPLETED'), 0),
+               coalesce(sum(total_amount) filter (where status='CANCELED'), 0)
+        from orders
+        group by 1
+    """, (STATS_TZ,))
+    cur.execute("""
+        insert into stats_daily_status (day, status, orders_count, amount)
+        select (created_at at time zone %s)::date, status, count(*), coalesce(sum(total_amount), 0)
+        from orders
+        group by 1, 2
+    """, (STATS_TZ,))
+    cur.execute("""
+        insert into stats_item_daily (day, menu_item_id, name, qty, amount)
+        select (o.created_at at time zone %s)::date, oi.menu_item_id, max(oi.name_snapshot),
+               sum(oi.qty), sum(oi.line_amount)
+        from orders o
+        join order_items oi on oi.order_id = o.id
+        where o.status <> 'CANCELED'
+        group by 1, 2
+    """, (STATS_TZ,))
+    cur.execute("""
+        insert into stats_item_total (menu_item_id, name, qty, amount)
+        select menu_item_id, max(name), sum(qty), sum(amount)
+        from stats_item_daily
+        group by menu_item_id
+    """)
+
+
+# ---- fold 스케줄러 ----
+_stop = threading.Event()
+_folder: threading.Thread | None = None
+
+
+def _fold_loop() -> None:
+    while not _stop.wait(STATS_FOLD_SEC):
+        for tenant in tenants.all_tenants():
+            try:
+                with tenants.use(tenant):
+                    while not _stop.is_set() and fold() >= STATS_FOLD_BATCH:
+                        pass
+            except Exception:
+                log.exception("stats fold failed (tenant=%s)", tenant.id)
+
+
+def start_folder() -> None:
+    global _folder
+    if _folder is not None or STATS_FOLD_SEC <= 0:
+        return
+    _stop.clear()
+    _folder = threading.Thread(target=_fold_loop, name="stats-folder", daemon=True)
+    _folder.start()
+
+
+def stop_folder() -> None:
+    global _folder
+    _stop.set()
+    if _folder is not None:
+        _folder.join(timeout=STATS_FOLD_SEC + 5)
+        _folder = None
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.stats")
+    parser.add_argument("cmd", choices=["fold", "rebuild"])
+    args = parser.parse_args()
+
+    for tenant in tenants.all_tenants():
+        with tenants.use(tenant):
+            if args.cmd == "fold":
+                n = folded = fold()
+                while folded > 0:
+                    folded = fold()
+                    n += folded
+                print({"ok": True, "cmd": args.cmd, "tenant": tenant.id, "folded": n})
+                continue
+            conn = get_conn()
+            try:
+                with conn:
+                    with conn.cursor() as cur:
+                        # 재계산 중 record_* 가 끼어들지 않게
+                        cur.execute("lock table orders in share mode")
+                        rebuild(cur)
+                print({"ok": True, "cmd": args.cmd, "tenant": tenant.id})
+            finally:
+                conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# app/subscribers.py
+"""
+주문 이벤트 구독자 (import 하면 등록됨: app.main)
+
+inline (요청 스레드, 커밋 직후)
+- read-your-writes 표시(db.mark_written)
+- 주방 집계(app.kitchen)
+- 손님 주문내역 캐시(app.order_history)
+
+비동기 (app.events 워커 풀)
+- 푸시: 트랜잭션 안에서 queued 로 기록된 notification_logs 를 발송.
+  사장님 새 주문은 묶어 보내기 타이머만 건다(app.notify).
+  이벤트 큐가 가득 차면 건너뛴다(outbox): 행이 queued 로 남아 있으므로 재시도 스케줄러가 보낸다.
+
+통계 롤업(app.stats)은 구독자가 아니라 주문/상태 변경 트랜잭션 안에서 갱신한다
+(비동기 구독자는 큐 초과/종료 시 유실될 수 있고, 증분이 멱등이 아니라 한 번 빠지면 계속 틀어진다).
+"""
+from app import events, kitchen, notify, order_history
+from app.db import mark_written
+from app.events import OrderAccepted, OrderCanceled, OrderCompleted, OrderEvent, OrderPlaced
+
+
+@events.subscribe(OrderEvent, inline=True)
+def mark_order_written(event: OrderEvent) -> None:
+    mark_written(f"order:{event.order_id}", f"customer:{event.customer_id}" if event.customer_id else None)
+
+
+@events.subscribe(OrderPlaced, inline=True)
+def kitchen_order_placed(event: OrderPlaced) -> None:
+    kitchen.order_placed(event.order_id, event.lines)
+
+
+@events.subscribe(OrderAccepted, OrderCompleted, OrderCanceled, inline=True)
+def kitchen_status_changed(event: OrderEvent) -> None:
+    kitchen.order_status_changed(event.order_id, event.to_status)
+
+
+@events.subscribe(OrderPlaced, inline=True)
+def history_order_placed(event: OrderPlaced) -> None:
+    order_history.order_placed(event.customer_id, event.summary)
+
+
+@events.subscribe(OrderAccepted, OrderCompleted, OrderCanceled, inline=True)
+def history_status_changed(event: OrderEvent) -> None:
+    order_history.status_changed(event.customer_id, event.order_id, event.to_status)
+
+
+@events.subscribe(OrderEvent, outbox=True)
+def send_push(event: OrderEvent) -> None:
+    if isinstance(event, OrderPlaced) and event.owners:
+        notify.schedule_coalesced_flush()
+    notify.deliver_logs(event.notifications)
@@ -0,0 +1,121 @@
+# app/tenants.py
+"""
+멀티 매장(tenant) 라우팅
+
+- 요청마다 X-Store-Id 헤더 → Host 매핑 순으로 매장을 찾고, contextvar 에 넣어둔다.
+- get_conn() 은 현재 매장의 schema(search_path) / 커넥션 풀을 쓰고,
+  메뉴 캐시, 주방 집계, 쓰기 동시성 제한, 푸시 제목(매장명)도 매장별로 나뉜다.
+- 백그라운드 작업(알림 재시도 등)은 all_tenants() 를 돌면서 use(t) 안에서 실행.
+
+설정: TENANTS_JSON (또는 TENANTS_FILE 경로)
+  [{"id": "imjin", "schema": "store", "name": "임진매운갈비", "hosts": ["imjin.example.com"],
+    "databaseUrl": null, "replicaUrl": null, "poolMax": 10}]
+설정이 없으면 기존과 같은 단일 매장(schema=store).
+"""
+import json
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+TENANT_HEADER = os.getenv("TENANT_HEADER", "x-store-id").lower()
+# true면 매장을 못 찾은 요청은 404 (기본: 기본 매장으로 처리)
+TENANT_STRICT = os.getenv("TENANT_STRICT", "false").lower() == "true"
+
+
+class Tenant:
+    def __init__(self, id: str, schema: str, name: str, hosts=None,
+                 databaseUrl: Optional[str] = None, replicaUrl: Optional[str] = None,
+                 poolMax: Optional[int] = None):
+        self.id = id
+        self.schema = schema
+        self.name = name
+        self.hosts = [h.lower() for h in (hosts or [])]
+        self.database_url = databaseUrl
+        self.replica_url = replicaUrl
+        self.pool_max = poolMax
+
+    def __repr__(self):
+        return f"Tenant({self.id!r}, schema={self.schema!r})"
+
+
+def _load() -> List[Tenant]:
+    raw = os.getenv("TENANTS_JSON", "").strip()
+    path = os.getenv("TENANTS_FILE", "").strip()
+    if path:
+        with open(path, encoding="utf-8") as f:
+            raw = f.read()
+    if not raw:
+        return [Tenant("default", "store", os.getenv("STORE_NAME", "임진매운갈비"))]
+    return [Tenant(**t) for t in json.loads(raw)]
+
+
+_tenants: List[Tenant] = _load()
+_by_id: Dict[str, Tenant] = {t.id: t for t in _tenants}
+_by_host: Dict[str, Tenant] = {h: t for t in _tenants for h in t.hosts}
+DEFAULT = _tenants[0]
+
+_current: ContextVar[Tenant] = ContextVar("tenant", default=DEFAULT)
+
+
+def all_tenants() -> List[Tenant]:
+    return list(_tenants)
+
+
+def get(tenant_id: str) -> Optional[Tenant]:
+    return _by_id.get(tenant_id)
+
+
+def current() -> Tenant:
+    return _current.get()
+
+
+@contextmanager
+def use(tenant: Tenant):
+    token = _current.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _current.reset(token)
+
+
+def resolve(header_value: Optional[str], host: Optional[str]) -> Optional[Tenant]:
+    if header_value:
+        return _by_id.get(header_value.strip())
+    if host:
+        t = _by_host.get(host.split(":")[0].lower())
+        if t:
+            return t
+    return None if TENANT_STRICT else DEFAULT
+
+
+class TenantMiddleware:
+    """순수 ASGI 미들웨어: 요청 헤더로 매장을 정하고 contextvar 에 넣는다(threadpool 까지 전파됨)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        header_value, host = None, None
+        for k, v in scope.get("headers") or []:
+            if k == b"host":
+                host = v.decode("latin-1")
+            elif k.decode("latin-1") == TENANT_HEADER:
+                header_value = v.decode("latin-1")
+
+        tenant = resolve(header_value, host)
+        if tenant is None:
+            body = json.dumps({"detail": "unknown store"}).encode()
+            await send({"type": "http.response.start", "status": 404,
+                        "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        token = _current.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
@@ -0,0 +1,88 @@
+# bench/startup.py
+"""
+cold start 측정
+  python -m bench.startup [--runs 5]
+
+1) 새 프로세스에서 `import app.main` 에 걸리는 시간 (중앙값)
+2) -X importtime 기준으로 가장 무거운 import 상위 10개
+3) lifespan warmup(DB 풀/메뉴 캐시/Firebase) 구간별 시간 (DATABASE_URL 있을 때)
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORT_SNIPPET = (
+    "import time; t=time.perf_counter(); import app.main; "
+    "print((time.perf_counter()-t)*1000); "
+    "import sys; print(int('firebase_admin' in sys.modules))"
+)
+
+
+def measure_import(runs: int):
+    times = []
+    firebase_loaded = False
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SNIPPET],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        times.append(float(out[0]))
+        firebase_loaded = firebase_loaded or out[1] == "1"
+    return times, firebase_loaded
+
+
+def top_imports(n: int = 10):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        rows.append((int(parts[1]), parts[2].strip()))
+    rows.sort(reverse=True)
+    return rows[:n]
+
+
+def measure_warmup():
+    sys.path.insert(0, ROOT)
+    import app.main as main
+
+    started = time.perf_counter()
+    asyncio.run(main.warmup())
+    total = (time.perf_counter() - started) * 1000
+    return total, dict(main._warm), dict(main._warm_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    times, firebase_loaded = measure_import(args.runs)
+    print(f"import app.main: median={statistics.median(times):.1f}ms "
+          f"min={min(times):.1f}ms max={max(times):.1f}ms (runs={args.runs})")
+    print(f"firebase_admin imported at startup: {firebase_loaded}")
+
+    print("top cumulative imports (us):")
+    for us, name in top_imports():
+        print(f"  {us:>10}  {name}")
+
+    if os.getenv("DATABASE_URL"):
+        total, state, per = measure_warmup()
+        print(f"warmup: total={total:.1f}ms components={state} per={per}")
+    else:
+        print("warmup: skipped (DATABASE_URL not set)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+-- 0001 baseline: 서비스가 쓰는 테이블 전체 (기존 DB에는 if not exists 로 그대로 채택)
+-- 스키마는 매장별 search_path(tenants.schema) 에 만들어진다.
+
+create table if not exists users (
+  id uuid primary key default gen_random_uuid(),
+  role text not null default 'customer',
+  name text,
+  created_at timestamptz not null default now(),
+  updated_at timestamptz not null default now()
+);
+
+create table if not exists devices (
+  id uuid primary key default gen_random_uuid(),
+  user_id uuid not null references users(id),
+  platform text not null,
+  fcm_token text not null unique,
+  is_active boolean not null default true,
+  last_seen_at timestamptz,
+  created_at timestamptz not null default now()
+);
+
+create table if not exists menu_categories (
+  id uuid primary key default gen_random_uuid(),
+  name text not null,
+  sort_order integer not null default 0,
+  is_active boolean not null default true
+);
+
+create table if not exists menu_items (
+  id uuid primary key default gen_random_uuid(),
+  category_id uuid references menu_categories(id),
+  name text not null,
+  description text,
+  price integer not null,
+  image_url text,
+  sort_order integer not null default 0,
+  is_active boolean not null default true
+);
+
+create table if not exists menu_item_options (
+  id uuid primary key default gen_random_uuid(),
+  key text not null unique,
+  name text not null,
+  selection_type text not null check (selection_type in ('single', 'multi')),
+  is_required boolean not null default false,
+  sort_order integer not null default 0
+);
+
+create table if not exists menu_option_values (
+  id uuid primary key default gen_random_uuid(),
+  option_id uuid not null references menu_item_options(id) on delete cascade,
+  value_key text not null,
+  label text not null,
+  price_delta integer not null default 0,
+  sort_order integer not null default 0,
+  is_active boolean not null default true,
+  unique (option_id, value_key)
+);
+
+create table if not exists menu_item_option_map (
+  menu_item_id uuid not null references menu_items(id) on delete cascade,
+  option_id uuid not null references menu_item_options(id) on delete cascade,
+  sort_order integer not null default 0,
+  primary key (menu_item_id, option_id)
+);
+
+create table if not exists orders (
+  id uuid primary key default gen_random_uuid(),
+  order_no bigserial not null unique,
+  customer_id uuid references users(id),
+  status text not null default 'PLACED'
+    check (status in ('PLACED', 'ACCEPTED', 'COMPLETED', 'CANCELED')),
+  customer_note text,
+  total_amount integer not null default 0,
+  created_at timestamptz not null default now(),
+  accepted_at timestamptz,
+  completed_at timestamptz,
+  canceled_at timestamptz
+);
+
+create table if not exists order_items (
+  id uuid primary key default gen_random_uuid(),
+  order_id uuid not null references orders(id) on delete cascade,
+  menu_item_id uuid not null references menu_items(id),
+  name_snapshot text not null,
+  price_snapshot integer not null,
+  qty integer not null check (qty > 0),
+  line_amount integer not null
+);
+
+create table if not exists order_item_options (
+  id uuid primary key default gen_random_uuid(),
+  order_item_id uuid not null references order_items(id) on delete cascade,
+  option_key text not null,
+  option_name text not null,
+  value_key text not null,
+  value_label text not null,
+  price_delta integer not null default 0
+);
+
+create table if not exists order_status_logs (
+  id bigserial primary key,
+  order_id uuid not null references orders(id),
+  from_status text,
+  to_status text not null,
+  changed_by text,
+  created_at timestamptz not null default now()
+);
+
+create table if not exists notification_logs (
+  id uuid primary key default gen_random_uuid(),
+  order_id uuid references orders(id),
+  user_id uuid references users(id),
+  channel text not null default 'fcm',
+  title text not null,
+  body text not null,
+  payload jsonb,
+  send_status text not null default 'queued',
+  error_message text,
+  created_at timestamptz not null default now(),
+  sent_at timestamptz
+);
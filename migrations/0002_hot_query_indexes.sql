@@ -0,0 +1,26 @@
+-- migrate:no-transaction
+-- 자주 도는 조회용 인덱스. 운영 DB에서 쓰기를 막지 않도록 concurrently 로 만든다.
+-- (notification_logs(send_status, channel, created_at) 는 0003 파티션 전환에서 부모 테이블에 만든다)
+
+-- notify.active_tokens: where user_id=? and is_active order by last_seen_at desc
+create index concurrently if not exists devices_user_id_is_active_last_seen_at_idx
+  on devices (user_id, is_active, last_seen_at);
+
+-- GET /orders?customerId= : where customer_id=? order by created_at desc
+create index concurrently if not exists orders_customer_id_created_at_idx
+  on orders (customer_id, created_at);
+
+-- GET /admin/orders?status= , 주방 seed: where status=? order by created_at desc
+create index concurrently if not exists orders_status_created_at_idx
+  on orders (status, created_at);
+
+-- GET /admin/orders (status 없이) : order by created_at desc
+create index concurrently if not exists orders_created_at_idx
+  on orders (created_at);
+
+-- 주문 상세 / 통계 / 주방 seed
+create index concurrently if not exists order_items_order_id_idx
+  on order_items (order_id);
+
+create index concurrently if not exists order_item_options_order_item_id_idx
+  on order_item_options (order_item_id);
@@ -0,0 +1,122 @@
+# notification_logs / order_status_logs → created_at 월별 파티션
+# 이 시점의 app.partitions 변환 코드를 그대로 옮겨 둔 것 (모듈이 바뀌어도 이 마이그레이션 결과는 그대로).
+# 이후 바뀐 것(DEFAULT 파티션 등)은 뒤 번호 마이그레이션에서.
+import os
+from datetime import date, datetime, timezone
+from typing import Dict, List
+
+from psycopg2 import sql
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "2"))
+
+LOG_TABLES: Dict[str, Dict[str, List]] = {
+    "notification_logs": {
+        "indexes": [
+            ("send_status", "channel", "created_at"),
+            ("order_id", "created_at"),
+            ("created_at",),
+        ],
+        "fks": [("order_id", "orders"), ("user_id", "users")],
+    },
+    "order_status_logs": {
+        "indexes": [
+            ("order_id", "created_at"),
+        ],
+        "fks": [("order_id", "orders")],
+    },
+}
+
+
+def _month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _add_months(d: date, n: int) -> date:
+    m = d.year * 12 + (d.month - 1) + n
+    return date(m // 12, m % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def is_partitioned(cur, table: str) -> bool:
+    cur.execute("select relkind from pg_class where oid = to_regclass(%s)", (table,))
+    row = cur.fetchone()
+    return bool(row) and row["relkind"] == "p"
+
+
+def ensure_partitions(cur, table: str, start: date, end: date) -> List[str]:
+    """[start, end) 구간의 월 파티션을 없으면 만든다"""
+    created = []
+    month = _month_start(start)
+    while month < end:
+        name = partition_name(table, month)
+        cur.execute("select to_regclass(%s) as r", (name,))
+        if cur.fetchone()["r"] is None:
+            cur.execute(sql.SQL("create table {} partition of {} for values from (%s) to (%s)").format(
+                sql.Identifier(name), sql.Identifier(table),
+            ), (month, _add_months(month, 1)))
+            created.append(name)
+        month = _add_months(month, 1)
+    return created
+
+
+def _convert_table(cur, table: str, spec: Dict) -> None:
+    legacy = f"{table}_legacy"
+    ident, legacy_ident = sql.Identifier(table), sql.Identifier(legacy)
+
+    cur.execute(sql.SQL("lock table {} in access exclusive mode").format(ident))
+    cur.execute(sql.SQL("alter table {} rename to {}").format(ident, legacy_ident))
+    # PK에는 파티션 키가 포함돼야 하므로 인덱스/PK는 복사하지 않고 새로 만든다
+    cur.execute(sql.SQL("""
+        create table {} (like {} including defaults including constraints including storage including comments)
+        partition by range (created_at)
+    """).format(ident, legacy_ident))
+
+    # serial 시퀀스 소유권을 새 테이블로 (legacy drop 시 같이 지워지지 않게)
+    cur.execute("""
+        select s.oid::regclass::text as seq, a.attname
+        from pg_depend d
+        join pg_class s on s.oid = d.objid and s.relkind = 'S'
+        join pg_attribute a on a.attrelid = d.refobjid and a.attnum = d.refobjsubid
+        where d.refobjid = to_regclass(%s) and d.deptype = 'a'
+    """, (legacy,))
+    for r in cur.fetchall() or []:
+        cur.execute(sql.SQL("alter sequence {} owned by {}.{}").format(
+            sql.SQL(r["seq"]), ident, sql.Identifier(r["attname"]),
+        ))
+
+    cur.execute(sql.SQL("select min(created_at) as lo from {}").format(legacy_ident))
+    lo = cur.fetchone()["lo"]
+    start = _month_start(lo.date()) if lo else _month_start(_today())
+    ensure_partitions(cur, table, start, _add_months(_month_start(_today()), PARTITION_MONTHS_AHEAD + 1))
+
+    cur.execute(sql.SQL("insert into {} select * from {}").format(ident, legacy_ident))
+    cur.execute(sql.SQL("drop table {}").format(legacy_ident))
+
+    cur.execute(sql.SQL("alter table {} add primary key (id, created_at)").format(ident))
+    for col, ref in spec["fks"]:
+        cur.execute(sql.SQL("alter table {} add foreign key ({}) references {}(id)").format(
+            ident, sql.Identifier(col), sql.Identifier(ref),
+        ))
+    for cols in spec["indexes"]:
+        cur.execute(sql.SQL("create index if not exists {} on {} ({})").format(
+            sql.Identifier(f"{table}_{'_'.join(cols)}_idx"), ident,
+            sql.SQL(", ").join(sql.Identifier(c) for c in cols),
+        ))
+
+
+def up(cur) -> List[str]:
+    """이미 파티션 테이블이면 건너뜀. 한 트랜잭션 안에서 호출할 것."""
+    converted = []
+    for table, spec in LOG_TABLES.items():
+        if is_partitioned(cur, table):
+            continue
+        _convert_table(cur, table, spec)
+        converted.append(table)
+    return converted
@@ -0,0 +1,82 @@
+# 매출/주문 통계 롤업 테이블. 기존 주문으로 한 번 채운다.
+# 이 시점의 app.stats DDL / rebuild 를 그대로 옮겨 둔 것 (모듈이 바뀌어도 이 마이그레이션 결과는 그대로)
+import os
+
+STATS_TZ = os.getenv("STATS_TZ", "Asia/Seoul")
+
+DDL = """
+create table if not exists stats_daily (
+  day date primary key,
+  orders_count integer not null default 0,
+  gross_amount bigint not null default 0,
+  completed_amount bigint not null default 0,
+  canceled_amount bigint not null default 0,
+  updated_at timestamptz not null default now()
+);
+
+create table if not exists stats_daily_status (
+  day date not null,
+  status text not null,
+  orders_count integer not null default 0,
+  amount bigint not null default 0,
+  primary key (day, status)
+);
+
+create table if not exists stats_item_daily (
+  day date not null,
+  menu_item_id uuid not null,
+  name text not null,
+  qty integer not null default 0,
+  amount bigint not null default 0,
+  primary key (day, menu_item_id)
+);
+
+create table if not exists stats_item_total (
+  menu_item_id uuid primary key,
+  name text not null,
+  qty bigint not null default 0,
+  amount bigint not null default 0
+);
+"""
+
+
+def _rebuild(cur) -> None:
+    cur.execute("truncate stats_daily, stats_daily_status, stats_item_daily, stats_item_total")
+    cur.execute("""
+        insert into stats_daily (day, orders_count, gross_amount, completed_amount, canceled_amount)
+        select (created_at at time zone %s)::date,
+               count(*),
+               coalesce(sum(total_amount), 0),
+               coalesce(sum(total_amount) filter (where status='COMPLETED'), 0),
+               coalesce(sum(total_amount) filter (where status='CANCELED'), 0)
+        from orders
+        group by 1
+    """, (STATS_TZ,))
+    cur.execute("""
+        insert into stats_daily_status (day, status, orders_count, amount)
+        select (created_at at time zone %s)::date, status, count(*), coalesce(sum(total_amount), 0)
+        from orders
+        group by 1, 2
+    """, (STATS_TZ,))
+    cur.execute("""
+        insert into stats_item_daily (day, menu_item_id, name, qty, amount)
+        select (o.created_at at time zone %s)::date, oi.menu_item_id, max(oi.name_snapshot),
+               sum(oi.qty), sum(oi.line_amount)
+        from orders o
+        join order_items oi on oi.order_id = o.id
+        where o.status <> 'CANCELED'
+        group by 1, 2
+    """, (STATS_TZ,))
+    cur.execute("""
+        insert into stats_item_total (menu_item_id, name, qty, amount)
+        select menu_item_id, max(name), sum(qty), sum(amount)
+        from stats_item_daily
+        group by menu_item_id
+    """)
+
+
+def up(cur):
+    cur.execute(DDL)
+    # 재계산 중 record_* 가 끼어들지 않게
+    cur.execute("lock table orders in share mode")
+    _rebuild(cur)
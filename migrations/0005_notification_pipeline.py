@@ -0,0 +1,41 @@
+# 알림 재시도/우선순위/묶어 보내기 컬럼과 인덱스
+# 이 시점의 app.notify DDL 을 그대로 옮겨 둔 것 (모듈이 바뀌어도 이 마이그레이션 결과는 그대로)
+
+DDL = """
+create table if not exists notification_deliveries (
+  id uuid primary key default gen_random_uuid(),
+  user_id uuid references users(id),
+  channel text not null default 'fcm',
+  coalesce_key text,
+  title text not null,
+  body text not null,
+  payload jsonb,
+  log_count integer not null default 1,
+  send_status text not null default 'queued',
+  error_message text,
+  created_at timestamptz not null default now(),
+  sent_at timestamptz
+);
+
+alter table notification_logs add column if not exists coalesce_key text;
+alter table notification_logs add column if not exists delivery_id uuid;
+alter table notification_logs add column if not exists attempts integer not null default 0;
+alter table notification_logs add column if not exists next_attempt_at timestamptz not null default now();
+alter table notification_logs add column if not exists priority smallint not null default 2;
+
+create index if not exists notification_logs_coalesce_queued_idx
+  on notification_logs (coalesce_key, next_attempt_at)
+  where send_status = 'queued' and coalesce_key is not null;
+
+create index if not exists notification_logs_due_idx
+  on notification_logs (next_attempt_at)
+  where send_status = 'queued' and coalesce_key is null;
+
+create index if not exists notification_logs_due_priority_idx
+  on notification_logs (priority, next_attempt_at)
+  where send_status = 'queued' and coalesce_key is null;
+"""
+
+
+def up(cur):
+    cur.execute(DDL)
@@ -0,0 +1,60 @@
+# 메뉴 증분 동기화: row_version / tombstone / 트리거
+# 이 시점의 app.menu_sync DDL 을 그대로 옮겨 둔 것 (모듈이 바뀌어도 이 마이그레이션 결과는 그대로)
+
+TABLES = ["menu_categories", "menu_items", "menu_item_options", "menu_option_values", "menu_item_option_map"]
+
+DDL = """
+create sequence if not exists menu_row_version_seq;
+
+create table if not exists menu_tombstones (
+  id bigserial primary key,
+  table_name text not null,
+  row_key jsonb not null,
+  row_version bigint not null default nextval('menu_row_version_seq'),
+  deleted_at timestamptz not null default now()
+);
+create index if not exists menu_tombstones_row_version_idx on menu_tombstones (row_version);
+
+create table if not exists menu_sync_state (
+  id boolean primary key default true check (id),
+  pruned_through bigint not null default 0
+);
+insert into menu_sync_state (id) values (true) on conflict (id) do nothing;
+
+create or replace function menu_bump_row_version() returns trigger as $$
+begin
+  perform pg_advisory_xact_lock(hashtext('menu_row_version'));
+  new.row_version := nextval('menu_row_version_seq');
+  return new;
+end $$ language plpgsql;
+
+create or replace function menu_record_tombstone() returns trigger as $$
+begin
+  perform pg_advisory_xact_lock(hashtext('menu_row_version'));
+  if tg_table_name = 'menu_item_option_map' then
+    insert into menu_tombstones (table_name, row_key)
+    values (tg_table_name, jsonb_build_object('menu_item_id', old.menu_item_id::text, 'option_id', old.option_id::text));
+  else
+    insert into menu_tombstones (table_name, row_key)
+    values (tg_table_name, jsonb_build_object('id', old.id::text));
+  end if;
+  return old;
+end $$ language plpgsql;
+"""
+
+TABLE_DDL = """
+alter table {t} add column if not exists row_version bigint not null default nextval('menu_row_version_seq');
+create index if not exists {t}_row_version_idx on {t} (row_version);
+drop trigger if exists {t}_row_version on {t};
+create trigger {t}_row_version before insert or update on {t}
+  for each row execute function menu_bump_row_version();
+drop trigger if exists {t}_tombstone on {t};
+create trigger {t}_tombstone after delete on {t}
+  for each row execute function menu_record_tombstone();
+"""
+
+
+def up(cur):
+    cur.execute(DDL)
+    for table in TABLES:
+        cur.execute(TABLE_DDL.format(t=table))
@@ -0,0 +1,6 @@
+-- 로그 테이블 DEFAULT 파티션 (app.partitions)
+-- 월 파티션 생성(maintain)이 늦어도 notification_logs / order_status_logs insert 가 실패해
+-- 주문 생성까지 실패하지 않도록. 쌓인 행은 다음 maintain 이 그 달 파티션으로 옮긴다.
+
+create table if not exists notification_logs_default partition of notification_logs default;
+create table if not exists order_status_logs_default partition of order_status_logs default;
@@ -0,0 +1,22 @@
+-- 주문 상태 변경을 모든 워커 프로세스에 알린다 (app.peer_events 가 LISTEN order_events)
+-- 생성/접수/완료/취소는 모두 같은 트랜잭션에서 order_status_logs 를 남기므로 여기에 걸면
+-- 커밋된 변경만, 커밋 순서대로 전달된다. 대량 적재(datagen 등)는 app.skip_order_events=on 으로 끈다.
+
+create or replace function order_events_notify() returns trigger as $$
+begin
+  if current_setting('app.skip_order_events', true) = 'on' then
+    return null;
+  end if;
+  perform pg_notify('order_events', json_build_object(
+    'schema', tg_table_schema,
+    'orderId', new.order_id,
+    'from', new.from_status,
+    'to', new.to_status,
+    'customerId', (select customer_id from orders where id = new.order_id)
+  )::text);
+  return null;
+end $$ language plpgsql;
+
+drop trigger if exists order_status_logs_notify on order_status_logs;
+create trigger order_status_logs_notify after insert on order_status_logs
+  for each row execute function order_events_notify();
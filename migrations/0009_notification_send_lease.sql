@@ -0,0 +1,10 @@
+-- 알림 발송 claim → send → settle (app.notify): 잡은 행은 send_status='sending' + 리스(next_attempt_at).
+-- reclaim_expired() 가 리스가 지난 sending 행/묶음만 찾도록 부분 인덱스.
+
+create index if not exists notification_logs_sending_idx
+  on notification_logs (next_attempt_at)
+  where send_status = 'sending';
+
+create index if not exists notification_deliveries_sending_idx
+  on notification_deliveries (created_at)
+  where send_status = 'sending';
@@ -0,0 +1,4 @@
+-- migrate:no-transaction
+-- notify.owner_ids: where role in ('owner', 'admin') — 주문마다 도는데 users 가 손님으로 커지면 seq scan
+create index concurrently if not exists users_role_idx
+  on users (role);
@@ -0,0 +1,22 @@
+-- 통계 증분을 롤업 행에 바로 더하지 않고 주문별 원장 행으로 쌓는다 (app.stats).
+-- 주문/상태 변경 트랜잭션은 insert 만 하므로 같은 날 주문끼리 stats_daily 한 행을 두고 줄 서지 않는다.
+-- fold() 가 주기적으로 원장을 롤업 테이블로 옮기고, 조회는 롤업 + 아직 안 옮긴 원장을 합친다.
+-- kind: 'day' → stats_daily, 'status' → stats_daily_status, 'item' → stats_item_daily / stats_item_total
+
+create table if not exists stats_ledger (
+  id bigserial primary key,
+  kind text not null check (kind in ('day', 'status', 'item')),
+  day date not null,
+  status text,
+  menu_item_id uuid,
+  name text,
+  orders_count integer not null default 0,
+  gross_amount bigint not null default 0,
+  completed_amount bigint not null default 0,
+  canceled_amount bigint not null default 0,
+  qty integer not null default 0,
+  amount bigint not null default 0
+);
+
+create index if not exists stats_ledger_day_idx
+  on stats_ledger (day);
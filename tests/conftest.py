@@ -0,0 +1,128 @@
+# tests/conftest.py
+"""
+pytest 공용 설정 / fixture
+
+  python -m pytest -q                                                    # DB 없이 도는 테스트만
+  TEST_DATABASE_URL=postgresql://localhost/store_test python -m pytest -q  # 전부
+
+- DB 가 필요한 테스트(`db` fixture)는 TEST_DATABASE_URL 이 없으면 skip.
+  테스트 전용 DB 여야 한다: 세션 시작 시 매장 schema 를 지우고 app.migrate 로 다시 만들고,
+  테스트마다 테이블을 비운다.
+- 환경변수는 app.* import 전에 정해야 하므로(모듈 상단에서 읽음) 여기서 먼저 넣는다.
+  백그라운드 스레드(재시도 스케줄러, journal replayer, stats fold)는 끄고 테스트가 직접 호출한다.
+"""
+import os
+import shutil
+import tempfile
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")
+_TMP = tempfile.mkdtemp(prefix="store-tests-")
+
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+os.environ["REPLICA_DATABASE_URL"] = ""
+os.environ.setdefault("TENANTS_JSON", "")
+os.environ["RETRY_POLL_SEC"] = "0"
+os.environ["INTAKE_REPLAY_SEC"] = "0"
+os.environ["STATS_FOLD_SEC"] = "0"
+os.environ["INTAKE_JOURNAL_DIR"] = os.path.join(_TMP, "intake")
+os.environ["MENU_SNAPSHOT_DIR"] = os.path.join(_TMP, "menu")
+os.environ["PROFILE_DIR"] = os.path.join(_TMP, "profiles")
+os.environ.setdefault("COALESCE_WINDOW_SEC", "10")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def _schema():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    pytest.importorskip("psycopg2")
+    from psycopg2 import sql
+
+    from app import migrate, tenants
+    from app.db import get_conn
+
+    tenant = tenants.all_tenants()[0]
+    with tenants.use(tenant):
+        conn = get_conn()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("drop schema if exists {} cascade").format(sql.Identifier(tenant.schema)))
+            conn.autocommit = False
+        finally:
+            conn.close()
+        migrate.up()
+    yield tenant
+
+    from app import db
+    db.close_pool()
+
+
+@pytest.fixture
+def db(_schema):
+    """빈 테이블 + 현재 매장 = 테스트 매장. 프로세스 메모리 캐시도 비운다"""
+    from app import intake, kitchen, menu_cache, order_history, pricing, tenants
+    from app.db import get_conn
+
+    with tenants.use(_schema):
+        conn = get_conn()
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        select c.relname
+                        from pg_class c
+                        join pg_namespace n on n.oid = c.relnamespace
+                        where n.nspname = %s and c.relkind in ('r', 'p') and not c.relispartition
+                          and c.relname not in ('schema_migrations', 'menu_sync_state')
+                    """, (_schema.schema,))
+                    tables = [r["relname"] for r in cur.fetchall()]
+                    cur.execute("truncate {} restart identity cascade".format(", ".join(tables)))
+        finally:
+            conn.close()
+        menu_cache.invalidate()
+        order_history._entries.clear()
+        order_history._touched.clear()
+        kitchen._boards.clear()
+        intake._pending.clear()
+        shutil.rmtree(intake.INTAKE_JOURNAL_DIR, ignore_errors=True)
+        shutil.rmtree(pricing.MENU_SNAPSHOT_DIR, ignore_errors=True)
+        pricing._saved_versions.clear()
+        yield _schema
+
+
+def q(sql_text, params=()):
+    """테스트용: 짧은 트랜잭션 하나로 실행하고 (있으면) 결과 행 반환"""
+    from app.db import get_conn
+
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(sql_text, params)
+                return cur.fetchall() if cur.description else []
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def menu(db):
+    """사장님 1명(기기 토큰 포함) + 손님 1명 + 메뉴 1개(10000원, 맵기 옵션 single +0/+500)"""
+    owner = q("insert into users (role, name) values ('owner', '사장님') returning id::text as id")[0]["id"]
+    customer = q("insert into users (role, name) values ('customer', '손님') returning id::text as id")[0]["id"]
+    q("insert into devices (user_id, platform, fcm_token) values (%s, 'android', 'owner-token')", (owner,))
+    category = q("insert into menu_categories (name) values ('갈비') returning id")[0]["id"]
+    item = q("""
+        insert into menu_items (category_id, name, price) values (%s, '매운갈비', 10000) returning id::text as id
+    """, (category,))[0]["id"]
+    option = q("""
+        insert into menu_item_options (key, name, selection_type) values ('spicy', '맵기', 'single')
+        returning id::text as id
+    """)[0]["id"]
+    q("insert into menu_item_option_map (menu_item_id, option_id) values (%s, %s)", (item, option))
+    q("""
+        insert into menu_option_values (option_id, value_key, label, price_delta)
+        values (%s, 'mild', '순한맛', 0), (%s, 'hot', '매운맛', 500)
+    """, (option, option))
+    return {"owner": owner, "customer": customer, "item": item, "option": option}
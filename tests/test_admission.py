@@ -0,0 +1,154 @@
+# tests/test_admission.py
+import asyncio
+import time
+
+import pytest
+
+from app import admission, tenants
+from app.admission import AdaptiveLimiter, AdmissionRejected, GlobalCap
+from app.db import get_conn
+from app.deps import admit_write
+
+
+def _limiter(shared=None, **kw):
+    return AdaptiveLimiter(**{"initial": 8, "min_limit": 2, "max_limit": 16, "queue_size": 4,
+                              "queue_timeout": 0.2, "shared": shared or GlobalCap(100), **kw})
+
+
+def _feed(lim, n, elapsed, db_wait):
+    for _ in range(n):
+        lim._take()
+        lim.release(elapsed, db_wait)
+
+
+# ---- limit 조정 ----
+def test_slow_non_db_work_does_not_shrink_limit():
+    lim = _limiter()
+    _feed(lim, 50, elapsed=0.01, db_wait=0.005)
+    _feed(lim, 200, elapsed=1.0, db_wait=0.005)  # FCM/직렬화 등 DB 밖 지연만 늘어남
+    assert int(lim.limit) == 16
+    assert lim.retry_after() >= 1 and lim.snapshot()["latencyMs"] > 500
+
+
+def test_growing_db_wait_shrinks_limit():
+    lim = _limiter()
+    _feed(lim, 50, elapsed=0.01, db_wait=0.005)
+    grown = lim.limit
+    _feed(lim, 200, elapsed=0.2, db_wait=0.1)
+    assert lim.limit < grown and lim.limit < 5  # gradient 하한 0.5 에서 limit*0.5 + sqrt(limit) = limit → 4
+    assert lim.snapshot()["dbWaitMs"] > 50 and lim.snapshot()["baselineMs"] == pytest.approx(5, abs=0.1)
+
+
+def test_requests_without_db_wait_are_not_samples():
+    lim = _limiter()
+    _feed(lim, 20, elapsed=0.01, db_wait=0.005)
+    _feed(lim, 20, elapsed=0.001, db_wait=0.0)  # journal 접수 등
+    assert lim.snapshot()["baselineMs"] == pytest.approx(5, abs=0.1)
+    assert lim._samples == 20
+
+
+# ---- 대기열 ----
+def test_full_queue_and_queue_timeout_reject():
+    async def main():
+        lim = _limiter(initial=1, min_limit=1, queue_size=1, queue_timeout=0.05)
+        await lim.acquire()
+        waiter = asyncio.ensure_future(lim.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await lim.acquire()  # 대기열 1칸이 찼다
+        with pytest.raises(AdmissionRejected):
+            await waiter  # 차례가 안 와서 timeout
+        assert lim.rejected == 2 and lim.inflight == 1 and not lim._waiters
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def main():
+        lim = _limiter(initial=1, min_limit=1)
+        await lim.acquire()
+        waiter = asyncio.ensure_future(lim.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()  # 기다리는 중 연결이 끊김
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert not lim._waiters
+        lim.release(0.01, 0.01)
+        assert lim.inflight == 0 and lim.shared.inflight == 0
+
+    asyncio.run(main())
+
+
+# ---- GlobalCap ----
+def test_global_cap_hands_free_slots_to_tenants_in_turn():
+    async def main():
+        cap = GlobalCap(2)
+        busy, quiet = _limiter(cap, queue_size=10), _limiter(cap, queue_size=10)
+        await busy.acquire()
+        await busy.acquire()
+        order = []
+
+        async def wait(lim, name):
+            await lim.acquire()
+            order.append(name)
+
+        tasks = [asyncio.ensure_future(wait(busy, f"busy{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(wait(quiet, "quiet")))
+        await asyncio.sleep(0)
+        assert cap.inflight == 2 and order == []
+
+        # busy 가 먼저 줄을 섰어도 빈 자리는 매장마다 돌아가며
+        busy.release(0.01, 0.01)
+        busy.release(0.01, 0.01)
+        await asyncio.sleep(0.01)
+        assert sorted(order) == ["busy0", "quiet"]
+        assert cap.inflight == 2 and busy.inflight == 1 and quiet.inflight == 1
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(main())
+
+
+def test_one_tenant_cannot_take_the_whole_global_cap():
+    async def main():
+        cap = GlobalCap(3)
+        a, b = _limiter(cap, initial=16), _limiter(cap, initial=16)
+        for _ in range(3):
+            await a.acquire()
+        with pytest.raises(AdmissionRejected):
+            await asyncio.wait_for(b.acquire(), 1)  # 전체 상한이 차서 b 도 줄을 서고 timeout
+        a.release(0.01, 0.01)
+        await b.acquire()
+        assert (a.inflight, b.inflight, cap.inflight) == (2, 1, 3)
+
+    asyncio.run(main())
+
+
+# ---- admit_write: threadpool 의 DB 대기가 limiter 로 ----
+def test_admit_write_feeds_db_wait_from_route_thread(db, monkeypatch):
+    lim = _limiter()
+    monkeypatch.setattr(admission, "_limiters", {tenants.current().id: lim})
+
+    def route():
+        conn = get_conn()
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute("select pg_sleep(0.05)")
+        finally:
+            conn.close()
+        time.sleep(0.2)  # DB 밖 지연
+
+    async def main():
+        dep = admit_write()
+        await dep.__anext__()
+        await asyncio.to_thread(route)  # run_in_threadpool 처럼 컨텍스트를 복사해 넘긴다
+        with pytest.raises(StopAsyncIteration):
+            await dep.__anext__()
+
+    asyncio.run(main())
+    snap = lim.snapshot()
+    assert 50 <= snap["dbWaitMs"] < 150 and snap["latencyMs"] >= 250
+    assert lim.inflight == 0
@@ -0,0 +1,23 @@
+# tests/test_datagen.py
+import pytest
+
+from app import datagen, tenants
+
+
+@pytest.mark.parametrize("url, local", [
+    ("postgresql://postgres@/store?host=/var/run/postgresql", True),
+    ("postgresql://app@localhost:5432/store", True),
+    ("host=127.0.0.1 dbname=store", True),
+    ("postgresql://app@db.internal:5432/store", False),
+    ("host=localhost,10.0.0.5 dbname=store", False),
+])
+def test_is_local(url, local):
+    assert datagen.is_local(url) is local
+
+
+def test_remote_target_needs_explicit_opt_in(monkeypatch):
+    tenant = tenants.Tenant("remote", "store", "매장", databaseUrl="postgresql://app@db.internal/store")
+    with pytest.raises(SystemExit):
+        datagen.check_target(tenant)
+    monkeypatch.setattr(datagen, "ALLOW_DATAGEN", True)
+    datagen.check_target(tenant)
@@ -0,0 +1,75 @@
+# tests/test_events.py
+import queue
+import threading
+
+import pytest
+
+from app import events, tenants
+from app.events import OrderAccepted, OrderEvent, OrderPlaced
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    """구독자 테이블을 비우고, 워커는 있는 것처럼(큐에 쌓이기만) 둔다"""
+    monkeypatch.setattr(events, "_inline", {})
+    monkeypatch.setattr(events, "_async", {})
+    monkeypatch.setattr(events, "_outbox", set())
+    monkeypatch.setattr(events, "_queue", queue.Queue(maxsize=1))
+    monkeypatch.setattr(events, "_workers", [threading.current_thread()])
+    monkeypatch.setattr(events, "_counts", dict.fromkeys(events._counts, 0))
+    return events
+
+
+def test_inline_runs_in_publisher_thread_and_async_is_queued(bus):
+    seen = []
+    bus.subscribe(OrderPlaced, inline=True)(lambda e: seen.append(("inline", threading.current_thread())))
+    bus.subscribe(OrderEvent)(lambda e: seen.append(("async", e)))
+
+    bus.publish(OrderPlaced("o1", None, []))
+    assert seen == [("inline", threading.current_thread())]
+    fn, event, tenant, _ = bus._queue.get_nowait()
+    assert event.order_id == "o1" and tenant.id == tenants.current().id
+
+
+def test_subscription_follows_event_type(bus):
+    seen = []
+    bus.subscribe(OrderAccepted, inline=True)(lambda e: seen.append(type(e).__name__))
+    bus.publish(OrderPlaced("o1", None, []), OrderAccepted("o1"))
+    assert seen == ["OrderAccepted"]
+
+
+def test_overflow_skips_outbox_subscriber(bus):
+    pushed = []
+    bus.subscribe(OrderEvent, outbox=True)(lambda e: pushed.append(e.order_id))
+    bus.publish(OrderAccepted("o1"))  # 큐 자리 1개
+    bus.publish(OrderAccepted("o2"))  # 가득 참 → 요청 스레드에서 보내지 않는다
+    assert pushed == []
+    assert bus._counts["outbox"] == 1 and bus._counts["overflow"] == 0
+
+
+def test_overflow_runs_other_subscribers_inline(bus):
+    ran = []
+    bus.subscribe(OrderEvent)(lambda e: ran.append(e.order_id))
+    bus.publish(OrderAccepted("o1"))
+    bus.publish(OrderAccepted("o2"))
+    assert ran == ["o2"] and bus._counts["overflow"] == 1
+
+
+def test_without_workers_async_runs_in_place(bus, monkeypatch):
+    monkeypatch.setattr(events, "_workers", [])
+    ran = []
+    bus.subscribe(OrderEvent, outbox=True)(lambda e: ran.append(e.order_id))
+    bus.publish(OrderAccepted("o1"))
+    assert ran == ["o1"]
+
+
+def test_failing_subscriber_does_not_stop_others(bus):
+    ran = []
+
+    def boom(e):
+        raise RuntimeError("boom")
+
+    bus.subscribe(OrderEvent, inline=True)(boom)
+    bus.subscribe(OrderEvent, inline=True)(lambda e: ran.append(e.order_id))
+    bus.publish(OrderAccepted("o1"))
+    assert ran == ["o1"]
@@ -0,0 +1,133 @@
+# tests/test_fcm.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import fcm
+from app.fcm import CircuitBreaker, CircuitOpenError, FcmSaturatedError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(fcm.time, "monotonic", c)
+    return c
+
+
+def _breaker(**kw):
+    return CircuitBreaker(**{"failures": 3, "open_sec": 30, "probes": 1, "close_after": 2, **kw})
+
+
+# ---- breaker 상태 ----
+def test_opens_after_consecutive_failures(clock):
+    b = _breaker()
+    for _ in range(2):
+        b.failure(b.before())
+    assert b.state == b.CLOSED
+    b.success(b.before())  # 성공이 끼면 연속 횟수는 다시 0
+    for _ in range(3):
+        b.failure(b.before())
+    assert b.state == b.OPEN
+    with pytest.raises(CircuitOpenError) as e:
+        b.before()
+    assert e.value.retry_after == pytest.approx(30)
+
+
+def test_half_open_limits_probes_and_closes_after_successes(clock):
+    b = _breaker()
+    for _ in range(3):
+        b.failure(b.before())
+    clock.now += 31
+    probe = b.before()
+    assert probe is True and b.state == b.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        b.before()  # probe 는 동시에 1개까지
+    b.success(probe)
+    assert b.state == b.HALF_OPEN
+    b.success(b.before())
+    assert b.state == b.CLOSED
+    assert b.before() is False
+
+
+def test_failed_probe_reopens(clock):
+    b = _breaker()
+    for _ in range(3):
+        b.failure(b.before())
+    clock.now += 31
+    b.failure(b.before())
+    assert b.state == b.OPEN
+    with pytest.raises(CircuitOpenError):
+        b.before()
+    assert b.counts["opened"] == 2
+
+
+def test_abandoned_probe_frees_its_slot(clock):
+    b = _breaker()
+    for _ in range(3):
+        b.failure(b.before())
+    clock.now += 31
+    b.abandon(b.before(), "saturated")
+    assert b.state == b.HALF_OPEN and b.before() is True
+    assert b.counts["saturated"] == 1
+
+
+# ---- _call: 타임아웃 / executor 포화 ----
+@pytest.fixture
+def small_executor(monkeypatch):
+    monkeypatch.setattr(fcm, "breaker", _breaker())
+    monkeypatch.setattr(fcm, "FCM_TIMEOUT_SEC", 0.05)  # future 대기 상한 = 1.05초
+    monkeypatch.setattr(fcm, "_executor", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(fcm, "_slots", threading.BoundedSemaphore(1))
+    release = threading.Event()
+    yield release
+    release.set()
+    fcm._executor.shutdown(wait=True)
+
+
+def test_hung_call_times_out_as_failure_and_saturates(small_executor):
+    release = small_executor
+    with pytest.raises(TimeoutError):
+        fcm._call(lambda m: release.wait(), "msg")
+    assert fcm.breaker.counts["failures"] == 1 and fcm.breaker.counts["timeouts"] == 1
+
+    # 멈춘 호출이 스레드를 잡고 있는 동안: 큐에 쌓지 않고 바로 거절, breaker 실패로 세지 않는다
+    called = []
+    with pytest.raises(FcmSaturatedError):
+        fcm._call(lambda m: called.append(m), "msg")
+    assert called == [] and fcm.breaker.counts["failures"] == 1
+    assert fcm.breaker.counts["saturated"] == 1
+
+    # 멈춘 호출이 끝나면 다시 받는다
+    release.set()
+    fcm._executor.submit(lambda: None).result()
+    assert fcm._call(lambda m: m, "ok") == "ok"
+
+
+def test_call_that_never_started_is_not_a_failure(small_executor, monkeypatch):
+    release = small_executor
+    # 다른 경로로 executor 스레드가 막혀 있으면(슬롯은 남아 있어도) 큐에서 시작을 못 한다
+    monkeypatch.setattr(fcm, "_slots", threading.BoundedSemaphore(2))
+    fcm._executor.submit(release.wait)
+    with pytest.raises(FcmSaturatedError):
+        fcm._call(lambda m: m, "msg")
+    assert fcm.breaker.counts["failures"] == 0 and fcm.breaker.counts["notStarted"] == 1
+    assert fcm.breaker.state == fcm.breaker.CLOSED
+    assert fcm._slots.acquire(blocking=False) and fcm._slots.acquire(blocking=False)
+
+
+def test_transient_errors_count_and_saturation_is_a_circuit_open_error(small_executor):
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            fcm._call(lambda m: (_ for _ in ()).throw(ConnectionError("reset")), "msg")
+    assert fcm.breaker.state == fcm.breaker.OPEN
+    # notify 는 CircuitOpenError 로 받아 attempts 를 올리지 않고 미룬다
+    assert issubclass(FcmSaturatedError, CircuitOpenError)
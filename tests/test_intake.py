@@ -0,0 +1,151 @@
+# tests/test_intake.py
+import fcntl
+import multiprocessing
+import os
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from app import intake, pricing
+from app.intake import Journal
+from app.routers.orders import CreateOrderIn, OrderItemIn, create_order, get_order
+
+from conftest import q
+
+
+def _entry(order_id=None, **priced):
+    return {"id": order_id or str(uuid.uuid4()), "customerId": None, "customerNote": None,
+            "priced": {"lines": [], "totalAmount": 0, "menuVersion": 0, **priced},
+            "receivedAt": "2026-01-01T00:00:00+00:00"}
+
+
+def _append_many(directory, n):
+    j = Journal("t", directory)
+    for i in range(n):
+        j.append(_entry(note="x" * 500, i=i))
+
+
+# ---- journal 파일 (DB 없음) ----
+def test_append_read_commit(tmp_path):
+    j = Journal("t", str(tmp_path))
+    a, b = _entry(), _entry()
+    j.append(a)
+    j.append(b)
+
+    rows = j.read(0, 10)
+    assert [e["id"] for _, e in rows] == [a["id"], b["id"]]
+    assert j.backlog_bytes() == os.path.getsize(j.path)
+
+    j.commit(rows[0][0])
+    assert [e["id"] for _, e in j.read(j.offset(), 10)] == [b["id"]]
+    assert j.find(a["id"]) is None and j.find(b["id"])["id"] == b["id"]
+
+    # 다 따라잡으면 비운다
+    j.commit(rows[1][0])
+    assert os.path.getsize(j.path) == 0 and j.offset() == 0 and j.backlog_bytes() == 0
+
+
+def test_torn_tail_is_not_read_and_not_appended_to(tmp_path):
+    j = Journal("t", str(tmp_path))
+    j.append(_entry())
+    with open(j.path, "ab") as f:
+        f.write(b'{"id": "torn"')  # 쓰다 죽은 줄
+    assert len(j.read(0, 10)) == 1  # 끝나지 않은 줄은 아직 안 읽는다
+
+    after = _entry()
+    j.append(after)
+    rows = j.read(0, 10)
+    assert rows[1][1] is None  # 잘린 줄은 건너뛰는 항목으로
+    assert rows[2][1]["id"] == after["id"]
+
+
+def test_concurrent_appends_from_processes_do_not_interleave(tmp_path):
+    procs = [multiprocessing.Process(target=_append_many, args=(str(tmp_path), 200)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert all(p.exitcode == 0 for p in procs)
+    rows = Journal("t", str(tmp_path)).read(0, 10_000)
+    assert len(rows) == 800 and all(e is not None for _, e in rows)
+
+
+# ---- replay (DB) ----
+def _journal_order(menu, qty=1):
+    priced = pricing.price_cart([OrderItemIn(menuItemId=menu["item"], qty=qty)])
+    order_id = str(uuid.uuid4())
+    intake.accept(order_id, menu["customer"], None, priced)
+    return order_id, priced
+
+
+def test_replay_saves_journaled_orders_and_clears_pending(menu):
+    order_id, priced = _journal_order(menu, qty=2)
+    assert intake.pending(order_id)["total_amount"] == 20000
+
+    assert intake.replay() == {"replayed": 1, "duplicates": 0, "rejected": 0}
+    row = q("select status, total_amount from orders where id=%s", (order_id,))[0]
+    assert (row["status"], row["total_amount"]) == ("PLACED", 20000)
+    assert intake.pending(order_id) is None
+    assert intake.journal().backlog_bytes() == 0
+
+
+def test_replaying_the_same_line_twice_inserts_once(menu):
+    order_id, _ = _journal_order(menu)
+    j = intake.journal()
+    assert intake.replay()["replayed"] == 1
+
+    # offset 을 저장하기 전에 죽은 경우: 같은 줄을 다시 넣는다
+    entry = _entry(order_id)
+    entry.update({"customerId": menu["customer"],
+                  "priced": pricing.price_cart([OrderItemIn(menuItemId=menu["item"], qty=1)])})
+    j.append(entry)
+    assert intake.replay() == {"replayed": 0, "duplicates": 1, "rejected": 0}
+    assert q("select count(*) as n from orders")[0]["n"] == 1
+    assert q("select count(*) as n from order_items")[0]["n"] == 1
+    assert q("select count(*) as n from notification_logs")[0]["n"] == 1
+
+
+def test_rejected_entries_do_not_block_the_rest(menu):
+    j = intake.journal()
+    bad = _entry()
+    bad["customerId"] = str(uuid.uuid4())  # 없는 손님 → FK 위반
+    j.append(bad)
+    j.append(["not", "an", "order"])
+    order_id, _ = _journal_order(menu)
+
+    assert intake.replay() == {"replayed": 1, "duplicates": 0, "rejected": 2}
+    assert q("select id::text as id from orders")[0]["id"] == order_id
+    with open(j.rejected_path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+
+
+def test_replay_is_skipped_while_another_process_holds_the_lock(menu):
+    order_id, _ = _journal_order(menu)
+    j = intake.journal()
+    fd = os.open(j.replay_lock_path, os.O_WRONLY | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        assert intake.replay() == {"replayed": 0, "duplicates": 0, "rejected": 0}
+    finally:
+        os.close(fd)
+    assert intake.replay()["replayed"] == 1
+
+
+def test_other_worker_sees_journaled_receipt(menu):
+    order_id, _ = _journal_order(menu)
+    intake._pending.clear()  # 다른 워커 프로세스: 메모리에는 없다
+    out = get_order(order_id)
+    assert out["order"]["pending"] is True and out["order"]["total_amount"] == 10000
+
+
+def test_cold_menu_without_db_or_copy_is_503(menu, monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise intake.DB_UNAVAILABLE[0]("db down")
+
+    monkeypatch.setattr(pricing, "load_snapshot", unavailable)
+    monkeypatch.setattr(intake, "INTAKE_MODE", "fallback")
+    with pytest.raises(HTTPException) as e:
+        create_order(CreateOrderIn(customerId=menu["customer"], items=[{"menuItemId": menu["item"], "qty": 1}]))
+    assert e.value.status_code == 503 and "Retry-After" in e.value.headers
+    assert not os.path.exists(intake.journal().path) or intake.journal().backlog_bytes() == 0
@@ -0,0 +1,129 @@
+# tests/test_notify.py
+import uuid
+
+import pytest
+
+from app import intake, notify, pricing
+from app.fcm import CircuitOpenError
+from app.routers.orders import OrderItemIn
+
+from conftest import q
+
+
+class Sender:
+    """notify.send_to_tokens 대역: 호출을 기록하고 정해 둔 결과를 돌려준다"""
+
+    def __init__(self, result=(True, None, False)):
+        self.result = result
+        self.calls = []
+
+    def __call__(self, tokens, title, body, data):
+        self.calls.append({"tokens": tokens, "title": title, "body": body, "data": data})
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+@pytest.fixture
+def sender(monkeypatch):
+    s = Sender()
+    monkeypatch.setattr(notify, "send_to_tokens", s)
+    return s
+
+
+def _queue(user_id, priority, age_sec=0, title="t"):
+    """바로 보낼 차례인 queued 알림 1건 (age_sec 만큼 밀린 것으로)"""
+    return q("""
+        insert into notification_logs (user_id, channel, title, body, send_status, priority, next_attempt_at)
+        values (%s, 'fcm', %s, 'b', 'queued', %s, now() - make_interval(secs => %s))
+        returning id::text as id
+    """, (user_id, title, priority, age_sec))[0]["id"]
+
+
+def _place(menu, n):
+    priced = pricing.price_cart([OrderItemIn(menuItemId=menu["item"], qty=1)])
+    for _ in range(n):
+        intake.save_order(str(uuid.uuid4()), menu["customer"], None, priced)
+
+
+def _window_passed():
+    q("update notification_logs set next_attempt_at = now() - interval '1 second' where send_status='queued'")
+
+
+# ---- 우선순위 레인 ----
+def test_status_lane_goes_before_bulk(menu, sender):
+    _queue(menu["owner"], notify.PRIORITY_BULK, age_sec=5, title="bulk")
+    _queue(menu["owner"], notify.PRIORITY_STATUS, age_sec=1, title="status")
+    notify.dispatch_due(limit=1)
+    assert [c["title"] for c in sender.calls] == ["status"]
+
+
+def test_starved_bulk_goes_first(menu, sender):
+    _queue(menu["owner"], notify.PRIORITY_BULK, age_sec=notify.STARVATION_SEC + 5, title="bulk")
+    _queue(menu["owner"], notify.PRIORITY_STATUS, age_sec=1, title="status")
+    notify.dispatch_due(limit=1)
+    assert [c["title"] for c in sender.calls] == ["bulk"]
+    notify.dispatch_due(limit=1)
+    assert [c["title"] for c in sender.calls] == ["bulk", "status"]
+
+
+# ---- 재시도 ----
+def test_transient_failure_is_retried_with_backoff(menu, sender):
+    sender.result = (False, "UNAVAILABLE", True)
+    log_id = _queue(menu["owner"], notify.PRIORITY_STATUS)
+    assert notify.dispatch_due()["retry"] == 1
+    row = q("""
+        select send_status, attempts, next_attempt_at > now() as later from notification_logs where id=%s
+    """, (log_id,))[0]
+    assert (row["send_status"], row["attempts"], row["later"]) == ("queued", 1, True)
+    assert notify.dispatch_due()["processed"] == 0  # 백오프 전에는 다시 안 가져간다
+
+
+def test_permanent_failure_is_not_retried(menu, sender):
+    sender.result = (False, "UNREGISTERED", False)
+    log_id = _queue(menu["owner"], notify.PRIORITY_STATUS)
+    assert notify.dispatch_due()["failed"] == 1
+    assert q("select send_status from notification_logs where id=%s", (log_id,))[0]["send_status"] == "failed"
+
+
+def test_open_circuit_defers_without_spending_attempts(menu, sender):
+    sender.result = CircuitOpenError(30)
+    log_id = _queue(menu["owner"], notify.PRIORITY_STATUS)
+    assert notify.dispatch_due()["deferred"] == 1
+    row = q("select send_status, attempts from notification_logs where id=%s", (log_id,))[0]
+    assert (row["send_status"], row["attempts"]) == ("queued", 0)
+
+
+# ---- 새 주문 묶음 ----
+def test_orders_within_window_are_sent_once(menu, sender):
+    _place(menu, 3)
+    assert notify.flush_coalesced()["groups"] == 0  # window 전
+    assert notify.dispatch_due()["processed"] == 0  # 묶음 대상은 개별 발송이 가져가지 않는다
+
+    _window_passed()
+    out = notify.flush_coalesced()
+    assert (out["groups"], out["logs"], out["sent"]) == (1, 3, 1)
+    assert len(sender.calls) == 1 and sender.calls[0]["data"]["count"] == 3
+    assert "새 주문 3건" in sender.calls[0]["body"]
+
+    delivery = q("select id, log_count, send_status from notification_deliveries")
+    assert [(d["log_count"], d["send_status"]) for d in delivery] == [(3, "sent")]
+    logs = q("select send_status, delivery_id from notification_logs")
+    assert all(r["send_status"] == "sent" and r["delivery_id"] == delivery[0]["id"] for r in logs)
+
+
+def test_retried_batch_is_regrouped_and_delivery_marked_retried(menu, sender):
+    _place(menu, 2)
+    _window_passed()
+    sender.result = (False, "UNAVAILABLE", True)
+    assert notify.flush_coalesced()["retry"] == 1
+    assert q("select send_status from notification_deliveries")[0]["send_status"] == "retried"
+    rows = q("select send_status, delivery_id from notification_logs")
+    assert all(r["send_status"] == "queued" and r["delivery_id"] is None for r in rows)
+
+    _place(menu, 1)
+    _window_passed()
+    sender.result = (True, None, False)
+    out = notify.flush_coalesced()
+    assert (out["groups"], out["logs"], out["sent"]) == (1, 3, 1)
+    assert q("select count(*) as n from notification_logs where send_status='sent'")[0]["n"] == 3
@@ -0,0 +1,120 @@
+# tests/test_order_history.py
+import pytest
+
+from app import order_history
+from app.routers import orders
+
+
+@pytest.fixture(autouse=True)
+def _clean():
+    order_history._entries.clear()
+    order_history._touched.clear()
+    yield
+
+
+def _order(n, status="PLACED"):
+    return {"id": f"o{n}", "order_no": n, "status": status, "total_amount": 1000 * n, "created_at": n}
+
+
+class Loader:
+    def __init__(self, rows, during=None):
+        self.rows = rows
+        self.during = during  # 읽는 도중(쿼리 실행 중)에 들어오는 이벤트
+        self.calls = 0
+
+    def __call__(self, n):
+        self.calls += 1
+        if self.during:
+            self.during()
+        return self.rows[:n]
+
+
+def test_miss_fills_and_hit_skips_db():
+    load = Loader([_order(2), _order(1)])
+    assert [o["id"] for o in order_history.get("c", 10, load)] == ["o2", "o1"]
+    assert [o["id"] for o in order_history.get("c", 10, load)] == ["o2", "o1"]
+    assert load.calls == 1
+
+
+def test_events_update_cached_list_in_place():
+    load = Loader([_order(1)])
+    order_history.get("c", 10, load)
+    order_history.order_placed("c", _order(2))
+    order_history.status_changed("c", "o1", "ACCEPTED")
+    out = order_history.get("c", 10, load)
+    assert [(o["id"], o["status"]) for o in out] == [("o2", "PLACED"), ("o1", "ACCEPTED")]
+    assert load.calls == 1
+
+
+def test_new_order_during_fill_discards_result():
+    # 읽는 사이 다른 워커의 새 주문 → 그 주문이 빠졌을 수 있는 결과는 캐시에 넣지 않는다
+    load = Loader([_order(1)], during=lambda: order_history.peer_changed("c", "o2", "PLACED"))
+    assert [o["id"] for o in order_history.get("c", 10, load)] == ["o1"]
+    assert order_history._key("c") not in order_history._entries
+
+    load.during = None
+    load.rows = [_order(2), _order(1)]
+    assert [o["id"] for o in order_history.get("c", 10, load)] == ["o2", "o1"]
+    assert load.calls == 2
+
+
+def test_status_change_during_fill_discards_result():
+    load = Loader([_order(1)], during=lambda: order_history.status_changed("c", "o1", "CANCELED"))
+    order_history.get("c", 10, load)
+    assert order_history._key("c") not in order_history._entries
+
+
+def test_event_for_other_customer_does_not_discard():
+    load = Loader([_order(1)], during=lambda: order_history.peer_changed("other", "x", "PLACED"))
+    order_history.get("c", 10, load)
+    assert order_history._key("c") in order_history._entries
+
+
+def test_unknown_peer_order_drops_cached_list():
+    load = Loader([_order(1)])
+    order_history.get("c", 10, load)
+    order_history.peer_changed("c", "o2", "PLACED")
+    load.rows = [_order(2), _order(1)]
+    assert [o["id"] for o in order_history.get("c", 10, load)] == ["o2", "o1"]
+    assert load.calls == 2
+
+
+def test_ttl_expiry_reloads(monkeypatch):
+    load = Loader([_order(1)])
+    order_history.get("c", 10, load)
+    monkeypatch.setattr(order_history, "HISTORY_CACHE_TTL_SEC", 0)
+    order_history.get("c", 10, load)
+    assert load.calls == 2
+
+
+def test_fill_reads_from_primary(monkeypatch):
+    # replica 는 peer_changed 보다 늦을 수 있으므로 캐시 채우기는 readonly 로 빌리지 않는다
+    calls = []
+
+    class _Conn:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def cursor(self):
+            return _Cursor()
+
+        def close(self):
+            pass
+
+    class _Cursor(_Conn):
+        def execute(self, *args):
+            pass
+
+        def fetchall(self):
+            return []
+
+    def get_conn(*args, **kwargs):
+        calls.append((args, kwargs))
+        return _Conn()
+
+    monkeypatch.setattr(orders, "get_conn", get_conn)
+    orders._load_customer_orders("c", 10)
+    assert calls == [((), {})]
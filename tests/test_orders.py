@@ -0,0 +1,67 @@
+# tests/test_orders.py
+from app import menu_cache
+from app.routers.orders import CreateOrderIn, QuoteIn, create_order, quote_order
+
+from conftest import q
+
+
+def _cart(menu, item2):
+    return [
+        {"menuItemId": menu["item"], "qty": 2,
+         "selectedOptions": [{"optionId": menu["option"], "valueKeys": ["hot"]}]},
+        {"menuItemId": item2, "qty": 1},
+    ]
+
+
+def _saved(order_id):
+    """저장된 주문을 quote 응답과 같은 모양으로"""
+    lines = q("""
+        select oi.menu_item_id::text as "menuItemId", oi.name_snapshot as name, oi.price_snapshot as "unitPrice",
+               oi.qty, oi.line_amount as "lineAmount",
+               coalesce(json_agg(json_build_object(
+                 'optionKey', o.option_key, 'optionName', o.option_name, 'valueKey', o.value_key,
+                 'valueLabel', o.value_label, 'priceDelta', o.price_delta)) filter (where o.id is not null), '[]') as options
+        from order_items oi
+        left join order_item_options o on o.order_item_id = oi.id
+        where oi.order_id=%s
+        group by oi.id
+        order by oi.name_snapshot
+    """, (order_id,))
+    total = q("select total_amount from orders where id=%s", (order_id,))[0]["total_amount"]
+    return total, [dict(r) for r in lines]
+
+
+def _quoted(quote):
+    keep = ("menuItemId", "name", "unitPrice", "qty", "lineAmount", "options")
+    return quote["totalAmount"], sorted(({k: line[k] for k in keep} for line in quote["lines"]),
+                                        key=lambda line: line["name"])
+
+
+def _second_item(menu):
+    return q("""
+        insert into menu_items (category_id, name, price)
+        select category_id, '물냉면', 8000 from menu_items where id=%s
+        returning id::text as id
+    """, (menu["item"],))[0]["id"]
+
+
+def test_quote_matches_created_order(menu):
+    cart = _cart(menu, _second_item(menu))
+    quote = quote_order(QuoteIn(items=cart))
+    out = create_order(CreateOrderIn(customerId=menu["customer"], items=cart))
+
+    assert quote["totalAmount"] == out["total_amount"] == 2 * 10500 + 8000
+    assert _quoted(quote) == _saved(out["id"])
+
+
+def test_price_change_after_quote_is_applied_at_create(menu):
+    cart = _cart(menu, _second_item(menu))
+    stale = quote_order(QuoteIn(items=cart))
+    q("update menu_items set price = 11000 where id=%s", (menu["item"],))
+
+    # 메모리 가격표는 아직 옛 버전이어도 저장 트랜잭션이 버전을 보고 다시 계산한다
+    out = create_order(CreateOrderIn(customerId=menu["customer"], items=cart))
+    assert stale["totalAmount"] == 29000 and out["total_amount"] == 2 * 11500 + 8000
+
+    menu_cache.invalidate()
+    assert _quoted(quote_order(QuoteIn(items=cart))) == _saved(out["id"])
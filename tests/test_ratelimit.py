@@ -0,0 +1,90 @@
+# tests/test_ratelimit.py
+import pytest
+
+from app import ratelimit
+from app.ratelimit import Limit, MemoryBuckets, RateLimited
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", c)
+    return c
+
+
+SLOW = Limit(rate=1.0, burst=3)  # 1초에 1개, 연속 3번
+
+
+def test_burst_then_refill(clock):
+    b = MemoryBuckets()
+    assert [b.take([("k", SLOW)]) for _ in range(3)] == [0, 0, 0]
+    assert b.take([("k", SLOW)]) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert b.take([("k", SLOW)]) == pytest.approx(0.5)  # 반 개 찼다
+    clock.now += 0.5
+    assert b.take([("k", SLOW)]) == 0
+    clock.now += 100
+    assert [b.take([("k", SLOW)]) for _ in range(4)][-1] > 0  # 오래 쉬어도 burst 까지만
+
+
+def test_rejected_request_charges_no_bucket(clock):
+    b = MemoryBuckets()
+    ip, customer = ("ip:1", Limit(1.0, 10)), ("orders:c", Limit(1.0, 1))
+    assert b.take([ip, customer]) == 0
+    for _ in range(5):
+        assert b.take([ip, customer]) > 0  # 손님 버킷이 비어 거절 → IP 토큰도 그대로
+    assert b._buckets["ip:1"][0] == pytest.approx(9)
+
+    # 같은 IP 의 다른 손님은 IP 버킷의 남은 토큰을 쓴다
+    assert b.take([ip, ("orders:other", Limit(1.0, 1))]) == 0
+    assert b._buckets["ip:1"][0] == pytest.approx(8)
+
+
+def test_wait_is_for_the_emptiest_bucket(clock):
+    b = MemoryBuckets()
+    fast, slow = ("a", Limit(10.0, 1)), ("b", Limit(0.1, 1))
+    b.take([fast, slow])
+    assert b.take([fast, slow]) == pytest.approx(10.0)
+
+
+def test_idle_keys_are_evicted_oldest_first(clock):
+    b = MemoryBuckets()
+    for key in ("a", "b", "c"):
+        b.take([(key, SLOW)])
+        clock.now += 1
+    clock.now += SLOW.idle_sec - 1.5  # a, b 만 가득 찰 만큼 쉼
+    b.take([("d", SLOW)])
+    assert list(b._buckets) == ["c", "d"] and b.evicted == 2
+
+
+def test_max_keys_evicts_least_recently_used(clock):
+    b = MemoryBuckets(max_keys=2)
+    for key in ("a", "b", "a", "c"):
+        b.take([(key, SLOW)])
+    assert list(b._buckets) == ["a", "c"]
+
+
+def test_check_raises_with_retry_after_and_skips_missing_keys(clock, monkeypatch):
+    monkeypatch.setattr(ratelimit, "buckets", MemoryBuckets())
+    monkeypatch.setitem(ratelimit.LIMITS, "orders", Limit(0.25, 1))
+    ratelimit.check(("orders", "t:c"), ("ip", None))
+    with pytest.raises(RateLimited) as e:
+        ratelimit.check(("orders", "t:c"), ("ip", None))
+    assert e.value.retry_after == 4
+    ratelimit.check(("orders", None))  # key 가 없으면 검사 안 함
+
+
+def test_disabled(clock, monkeypatch):
+    monkeypatch.setattr(ratelimit, "buckets", MemoryBuckets())
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setitem(ratelimit.LIMITS, "orders", Limit(0.25, 1))
+    for _ in range(5):
+        ratelimit.check(("orders", "t:c"))
@@ -0,0 +1,127 @@
+# tests/test_stats.py
+import uuid
+from datetime import timedelta
+
+import pytest
+
+from app import intake, pricing, stats
+from app.db import get_conn
+from app.routers import admin_stats
+from app.routers.admin_orders import AcceptIn, CompleteIn, admin_accept, admin_complete
+from app.routers.orders import OrderItemIn, SelectedOptionIn, cancel_order
+
+from conftest import q
+
+ROLLUPS = {
+    "stats_daily": "select day, orders_count, gross_amount, completed_amount, canceled_amount from stats_daily",
+    "stats_daily_status": "select day, status, orders_count, amount from stats_daily_status",
+    "stats_item_daily": "select day, menu_item_id, name, qty, amount from stats_item_daily",
+    "stats_item_total": "select menu_item_id, name, qty, amount from stats_item_total",
+}
+
+
+def _rollups():
+    """롤업 테이블 내용 (증분으로만 생기는 0 행은 재계산 결과에 없으므로 뺀다)"""
+    out = {}
+    for table, sql_text in ROLLUPS.items():
+        rows = [dict(r) for r in q(sql_text)]
+        out[table] = sorted(
+            (r for r in rows if any(v for k, v in r.items() if k not in ("day", "status", "menu_item_id", "name"))),
+            key=lambda r: tuple(str(v) for v in r.values()),
+        )
+    return out
+
+
+def _rebuilt():
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                stats.rebuild(cur)
+    finally:
+        conn.close()
+    return _rollups()
+
+
+def _fold_all():
+    while stats.fold() > 0:
+        pass
+
+
+@pytest.fixture
+def orders(menu):
+    """이틀에 걸친 주문 5건: 어제 1건, 오늘 4건(메뉴 2종, 옵션 포함)"""
+    item2 = q("""
+        insert into menu_items (category_id, name, price)
+        select category_id, '물냉면', 8000 from menu_items where id=%s
+        returning id::text as id
+    """, (menu["item"],))[0]["id"]
+    hot = SelectedOptionIn(optionId=menu["option"], valueKeys=["hot"])
+    mild = SelectedOptionIn(optionId=menu["option"], valueKeys=["mild"])
+    yesterday = q("select (now() - interval '1 day')::text as t")[0]["t"]
+    carts = [
+        [OrderItemIn(menuItemId=menu["item"], qty=1)],
+        [OrderItemIn(menuItemId=menu["item"], qty=2, selectedOptions=[hot])],
+        [OrderItemIn(menuItemId=menu["item"], qty=1), OrderItemIn(menuItemId=item2, qty=1)],
+        [OrderItemIn(menuItemId=item2, qty=3)],
+        [OrderItemIn(menuItemId=menu["item"], qty=1, selectedOptions=[mild])],
+    ]
+    ids = []
+    for i, cart in enumerate(carts):
+        order_id = str(uuid.uuid4())
+        intake.save_order(order_id, menu["customer"], None, pricing.price_cart(cart),
+                          created_at=yesterday if i == 0 else None)
+        ids.append(order_id)
+    return ids
+
+
+def test_placing_only_appends_to_the_ledger(orders):
+    assert q("select count(*) as n from stats_daily")[0]["n"] == 0
+    kinds = {r["kind"]: r["n"] for r in q("select kind, count(*) as n from stats_ledger group by kind")}
+    assert kinds == {"day": 5, "status": 5, "item": 6}
+
+
+def test_folded_rollups_match_rebuild(menu, orders):
+    _fold_all()  # 일부는 fold 된 뒤에 상태가 바뀐다
+    admin_accept(orders[0], AcceptIn(ownerId=menu["owner"]))
+    admin_complete(orders[0], CompleteIn(ownerId=menu["owner"]))
+    admin_accept(orders[1], AcceptIn(ownerId=menu["owner"]))
+    cancel_order(orders[2], menu["customer"])
+    admin_complete(orders[3], CompleteIn(ownerId=menu["owner"]))
+    _fold_all()
+
+    assert q("select count(*) as n from stats_ledger")[0]["n"] == 0
+    folded = _rollups()
+    assert folded == _rebuilt()
+    assert sum(d["orders_count"] for d in folded["stats_daily"]) == 5
+
+
+def test_reads_include_unfolded_ledger(menu, orders):
+    admin_accept(orders[1], AcceptIn(ownerId=menu["owner"]))
+    cancel_order(orders[2], menu["customer"])
+    stats.fold(limit=4)  # 원장 일부만 롤업으로
+
+    def read():
+        today = admin_stats._today()
+        return (admin_stats.daily_stats(today - timedelta(days=6), today), admin_stats.status_stats(today),
+                admin_stats.top_items(None), admin_stats.top_items(today))
+
+    before = read()
+    _fold_all()
+    after = read()
+    assert before == after
+    assert [d["orders_count"] for d in after[0]["days"]] == [1, 4]
+    top = {i["name"]: (i["qty"], i["amount"]) for i in after[2]["items"]}
+    assert top == {"매운갈비": (4, 41000), "물냉면": (3, 24000)}
+
+
+def test_fold_is_skipped_while_another_worker_folds(orders):
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("select pg_advisory_xact_lock(hashtext('stats_fold:' || current_schema()))")
+            assert stats.fold() == 0
+        conn.rollback()
+    finally:
+        conn.close()
+    assert stats.fold() == 16